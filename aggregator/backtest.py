@@ -0,0 +1,124 @@
+"""Запись потоков Binance и офлайн-прогон записей через MainService.
+
+Запуск из каталога aggregator:
+    python backtest.py record --streams btcusdt@kline_1m ethusdt@kline_1m --out data/recordings
+    python backtest.py replay data/recordings --symbols BTCUSDT ETHUSDT --thresholds 0.5,1,2 --thresholds 1,2,3 --speed 0
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+
+from aggregator.core.logs import setup_logging
+from aggregator.gateways.binance.replay import Recorder, ReplayPool
+from aggregator.gateways.rabbit.producer import Producer
+from aggregator.main import MainService
+from aggregator.schemas.models import ActionEnum, AlertMode, InputCommand
+from common.logs import stop_logging
+
+logger = logging.getLogger(__name__)
+
+
+class CountingProducer(Producer):
+    """Вместо RabbitMQ считает уведомления по уровням и пользователям"""
+
+    def __init__(self):
+        self.by_level: Counter = Counter()
+        self.by_user: dict[str, Counter] = defaultdict(Counter)
+
+    async def produce(self, routing_key: str, message: dict) -> None:
+        self.by_level[routing_key] += 1
+        self.by_user[message["user_id"]][routing_key] += 1
+
+
+def build_commands(args: argparse.Namespace) -> list[InputCommand]:
+    if args.subscriptions:
+        with open(args.subscriptions) as file:
+            return [InputCommand(**command) for command in json.load(file)]
+
+    # каждый набор порогов - отдельный виртуальный пользователь, все наборы считаются за один прогон
+    return [
+        InputCommand(
+            action=ActionEnum.SUBSCRIBE,
+            user_id=f"thresholds-{index}",
+            symbols=args.symbols,
+            timeframe=args.timeframe,
+            thresholds=[float(value) for value in thresholds.split(",")],
+            alert_mode=args.alert_mode,
+            hysteresis=args.hysteresis,
+            cooldown=args.cooldown,
+        )
+        for index, thresholds in enumerate(args.thresholds or ["1,2,3"])
+    ]
+
+
+async def replay(args: argparse.Namespace) -> dict:
+    commands = build_commands(args)
+    pool = ReplayPool(args.path, speed=args.speed)
+    producer = CountingProducer()
+    service = MainService(consumer=None, producer=producer, pool=pool)
+
+    started_at = time.perf_counter()
+    await service.restore(commands)
+    # кадры идут в хаб напрямую и оцениваются по одному, без схлопывания
+    await pool.run(service.hub.deliver)
+    elapsed = time.perf_counter() - started_at
+    await service.stop()
+
+    return {
+        "files": len(pool.files),
+        "frames": pool.replayed,
+        "elapsed_s": round(elapsed, 3),
+        "frames_per_s": round(pool.replayed / elapsed, 1) if elapsed else None,
+        "alerts_by_level": dict(producer.by_level),
+        "alerts_by_user": {
+            command.user_id: {"thresholds": command.thresholds, **producer.by_user.get(command.user_id, {})}
+            for command in commands
+        },
+    }
+
+
+async def record(args: argparse.Namespace) -> None:
+    recorder = Recorder(streams=args.streams, directory=args.out, rotate_bytes=args.rotate_mb * 1024 * 1024)
+    try:
+        await recorder.run()
+    finally:
+        logger.info(f"Recorded {recorder.recorded} frames")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="запись сырых кадров combined stream")
+    record_parser.add_argument("--streams", nargs="+", required=True, help="имена потоков, например btcusdt@kline_1m")
+    record_parser.add_argument("--out", default="data/recordings")
+    record_parser.add_argument("--rotate-mb", type=int, default=64)
+
+    replay_parser = commands.add_parser("replay", help="прогон записи через MainService")
+    replay_parser.add_argument("path", help="файл записи или каталог с записями")
+    replay_parser.add_argument("--speed", type=float, default=0.0, help="1 - реальное время, N - в N раз быстрее, 0 - без пауз")
+    replay_parser.add_argument("--subscriptions", help="json-файл со списком команд подписки")
+    replay_parser.add_argument("--symbols", nargs="+", default=["BTCUSDT"])
+    replay_parser.add_argument("--timeframe", default="1m")
+    replay_parser.add_argument("--thresholds", action="append", help="набор порогов через запятую, можно несколько")
+    replay_parser.add_argument("--alert-mode", type=AlertMode, default=AlertMode.EVERY_TICK)
+    replay_parser.add_argument("--hysteresis", type=float, default=0.0)
+    replay_parser.add_argument("--cooldown", type=float, default=0.0)
+
+    args = parser.parse_args()
+    setup_logging(level="WARNING")
+
+    if args.command == "record":
+        asyncio.run(record(args))
+    else:
+        result = asyncio.run(replay(args))
+        # записи из очереди логов выводятся до отчета, а не вперемешку с ним
+        stop_logging()
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
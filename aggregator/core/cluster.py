@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable
+
+import aio_pika
+from aio_pika import ExchangeType, IncomingMessage
+
+from aggregator.core.ring import HashRing
+from aggregator.core.settings import settings
+from aggregator.schemas.models import ActionEnum, InputCommand
+
+logger = logging.getLogger(__name__)
+
+SubscribeCallback = Callable[[InputCommand], Awaitable[None]]
+UnsubscribeCallback = Callable[[str], Awaitable[None]]
+ForgetCallback = Callable[[str], None]
+
+
+class ClusterCoordinator:
+    """Распределение пользователей между экземплярами aggregator по кольцу консистентного хеширования
+
+    Все узлы получают все команды через fanout-обменник и хранят полный справочник подписок,
+    но обслуживают только пользователей, которых кольцо отдает им. При смене состава каждый
+    узел пересчитывает владельцев и забирает или отпускает пользователей без потери подписок.
+
+    Передача при входе узла - сначала подключить, потом отключить: новичок попадает в кольцо
+    соседей только после heartbeat с ready, который он шлет, уже подписав своих пользователей.
+
+    Локальный снимок - самый слабый источник: sync соседей и команды перезаписывают его записи,
+    а пользователи из снимка, о которых не сообщил ни один из готовых соседей, отписались,
+    пока узел был остановлен, и удаляются после прогрева.
+    """
+
+    def __init__(
+        self,
+        connector,
+        node_id: str = settings.CLUSTER_NODE_ID,
+        heartbeat_interval: float = settings.CLUSTER_HEARTBEAT_INTERVAL,
+        node_timeout: float = settings.CLUSTER_NODE_TIMEOUT,
+    ):
+        self._connector = connector
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.node_timeout = node_timeout
+
+        self._ring = HashRing()
+        self._members: dict[str, float] = {}
+        self._directory: dict[str, dict] = {}
+        self._served: set[str] = set()
+        # пользователи из локального снимка, еще не подтвержденные соседями или командами
+        self._seeded: set[str] = set()
+        # соседи, приславшие справочник после нашего join
+        self._synced_from: set[str] = set()
+        # _ready - узел сам пересчитывает владельцев, _announced - соседи уже могут отпускать его пользователей
+        self._ready = False
+        self._announced = False
+        self._lock = asyncio.Lock()
+
+        self._exchange = None
+        self._heartbeat_task: asyncio.Task | None = None
+        self._subscribe: SubscribeCallback | None = None
+        self._unsubscribe: UnsubscribeCallback | None = None
+        self._forget: ForgetCallback | None = None
+
+    def bind(
+        self, subscribe: SubscribeCallback, unsubscribe: UnsubscribeCallback, forget: ForgetCallback | None = None
+    ) -> None:
+        self._subscribe = subscribe
+        self._unsubscribe = unsubscribe
+        # удаление пользователя, которого больше нет в кластере, из локального снимка
+        self._forget = forget
+
+    @property
+    def members(self) -> set[str]:
+        return self._ring.nodes
+
+    @property
+    def served_users(self) -> set[str]:
+        return set(self._served)
+
+    async def start(self) -> None:
+        channel = self._connector.channel
+        self._exchange = await channel.declare_exchange(settings.CLUSTER_EXCHANGE, ExchangeType.FANOUT)
+        queue = await channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(self._exchange)
+        await queue.consume(self._on_message, no_ack=True)
+
+        self._touch_member(self.node_id, ready=False)
+        await self._publish({"type": "join"})
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+        # собираем состав кластера и справочник от соседей, прежде чем считать себя владельцем
+        await asyncio.sleep(self.node_timeout)
+        self._drop_unconfirmed_seeds()
+        self._ring.add(self.node_id)
+        self._ready = True
+        # прежние владельцы продолжают обслуживать пользователей, пока не получат ready
+        await self._reconcile_all()
+        self._announced = True
+        await self._publish_heartbeat()
+        logger.info(f"Cluster node {self.node_id} ready, members: {sorted(self.members)}")
+
+    async def stop(self) -> None:
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+
+        if self._exchange is not None:
+            await self._publish({"type": "leave"})
+        self._ready = False
+        self._announced = False
+
+    def seed(self, commands: list[dict]) -> None:
+        """Начальное заполнение справочника из локального снимка до входа в кластер"""
+        for command in commands:
+            if command["user_id"] not in self._directory:
+                self._directory[command["user_id"]] = command
+                self._seeded.add(command["user_id"])
+
+    def _drop_unconfirmed_seeds(self) -> None:
+        """Удаление пользователей снимка, которых не назвал ни один готовый сосед"""
+        peers = self._ring.nodes
+        # без соседей снимок - единственный источник; без sync хотя бы одного из них справочник неполон
+        if not peers or not peers <= self._synced_from:
+            return
+
+        for user_id in self._seeded:
+            self._directory.pop(user_id, None)
+            self._forget_user(user_id)
+        if self._seeded:
+            logger.info(f"Dropped {len(self._seeded)} users unsubscribed while node was down")
+        self._seeded.clear()
+
+    def _forget_user(self, user_id: str) -> None:
+        if self._forget is not None:
+            self._forget(user_id)
+
+    async def broadcast_command(self, command: dict) -> None:
+        """Команда из общей очереди commands рассылается всем узлам"""
+        await self._publish({"type": "command", "command": command})
+
+    async def _publish(self, payload: dict) -> None:
+        payload["node_id"] = self.node_id
+        await self._exchange.publish(aio_pika.Message(body=json.dumps(payload).encode()), routing_key="")
+
+    async def _publish_heartbeat(self) -> None:
+        await self._publish({"type": "heartbeat", "ready": self._announced})
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            try:
+                await self._publish_heartbeat()
+                await self._expire_members()
+            except Exception as e:
+                logger.error(f"Cluster heartbeat error: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def _touch_member(self, node_id: str, ready: bool) -> bool:
+        """Отметка узла живым, в кольцо он попадает только после ready; True - кольцо изменилось"""
+        self._members[node_id] = time.monotonic()
+        if not ready or node_id in self._ring:
+            return False
+
+        self._ring.add(node_id)
+        logger.info(f"Cluster node {node_id} joined")
+        return True
+
+    async def _drop_member(self, node_id: str) -> None:
+        if self._members.pop(node_id, None) is None or node_id not in self._ring:
+            return
+        self._ring.remove(node_id)
+        logger.info(f"Cluster node {node_id} left")
+        await self._reconcile_all()
+
+    async def _expire_members(self) -> None:
+        deadline = time.monotonic() - self.node_timeout
+        for node_id, last_seen in list(self._members.items()):
+            if node_id != self.node_id and last_seen < deadline:
+                await self._drop_member(node_id)
+
+    async def _on_message(self, message: IncomingMessage) -> None:
+        try:
+            payload = json.loads(message.body)
+            sender = payload["node_id"]
+            kind = payload["type"]
+
+            if kind == "command":
+                await self._apply_command(payload["command"])
+            elif kind == "sync":
+                if sender != self.node_id:
+                    self._synced_from.add(sender)
+                await self._apply_sync(payload["commands"])
+            elif sender == self.node_id:
+                return
+            elif kind == "heartbeat":
+                if self._touch_member(sender, ready=payload.get("ready", False)):
+                    await self._reconcile_all()
+            elif kind == "join":
+                # новичок пустой: отдаем ему справочник, пользователей отпустим после его ready
+                self._touch_member(sender, ready=False)
+                await self._publish_sync()
+            elif kind == "leave":
+                await self._drop_member(sender)
+
+        except Exception as e:
+            logger.error(f"Error processing cluster message: {e}")
+
+    async def _publish_sync(self) -> None:
+        commands = [self._directory[user_id] for user_id in self._served if user_id in self._directory]
+        await self._publish({"type": "sync", "commands": commands})
+
+    async def _apply_command(self, command: dict) -> None:
+        user_id = command["user_id"]
+        self._seeded.discard(user_id)
+        if command.get("action") == ActionEnum.UNSUBSCRIBE.value:
+            self._directory.pop(user_id, None)
+            self._forget_user(user_id)
+        else:
+            self._directory[user_id] = command
+        await self._reconcile_user(user_id, force=True)
+
+    async def _apply_sync(self, commands: list[dict]) -> None:
+        for command in commands:
+            user_id = command["user_id"]
+            # более свежая команда, уже пришедшая в справочник, важнее снимка соседа,
+            # а снимок соседа важнее локального снимка
+            if user_id in self._directory and user_id not in self._seeded:
+                continue
+
+            stale = self._directory.get(user_id)
+            self._directory[user_id] = command
+            self._seeded.discard(user_id)
+            await self._reconcile_user(user_id, force=stale is not None and stale != command)
+
+    async def _reconcile_all(self) -> None:
+        for user_id in set(self._directory) | self._served:
+            await self._reconcile_user(user_id)
+
+    async def _reconcile_user(self, user_id: str, force: bool = False) -> None:
+        """Подписка или отписка пользователя в зависимости от текущего владельца в кольце"""
+        if not self._ready:
+            return
+
+        async with self._lock:
+            command = self._directory.get(user_id)
+            is_owner = command is not None and self._ring.owner(user_id) == self.node_id
+
+            if is_owner and (force or user_id not in self._served):
+                await self._subscribe(InputCommand(**command))
+                self._served.add(user_id)
+            elif not is_owner and user_id in self._served:
+                await self._unsubscribe(user_id)
+                self._served.discard(user_id)
@@ -0,0 +1,111 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+
+from aggregator.core.index import SubscriptionIndex
+from aggregator.core.logs import RateLimitedLog
+from aggregator.core.metrics import ALERTS, EVALUATED, EVALUATE_SECONDS, PUBLISH_SECONDS
+from aggregator.gateways.rabbit.producer import Producer
+from aggregator.schemas.models import InputCommand, Tick
+
+logger = logging.getLogger(__name__)
+
+# на каждый тик и каждое уведомление, поэтому с ограничением частоты
+_log_sent = RateLimitedLog(logger, logging.INFO, "evaluator.sent")
+_log_evaluate_error = RateLimitedLog(logger, logging.ERROR, "evaluator.evaluate")
+_log_send_error = RateLimitedLog(logger, logging.ERROR, "evaluator.send")
+
+
+class Evaluator(ABC):
+    """Пороговая оценка тиков и отправка уведомлений для набора подписок"""
+
+    @abstractmethod
+    async def add(self, command: InputCommand) -> None: ...
+
+    @abstractmethod
+    async def remove(self, command: InputCommand) -> None: ...
+
+    @abstractmethod
+    async def evaluate(self, message: Tick) -> None: ...
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalEvaluator(Evaluator):
+    """Оценка в текущем процессе по инвертированному индексу"""
+
+    def __init__(self, producer: Producer):
+        self._producer = producer
+        self._index = SubscriptionIndex()
+
+    async def add(self, command: InputCommand) -> None:
+        for symbol in set(command.symbols):
+            self._index.add(
+                symbol=symbol,
+                timeframe=command.timeframe,
+                user_id=command.user_id,
+                thresholds=command.thresholds,
+                alert_mode=command.alert_mode,
+                hysteresis=command.hysteresis,
+                cooldown=command.cooldown,
+            )
+
+    async def remove(self, command: InputCommand) -> None:
+        for symbol in set(command.symbols):
+            self._index.remove(symbol=symbol, timeframe=command.timeframe, user_id=command.user_id)
+
+    async def evaluate(self, message: Tick) -> None:
+        """Отправка информации о тикере всем подписанным пользователям"""
+        try:
+            started_at = time.perf_counter()
+            user_ids, levels = self._index.evaluate(
+                message.symbol,
+                message.timeframe,
+                message.price_change_percent,
+                is_closed=message.is_closed,
+                now=message.event_time / 1000 if message.event_time is not None else None,
+            )
+            EVALUATE_SECONDS.observe(time.perf_counter() - started_at)
+            EVALUATED.inc()
+            if not user_ids:
+                return
+
+            evaluated_at = int(time.time() * 1000)
+            # схема проверяется один раз на тик с уведомлениями, для пользователей - только их поля
+            payload = message.to_message(evaluated_at=evaluated_at).model_dump(mode="json")
+            # пользователи с нулевым уровнем или отсеянные политикой в выборку не попадают
+            for user_id, change_level in zip(user_ids, levels.tolist()):
+                await self._send_user_message(message, payload, user_id=user_id, change_level=change_level)
+
+        except Exception as e:
+            _log_evaluate_error("Error in send_ticker_info for %s: %s", message.symbol, e)
+
+    async def _send_user_message(self, message: Tick, payload: dict, user_id: str, change_level: int) -> None:
+        try:
+            routing_key = f"level_{change_level}"
+
+            # payload общий для всех подписчиков тика, поэтому копируем
+            user_message = {
+                **payload,
+                "user_id": user_id,
+                "change_level": change_level,
+                "published_at": int(time.time() * 1000),
+            }
+
+            ALERTS.inc(change_level)
+            started_at = time.perf_counter()
+            await self._producer.produce(routing_key=routing_key, message=user_message)
+            PUBLISH_SECONDS.observe(time.perf_counter() - started_at, routing_key)
+            _log_sent("Sent %s change %.2f%% to level %d", message.symbol, message.price_change_percent, change_level)
+
+        except Exception as e:
+            _log_send_error("Error in send_ticker_info for user %s: %s", user_id, e)
+
+    async def stop(self) -> None:
+        # дожидаемся подтверждения всего, что осталось в буферах продюсера
+        if hasattr(self._producer, "drain"):
+            await self._producer.drain()
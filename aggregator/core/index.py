@@ -0,0 +1,196 @@
+import logging
+import time
+from collections import Counter
+
+import numpy as np
+
+from aggregator.core.policies import POLICIES, prefix_levels
+from aggregator.schemas.models import AlertMode
+
+logger = logging.getLogger(__name__)
+
+StreamKey = tuple[str, str]
+
+MODES = list(AlertMode)
+MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+
+
+class StreamSubscribers:
+    """Пороги и состояние политик всех подписчиков одного потока, строка на пользователя"""
+
+    __slots__ = (
+        "user_ids", "positions", "size", "mode_counts",
+        "thresholds", "last_fired_at", "modes", "hysteresis", "cooldown", "fired_level",
+    )
+
+    # значения пустой строки: незаполненные пороги +inf никогда не срабатывают
+    _FILL = {
+        "thresholds": np.inf,
+        "last_fired_at": -np.inf,
+        "modes": 0,
+        "hysteresis": 0.0,
+        "cooldown": 0.0,
+        "fired_level": 0,
+    }
+    _LEVEL_COLUMNS = ("thresholds", "last_fired_at")
+
+    def __init__(self, width: int, capacity: int = 16):
+        self.user_ids: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.size = 0
+        self.mode_counts: Counter = Counter()
+
+        self.thresholds = np.full((capacity, width), np.inf, dtype=np.float64)
+        self.last_fired_at = np.full((capacity, width), -np.inf, dtype=np.float64)
+        self.modes = np.zeros(capacity, dtype=np.int8)
+        self.hysteresis = np.zeros(capacity, dtype=np.float64)
+        self.cooldown = np.zeros(capacity, dtype=np.float64)
+        self.fired_level = np.zeros(capacity, dtype=np.int64)
+
+    def add(
+        self,
+        user_id: str,
+        thresholds: list[float],
+        alert_mode: AlertMode = AlertMode.EVERY_TICK,
+        hysteresis: float = 0.0,
+        cooldown: float = 0.0,
+    ) -> None:
+        if user_id in self.positions:
+            self.remove(user_id)
+
+        capacity, width = self.thresholds.shape
+        if len(thresholds) > width:
+            for name in self._LEVEL_COLUMNS:
+                column = getattr(self, name)
+                extra = np.full((capacity, len(thresholds) - width), self._FILL[name], dtype=column.dtype)
+                setattr(self, name, np.hstack((column, extra)))
+
+        if self.size == capacity:
+            for name, fill in self._FILL.items():
+                column = getattr(self, name)
+                grown = np.full((capacity * 2, *column.shape[1:]), fill, dtype=column.dtype)
+                grown[:capacity] = column
+                setattr(self, name, grown)
+
+        row = self.size
+        self._reset_row(row)
+        self.thresholds[row, :len(thresholds)] = thresholds
+        self.modes[row] = MODE_CODES[alert_mode]
+        self.hysteresis[row] = hysteresis
+        self.cooldown[row] = cooldown
+
+        self.user_ids.append(user_id)
+        self.positions[user_id] = row
+        self.mode_counts[alert_mode] += 1
+        self.size += 1
+
+    def remove(self, user_id: str) -> None:
+        """Удаление строки переносом последней на её место"""
+        row = self.positions.pop(user_id, None)
+        if row is None:
+            return
+
+        self.mode_counts[MODES[self.modes[row]]] -= 1
+        last = self.size - 1
+        if row != last:
+            moved_user = self.user_ids[last]
+            for name in self._FILL:
+                column = getattr(self, name)
+                column[row] = column[last]
+            self.user_ids[row] = moved_user
+            self.positions[moved_user] = row
+
+        self.user_ids.pop()
+        self._reset_row(last)
+        self.size -= 1
+
+    def _reset_row(self, row: int) -> None:
+        for name, fill in self._FILL.items():
+            getattr(self, name)[row] = fill
+
+    def evaluate(self, change_abs: float, is_closed: bool, now: float) -> tuple[np.ndarray, np.ndarray]:
+        """Строки, по которым политики разрешили отправку, и их уровни"""
+        levels = prefix_levels(self.thresholds[:self.size], change_abs)
+        fire = np.zeros(self.size, dtype=bool)
+
+        for mode, count in self.mode_counts.items():
+            if not count:
+                continue
+
+            if count == self.size:
+                rows = np.arange(self.size)
+            else:
+                rows = np.flatnonzero(self.modes[:self.size] == MODE_CODES[mode])
+            fire[rows] = POLICIES[mode].select(self, rows, levels[rows], change_abs, is_closed, now)
+
+        rows = np.flatnonzero(fire)
+        return rows, levels[rows]
+
+
+class SubscriptionIndex:
+    """Инвертированный индекс (symbol, timeframe) -> подписчики с их порогами"""
+
+    def __init__(self):
+        self._streams: dict[StreamKey, StreamSubscribers] = {}
+
+    @staticmethod
+    def make_key(symbol: str, timeframe: str) -> StreamKey:
+        return symbol.upper(), timeframe
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def subscribers_count(self, symbol: str, timeframe: str) -> int:
+        subscribers = self._streams.get(self.make_key(symbol, timeframe))
+        return subscribers.size if subscribers else 0
+
+    def add(
+        self,
+        symbol: str,
+        timeframe: str,
+        user_id: str,
+        thresholds: list[float],
+        alert_mode: AlertMode = AlertMode.EVERY_TICK,
+        hysteresis: float = 0.0,
+        cooldown: float = 0.0,
+    ) -> bool:
+        """Добавление подписчика, True если поток появился в индексе впервые"""
+        key = self.make_key(symbol, timeframe)
+        subscribers = self._streams.get(key)
+        is_new = subscribers is None
+        if is_new:
+            subscribers = self._streams[key] = StreamSubscribers(width=max(len(thresholds), 1))
+
+        subscribers.add(user_id, thresholds, alert_mode=alert_mode, hysteresis=hysteresis, cooldown=cooldown)
+        return is_new
+
+    def remove(self, symbol: str, timeframe: str, user_id: str) -> bool:
+        """Удаление подписчика, True если у потока не осталось подписчиков"""
+        key = self.make_key(symbol, timeframe)
+        subscribers = self._streams.get(key)
+        if subscribers is None:
+            return False
+
+        subscribers.remove(user_id)
+        if subscribers.size:
+            return False
+
+        del self._streams[key]
+        return True
+
+    def evaluate(
+        self, symbol: str, timeframe: str, change_percent: float, is_closed: bool = False, now: float | None = None
+    ) -> tuple[list[str], np.ndarray]:
+        """Пользователи, которым нужно отправить уведомление по тику, и их уровни
+
+        now - время тика в секундах эпохи (по event_time Binance), по нему считается cooldown,
+        поэтому прогон записей дает те же срабатывания при любой скорости воспроизведения.
+        """
+        subscribers = self._streams.get(self.make_key(symbol, timeframe))
+        if subscribers is None or not subscribers.size:
+            return [], np.empty(0, dtype=np.int64)
+
+        if now is None:
+            now = time.time()
+        rows, levels = subscribers.evaluate(abs(change_percent), is_closed, now)
+        return [subscribers.user_ids[row] for row in rows], levels
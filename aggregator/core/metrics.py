@@ -0,0 +1,110 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs
+
+from common.metrics import Registry
+from aggregator.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+registry = Registry()
+
+# этапы от кадра Binance до публикации уведомления
+WS_RECEIVED = registry.counter("aggregator_ws_frames_total", "Kline frames received from Binance", ("connection",))
+WS_RECEIVE_LAG = registry.histogram(
+    "aggregator_ws_receive_lag_seconds", "Binance event time to frame receive, includes clock skew"
+)
+DECODE_SECONDS = registry.histogram("aggregator_decode_seconds", "Kline frame decode time")
+DECODE_ERRORS = registry.counter("aggregator_decode_errors_total", "Frames that failed to decode")
+EVALUATED = registry.counter("aggregator_evaluated_total", "Ticks evaluated against subscriptions")
+EVALUATE_SECONDS = registry.histogram("aggregator_evaluate_seconds", "Threshold evaluation time per tick")
+ALERTS = registry.counter("aggregator_alerts_total", "Alerts produced by evaluation", ("level",))
+PUBLISH_SECONDS = registry.histogram(
+    "aggregator_publish_seconds", "Time spent in Producer.produce per alert", ("routing_key",)
+)
+BROKER_CONFIRM_SECONDS = registry.histogram(
+    "aggregator_broker_confirm_seconds", "RabbitMQ publish round trip until broker confirmation"
+)
+PUBLISHED = registry.counter("aggregator_published_total", "Messages published to RabbitMQ", ("result",))
+PUBLISH_DROPPED = registry.counter(
+    "aggregator_publish_dropped_total", "Alerts dropped after all publish retries failed", ("routing_key",)
+)
+WORKER_DROPPED = registry.counter(
+    "aggregator_worker_dropped_ticks_total", "Ticks dropped because an evaluation worker queue was full"
+)
+WORKER_RESTARTS = registry.counter("aggregator_worker_restarts_total", "Evaluation worker processes restarted")
+COMMANDS = registry.counter("aggregator_commands_total", "Subscription commands processed", ("action",))
+
+
+class MetricsServer:
+    """Минимальный HTTP-сервер без внешних зависимостей: /metrics, /status (json) и /profile?seconds=N"""
+
+    def __init__(
+        self,
+        metrics: Registry = registry,
+        host: str = settings.AGGREGATOR_METRICS_HOST,
+        port: int = settings.AGGREGATOR_METRICS_PORT,
+        status: Callable[[], dict] | None = None,
+        profiler: Callable[[float], Awaitable[str]] | None = None,
+    ):
+        self.registry = metrics
+        self.host = host
+        self.port = port
+        self._status = status
+        self._profiler = profiler
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Metrics endpoint listening on {self.host}:{self.port}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+            # заголовки запроса не нужны, но их надо дочитать до пустой строки
+            while (await asyncio.wait_for(reader.readline(), timeout=5.0)).strip():
+                pass
+
+            parts = request_line.decode("latin-1").split()
+            path, _, query = parts[1].partition("?") if len(parts) > 1 else ("", "", "")
+            status, content_type, body = await self._route(path, parse_qs(query))
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    async def _route(self, path: str, query: dict[str, list[str]]) -> tuple[str, str, bytes]:
+        text = "text/plain; version=0.0.4; charset=utf-8"
+        if path == "/metrics":
+            return "200 OK", text, self.registry.render().encode()
+
+        if path == "/status" and self._status is not None:
+            try:
+                return "200 OK", "application/json", json.dumps(self._status(), default=str).encode()
+            except Exception as e:
+                logger.error(f"Failed to build status: {e}")
+                return "500 Internal Server Error", text, f"{e}\n".encode()
+
+        if path == "/profile" and self._profiler is not None:
+            try:
+                seconds = float(query.get("seconds", ["5"])[0])
+                return "200 OK", text, (await self._profiler(seconds)).encode()
+            except (ValueError, RuntimeError) as e:
+                return "409 Conflict", text, f"{e}\n".encode()
+
+        return "404 Not Found", text, b"not found\n"
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
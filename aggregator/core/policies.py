@@ -0,0 +1,93 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from aggregator.schemas.models import AlertMode
+
+if TYPE_CHECKING:
+    from aggregator.core.index import StreamSubscribers
+
+
+def prefix_levels(thresholds: np.ndarray, change_abs: float | np.ndarray) -> np.ndarray:
+    """Уровень - длина префикса пройденных порогов, как в исходном цикле с break"""
+    hits = thresholds <= change_abs
+    return np.logical_and.accumulate(hits, axis=1).sum(axis=1)
+
+
+class AlertPolicy(ABC):
+    """Отбор срабатываний среди строк одного режима, состояние хранится в StreamSubscribers"""
+
+    @abstractmethod
+    def select(
+        self,
+        subscribers: "StreamSubscribers",
+        rows: np.ndarray,
+        levels: np.ndarray,
+        change_abs: float,
+        is_closed: bool,
+        now: float,
+    ) -> np.ndarray: ...
+
+
+class EveryTickPolicy(AlertPolicy):
+    """Каждый тик выше порога, поведение по умолчанию"""
+
+    def select(self, subscribers, rows, levels, change_abs, is_closed, now):
+        return levels > 0
+
+
+class CloseOnlyPolicy(AlertPolicy):
+    """Только закрытые свечи (флаг k.x)"""
+
+    def select(self, subscribers, rows, levels, change_abs, is_closed, now):
+        if not is_closed:
+            return np.zeros(len(rows), dtype=bool)
+        return levels > 0
+
+
+class RisingPolicy(AlertPolicy):
+    """Только рост уровня внутри свечи, сброс на закрытии"""
+
+    def select(self, subscribers, rows, levels, change_abs, is_closed, now):
+        fired = subscribers.fired_level[rows]
+        fire = levels > fired
+        subscribers.fired_level[rows] = 0 if is_closed else np.where(fire, levels, fired)
+        return fire
+
+
+class HysteresisPolicy(AlertPolicy):
+    """Повтор уровня только после отката ниже порога на величину гистерезиса"""
+
+    def select(self, subscribers, rows, levels, change_abs, is_closed, now):
+        rearm_levels = prefix_levels(
+            subscribers.thresholds[rows], change_abs + subscribers.hysteresis[rows][:, None]
+        )
+        armed = np.minimum(subscribers.fired_level[rows], rearm_levels)
+        fire = levels > armed
+        subscribers.fired_level[rows] = np.where(fire, levels, armed)
+        return fire
+
+
+class CooldownPolicy(AlertPolicy):
+    """Не чаще одного срабатывания уровня за cooldown секунд для пользователя и символа"""
+
+    def select(self, subscribers, rows, levels, change_abs, is_closed, now):
+        level_idx = np.maximum(levels - 1, 0)
+        last_fired_at = subscribers.last_fired_at[rows, level_idx]
+        fire = (levels > 0) & (now - last_fired_at >= subscribers.cooldown[rows])
+        subscribers.last_fired_at[rows[fire], level_idx[fire]] = now
+        return fire
+
+
+POLICIES: dict[AlertMode, AlertPolicy] = {
+    AlertMode.EVERY_TICK: EveryTickPolicy(),
+    AlertMode.CLOSE_ONLY: CloseOnlyPolicy(),
+    AlertMode.RISING: RisingPolicy(),
+    AlertMode.HYSTERESIS: HysteresisPolicy(),
+    AlertMode.COOLDOWN: CooldownPolicy(),
+}
+
+
+def register_policy(mode: AlertMode, policy: AlertPolicy) -> None:
+    POLICIES[mode] = policy
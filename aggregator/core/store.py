@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+
+from aggregator.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.json"
+JOURNAL_FILE = "journal.log"
+
+# операции журнала
+SET = "set"
+DELETE = "del"
+
+
+class SubscriptionStore:
+    """Таблица подписок на диске: сжатый снимок и журнал изменений после него
+
+    Каждое изменение дописывается строкой в журнал, после compact_every записей
+    таблица целиком переписывается в снимок, а журнал обнуляется.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.AGGREGATOR_STORE_PATH,
+        compact_every: int = settings.AGGREGATOR_STORE_COMPACT_EVERY,
+        fsync: bool = settings.AGGREGATOR_STORE_FSYNC,
+    ):
+        self.path = path
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._table: dict[str, dict] = {}
+        self._journal = None
+        self._journal_records = 0
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.path, SNAPSHOT_FILE)
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.path, JOURNAL_FILE)
+
+    def load(self) -> dict[str, dict]:
+        """Чтение снимка и применение журнала, возвращает команды подписки по user_id"""
+        os.makedirs(self.path, exist_ok=True)
+        self._table = {}
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as file:
+                self._table = {command["user_id"]: command for command in json.load(file)}
+
+        if self._journal is not None:
+            self._journal.close()
+        self._journal_records = 0
+
+        if os.path.exists(self.journal_path):
+            # длина журнала до конца последней целой строки
+            complete_size = 0
+            with open(self.journal_path, "rb") as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        # недописанная строка после аварийной остановки
+                        logger.warning(f"Dropping torn journal record in {self.journal_path}")
+                        break
+                    complete_size += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping broken journal record in {self.journal_path}")
+                        continue
+                    self._apply(record)
+                    self._journal_records += 1
+
+            # без обрезки следующая запись приклеилась бы к обрывку и потерялась при следующей загрузке
+            if complete_size < os.path.getsize(self.journal_path):
+                os.truncate(self.journal_path, complete_size)
+
+        self._journal = open(self.journal_path, "ab")
+        logger.info(f"Loaded {len(self._table)} subscriptions from {self.path}")
+        return dict(self._table)
+
+    def _apply(self, record: dict) -> None:
+        if record["op"] == SET:
+            self._table[record["command"]["user_id"]] = record["command"]
+        elif record["op"] == DELETE:
+            self._table.pop(record["user_id"], None)
+
+    def _append(self, record: dict) -> None:
+        self._apply(record)
+        if self._journal is None:
+            return
+
+        self._journal.write(json.dumps(record).encode() + b"\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+        self._journal_records += 1
+        if self._journal_records >= self.compact_every:
+            self.compact()
+
+    def save(self, command: dict) -> None:
+        self._append({"op": SET, "command": command})
+
+    def delete(self, user_id: str) -> None:
+        if user_id in self._table:
+            self._append({"op": DELETE, "user_id": user_id})
+
+    def compact(self) -> None:
+        """Запись снимка во временный файл с атомарной заменой, затем обнуление журнала"""
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(json.dumps(list(self._table.values())).encode())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, "wb")
+        self._journal_records = 0
+        logger.info(f"Compacted {len(self._table)} subscriptions into {self.snapshot_path}")
+
+    def close(self) -> None:
+        if self._journal is None:
+            return
+        self.compact()
+        self._journal.close()
+        self._journal = None
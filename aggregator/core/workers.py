@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import multiprocessing
+import zlib
+from collections import defaultdict
+from typing import Any
+
+from aggregator.core.evaluator import Evaluator, LocalEvaluator
+from aggregator.core.logs import RateLimitedLog, setup_logging
+from aggregator.core.metrics import WORKER_DROPPED, WORKER_RESTARTS, registry
+from aggregator.core.settings import settings
+from aggregator.schemas.models import InputCommand, Tick
+
+logger = logging.getLogger(__name__)
+
+_log_dropped = RateLimitedLog(logger, logging.WARNING, "workers.dropped")
+
+# типы сообщений во входной очереди процесса оценки
+ADD = "add"
+REMOVE = "remove"
+TICKS = "ticks"
+STOP = "stop"
+
+
+def shard_for(symbol: str, shards: int) -> int:
+    """Номер процесса для символа, стабильный между процессами и перезапусками"""
+    return zlib.crc32(symbol.upper().encode()) % shards
+
+
+def pack_tick(message: Tick) -> tuple:
+    return message.as_tuple()
+
+
+def unpack_tick(fields: tuple) -> Tick:
+    return Tick(*fields)
+
+
+def run_worker(worker_id: int, inbox: multiprocessing.Queue, reports: multiprocessing.Queue, pending) -> None:
+    """Точка входа процесса оценки, pending - семафор пачек тиков в очереди процесса"""
+    setup_logging(fmt=f"%(asctime)s - worker-{worker_id} - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(_worker_main(worker_id, inbox, reports, pending))
+
+
+async def _report_metrics(worker_id: int, reports: multiprocessing.Queue) -> None:
+    """Периодическая отправка накопительного снимка метрик процесса оценки супервизору"""
+    while True:
+        await asyncio.sleep(settings.AGGREGATOR_METRICS_REPORT_INTERVAL)
+        reports.put((worker_id, registry.snapshot()))
+
+
+async def _worker_main(worker_id: int, inbox: multiprocessing.Queue, reports: multiprocessing.Queue, pending) -> None:
+    # импорт здесь, чтобы супервизор не тянул RabbitMQ-зависимости процесса оценки
+    from aggregator.gateways.rabbit.base import RabbitMqConnector
+    from aggregator.gateways.rabbit.producer import PipelinedRabbitMqProducer, RabbitMqProducer
+
+    connector = RabbitMqConnector()
+    await connector.connect()
+
+    if settings.RABBITMQ_PIPELINED_PUBLISHING:
+        producer = PipelinedRabbitMqProducer(connector=connector)
+    else:
+        producer = RabbitMqProducer(connector=connector)
+    evaluator = LocalEvaluator(producer=producer)
+
+    loop = asyncio.get_running_loop()
+    report_task = asyncio.create_task(_report_metrics(worker_id, reports))
+    logger.info(f"Worker {worker_id} started")
+    try:
+        while True:
+            kind, payload = await loop.run_in_executor(None, inbox.get)
+            if kind == TICKS:
+                try:
+                    for fields in payload:
+                        await evaluator.evaluate(unpack_tick(fields))
+                finally:
+                    pending.release()
+            elif kind == ADD:
+                await evaluator.add(InputCommand(**payload))
+            elif kind == REMOVE:
+                await evaluator.remove(InputCommand(**payload))
+            elif kind == STOP:
+                break
+    finally:
+        report_task.cancel()
+        await evaluator.stop()
+        reports.put((worker_id, registry.snapshot()))
+        await connector.disconnect()
+        logger.info(f"Worker {worker_id} stopped")
+
+
+class ProcessPoolEvaluator(Evaluator):
+    """Оценка в N процессах, каждый владеет подписками своих символов и публикует сам
+
+    Супервизор хранит все подписки: упавший процесс перезапускается, и ему заново
+    отправляется его часть подписок. Очередь тиков процесса ограничена max_pending
+    пачками, пока процесс не успевает или не перезапущен, новые пачки отбрасываются.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.AGGREGATOR_WORKERS,
+        batch_size: int = settings.AGGREGATOR_WORKER_BATCH_SIZE,
+        max_pending: int = settings.AGGREGATOR_WORKER_MAX_PENDING,
+        check_interval: float = settings.AGGREGATOR_WORKER_CHECK_INTERVAL,
+        stop_timeout: float = 10.0,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.check_interval = check_interval
+        self.stop_timeout = stop_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._inboxes: dict[int, multiprocessing.Queue] = {}
+        self._pending: dict[int, Any] = {}
+        self._processes: dict[int, multiprocessing.Process] = {}
+        self._buffers: list[list[tuple]] = [[] for _ in range(workers)]
+        self._flush_scheduled = False
+        # подписки по user_id для повторной отправки перезапущенному процессу
+        self._commands: dict[str, InputCommand] = {}
+        # снимки метрик от процессов оценки, выдаются вместе с метриками супервизора
+        self._reports: multiprocessing.Queue | None = None
+        self._collect_task: asyncio.Task | None = None
+        self._watch_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._reports = self._context.Queue()
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+        self._collect_task = asyncio.create_task(self._collect_reports())
+        self._watch_task = asyncio.create_task(self._watch())
+        logger.info(f"Started {self.workers} evaluation workers")
+
+    def _spawn(self, worker_id: int) -> None:
+        inbox = self._context.Queue()
+        # новый семафор: пачки в очереди упавшего процесса уже никто не подтвердит
+        pending = self._context.BoundedSemaphore(self.max_pending)
+        process = self._context.Process(
+            target=run_worker,
+            args=(worker_id, inbox, self._reports, pending),
+            name=f"aggregator-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._inboxes[worker_id] = inbox
+        self._pending[worker_id] = pending
+        self._processes[worker_id] = process
+
+    async def _watch(self) -> None:
+        """Перезапуск упавших процессов оценки с повторной отправкой их подписок"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for worker_id, process in list(self._processes.items()):
+                if not process.is_alive():
+                    self._restart(worker_id, process.exitcode)
+
+    def _restart(self, worker_id: int, exitcode: int | None) -> None:
+        logger.error(f"Evaluation worker {worker_id} exited with code {exitcode}, restarting")
+        WORKER_RESTARTS.inc()
+
+        # очередь упавшего процесса больше не читается, ее содержимое отбрасывается
+        inbox = self._inboxes[worker_id]
+        inbox.cancel_join_thread()
+        inbox.close()
+
+        self._spawn(worker_id)
+        for command in self._commands.values():
+            part = self._split(command).get(worker_id)
+            if part is not None:
+                self._inboxes[worker_id].put((ADD, part.model_dump(mode="json")))
+
+    async def _collect_reports(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            report = await loop.run_in_executor(None, self._reports.get)
+            if report is None:
+                return
+            worker_id, snapshot = report
+            registry.update_remote(f"worker-{worker_id}", snapshot)
+
+    def _split(self, command: InputCommand) -> dict[int, InputCommand]:
+        """Разбиение подписки по процессам, каждому - только его символы"""
+        symbols_by_shard = defaultdict(list)
+        for symbol in set(command.symbols):
+            symbols_by_shard[shard_for(symbol, self.workers)].append(symbol)
+        return {
+            shard: command.model_copy(update={"symbols": symbols})
+            for shard, symbols in symbols_by_shard.items()
+        }
+
+    async def add(self, command: InputCommand) -> None:
+        self._commands[command.user_id] = command
+        for shard, part in self._split(command).items():
+            self._inboxes[shard].put((ADD, part.model_dump(mode="json")))
+
+    async def remove(self, command: InputCommand) -> None:
+        self._commands.pop(command.user_id, None)
+        for shard, part in self._split(command).items():
+            self._inboxes[shard].put((REMOVE, part.model_dump(mode="json")))
+
+    async def evaluate(self, message: Tick) -> None:
+        """Буферизация тика, пачки уходят по размеру или в конце итерации цикла событий"""
+        shard = shard_for(message.symbol, self.workers)
+        buffer = self._buffers[shard]
+        buffer.append(pack_tick(message))
+
+        if len(buffer) >= self.batch_size:
+            self._flush(shard)
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush_all)
+
+    def _flush(self, shard: int) -> None:
+        batch, self._buffers[shard] = self._buffers[shard], []
+        if not batch:
+            return
+
+        # процесс не успевает или упал: пачка отбрасывается, а не копится в памяти супервизора
+        if not self._pending[shard].acquire(False):
+            WORKER_DROPPED.inc(value=len(batch))
+            _log_dropped("Evaluation worker %d queue is full, dropped %d ticks", shard, len(batch))
+            return
+        self._inboxes[shard].put((TICKS, batch))
+
+    def _flush_all(self) -> None:
+        self._flush_scheduled = False
+        for shard in range(self.workers):
+            self._flush(shard)
+
+    async def stop(self) -> None:
+        if not self._processes:
+            return
+
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+
+        self._flush_all()
+        for inbox in self._inboxes.values():
+            inbox.put((STOP, None))
+
+        loop = asyncio.get_running_loop()
+        for process in self._processes.values():
+            await loop.run_in_executor(None, process.join, self.stop_timeout)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in {self.stop_timeout}s, terminating")
+                process.terminate()
+
+        # последние снимки процессов уже в очереди, None завершает сборщик после них
+        self._reports.put(None)
+        await self._collect_task
+        self._processes.clear()
+        self._inboxes.clear()
+        self._pending.clear()
+        logger.info("Evaluation workers stopped")
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from aggregator.core.logs import RateLimitedLog
+
+logger = logging.getLogger(__name__)
+
+_log_evaluate_error = RateLimitedLog(logger, logging.ERROR, "conflator.evaluate")
+
+StreamKey = tuple[str, str]
+Handler = Callable[[StreamKey, Any], Awaitable[None]]
+
+
+class ConflatedSlot:
+    """Последнее необработанное сообщение потока и счетчики"""
+
+    __slots__ = (
+        "latest", "kept", "ready", "min_interval", "last_evaluated_at", "received", "evaluated", "dropped", "task",
+    )
+
+    def __init__(self, min_interval: float):
+        self.latest: Any = None
+        # сообщение, которое нельзя схлопнуть следующим (например закрытие свечи)
+        self.kept: Any = None
+        self.ready = asyncio.Event()
+        self.min_interval = min_interval
+        self.last_evaluated_at = 0.0
+        self.received = 0
+        self.evaluated = 0
+        self.dropped = 0
+        self.task: asyncio.Task | None = None
+
+
+class Conflator:
+    """Оценка только последнего сообщения потока не чаще min_interval, промежуточные отбрасываются"""
+
+    def __init__(self, handler: Handler, default_interval: float = 0.0):
+        self._handler = handler
+        self._default_interval = default_interval
+        self._intervals: dict[StreamKey, float] = {}
+        self._slots: dict[StreamKey, ConflatedSlot] = {}
+
+    def set_min_interval(self, key: StreamKey, interval: float) -> None:
+        self._intervals[key] = max(interval, 0.0)
+        if key in self._slots:
+            self._slots[key].min_interval = self._intervals[key]
+
+    def open(self, key: StreamKey) -> None:
+        if key in self._slots:
+            return
+
+        slot = ConflatedSlot(min_interval=self._intervals.get(key, self._default_interval))
+        slot.task = asyncio.create_task(self._drain(key, slot))
+        self._slots[key] = slot
+
+    async def close(self, key: StreamKey) -> None:
+        slot = self._slots.pop(key, None)
+        if slot is None or slot.task is None:
+            return
+
+        slot.task.cancel()
+        try:
+            await slot.task
+        except asyncio.CancelledError:
+            pass
+
+    def push(self, key: StreamKey, message: Any, keep: bool = False) -> None:
+        """Неблокирующая запись, keep=True защищает сообщение от схлопывания следующим"""
+        slot = self._slots.get(key)
+        if slot is None:
+            return
+
+        slot.received += 1
+        if slot.latest is not None:
+            slot.dropped += 1
+            slot.latest = None
+
+        if keep:
+            if slot.kept is not None:
+                slot.dropped += 1
+            slot.kept = message
+        else:
+            slot.latest = message
+        slot.ready.set()
+
+    async def _drain(self, key: StreamKey, slot: ConflatedSlot) -> None:
+        while True:
+            await slot.ready.wait()
+
+            delay = slot.last_evaluated_at + slot.min_interval - time.monotonic()
+            if delay > 0:
+                # пока ждем, новые сообщения перезаписывают latest
+                await asyncio.sleep(delay)
+
+            slot.ready.clear()
+            # сохраненное сообщение всегда старше latest, оцениваем по порядку
+            messages = (slot.kept, slot.latest)
+            slot.kept = slot.latest = None
+
+            slot.last_evaluated_at = time.monotonic()
+            for message in messages:
+                if message is None:
+                    continue
+
+                slot.evaluated += 1
+                try:
+                    await self._handler(key, message)
+                except Exception as e:
+                    _log_evaluate_error("Error evaluating conflated message for %s: %s", key, e)
+
+    def stats(self) -> dict[StreamKey, dict[str, float]]:
+        return {
+            key: {
+                "received": slot.received,
+                "evaluated": slot.evaluated,
+                "dropped": slot.dropped,
+                "min_interval": slot.min_interval,
+            }
+            for key, slot in self._slots.items()
+        }
+
+    async def stop(self) -> None:
+        for key in list(self._slots.keys()):
+            await self.close(key)
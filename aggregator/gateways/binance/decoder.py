@@ -0,0 +1,85 @@
+import json
+import logging
+
+from aggregator.core.logs import RateLimitedLog
+from aggregator.schemas.models import Tick
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson опционален
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+_log_decode_error = RateLimitedLog(logger, logging.ERROR, "decoder.frame")
+_log_tick_error = RateLimitedLog(logger, logging.ERROR, "decoder.tick")
+
+
+class KlineFrame:
+    """Поля kline-кадра combined stream, которые реально используются сервисом"""
+
+    __slots__ = ("stream", "symbol", "open_time", "open_price", "close_price", "is_closed", "event_time", "close_time")
+
+    def __init__(
+        self,
+        stream: str,
+        symbol: str,
+        open_time: int,
+        open_price: float,
+        close_price: float,
+        is_closed: bool,
+        event_time: int,
+        close_time: int | None = None,
+    ):
+        self.stream = stream
+        self.symbol = symbol
+        self.open_time = open_time
+        self.open_price = open_price
+        self.close_price = close_price
+        self.is_closed = is_closed
+        self.event_time = event_time
+        self.close_time = close_time
+
+    def __repr__(self) -> str:
+        return (
+            f"KlineFrame(stream={self.stream!r}, open_time={self.open_time}, open_price={self.open_price}, "
+            f"close_price={self.close_price}, is_closed={self.is_closed}, event_time={self.event_time}, "
+            f"close_time={self.close_time})"
+        )
+
+
+def decode_frame(raw: bytes | str) -> KlineFrame | None:
+    """Однопроходный разбор сырого кадра, без повторной сериализации вложенного data"""
+    try:
+        data = _loads(raw)
+        payload = data["data"]
+        kline = payload["k"]
+        stream = data["stream"]
+        return KlineFrame(
+            stream=stream,
+            symbol=stream.partition("@")[0].upper(),
+            open_time=kline["t"],
+            open_price=float(kline["o"]),
+            close_price=float(kline["c"]),
+            is_closed=kline["x"],
+            event_time=payload["E"],
+            close_time=kline.get("T"),
+        )
+    except Exception as e:
+        _log_decode_error("Error decoding kline frame: %s", e)
+        return None
+
+
+def frame_to_tick(frame: KlineFrame, timeframe: str) -> Tick | None:
+    """Тик из разобранного кадра: процент изменения close относительно open свечи"""
+    try:
+        price_change_percent = ((frame.close_price - frame.open_price) / frame.open_price) * 100
+        return Tick(
+            frame.symbol, timeframe, price_change_percent, frame.open_price, frame.close_price,
+            frame.open_time, frame.is_closed, frame.event_time, frame.close_time,
+        )
+    except Exception as e:
+        _log_tick_error("Error processing frame %s: %s", frame.stream, e)
+        return None
@@ -0,0 +1,153 @@
+import logging
+from typing import Awaitable, Callable
+
+from aggregator.core.logs import RateLimitedLog
+from aggregator.core.settings import settings
+from aggregator.gateways.binance.conflation import Conflator
+from aggregator.gateways.binance.pool import BINANCE_TIMEFRAMES, StreamKey, StreamPool, make_key, parse_stream_name
+from aggregator.gateways.binance.rollup import BASE_TIMEFRAME, SymbolRollup, parse_timeframe
+from aggregator.schemas.models import Tick
+
+logger = logging.getLogger(__name__)
+
+_log_listener_error = RateLimitedLog(logger, logging.ERROR, "hub.listener")
+
+Listener = Callable[[Tick], Awaitable[None]]
+
+
+class StreamHub:
+    """Одна upstream-подписка на (symbol, timeframe), тики всех потоков уходят одному обработчику
+
+    Сколько пользователей держат поток, хаб не считает: open и close вызывает владелец
+    счетчика ссылок (MainService) на первом и последнем пользователе потока.
+    """
+
+    def __init__(
+        self,
+        pool: StreamPool,
+        min_eval_interval: float = settings.BINANCE_MIN_EVAL_INTERVAL,
+        derive_timeframes: bool = settings.BINANCE_DERIVE_TIMEFRAMES,
+    ):
+        self._pool = pool
+        self._listener: Listener | None = None
+        self._streams: set[StreamKey] = set()
+        self._conflator = Conflator(handler=self._dispatch, default_interval=min_eval_interval)
+        self._pool.bind(self._on_message)
+
+        # таймфреймы, собираемые локально из одного потока 1m на символ
+        self.derive_timeframes = derive_timeframes
+        self._rollups: dict[StreamKey, SymbolRollup] = {}
+
+        for name, interval in settings.BINANCE_STREAM_EVAL_INTERVALS.items():
+            self._conflator.set_min_interval(parse_stream_name(name), interval)
+
+    def set_min_interval(self, symbol: str, timeframe: str, interval: float) -> None:
+        """Минимальный интервал между оценками потока, 0 - оценивать каждое последнее сообщение"""
+        self._conflator.set_min_interval(make_key(symbol, timeframe), interval)
+
+    def stats(self) -> dict:
+        # ключи-кортежи не сериализуются в json, поэтому в статусе поток записан как "BTCUSDT@1m"
+        streams = {f"{symbol}@{timeframe}": stream for (symbol, timeframe), stream in self._conflator.stats().items()}
+        return {"streams": streams, "connections": self._pool.stats()}
+
+    def bind(self, listener: Listener) -> None:
+        self._listener = listener
+
+    @property
+    def active_streams(self) -> list[StreamKey]:
+        return list(self._streams)
+
+    @property
+    def upstream_streams(self) -> list[StreamKey]:
+        return list(self._rollups.keys()) + [key for key in self._streams if not self._is_derived(key)]
+
+    def supports(self, timeframe: str | None) -> bool:
+        """Таймфрейм есть среди потоков Binance или собирается из минутных свечей"""
+        return timeframe in BINANCE_TIMEFRAMES or self._is_derived(("", timeframe))
+
+    def _is_derived(self, key: StreamKey) -> bool:
+        return self.derive_timeframes and parse_timeframe(key[1]) is not None
+
+    async def open(self, symbol: str, timeframe: str) -> None:
+        key = make_key(symbol, timeframe)
+        if key in self._streams:
+            return
+
+        self._streams.add(key)
+        self._conflator.open(key)
+        await self._open_upstream(key)
+        logger.info(f"Opened stream {key}")
+
+    async def close(self, symbol: str, timeframe: str) -> None:
+        key = make_key(symbol, timeframe)
+        if key not in self._streams:
+            return
+
+        self._streams.discard(key)
+        await self._close_upstream(key)
+        await self._conflator.close(key)
+        logger.info(f"Closed stream {key}")
+
+    async def _open_upstream(self, key: StreamKey) -> None:
+        if not self._is_derived(key):
+            await self._pool.add(key)
+            return
+
+        upstream_key = (key[0], BASE_TIMEFRAME)
+        rollup = self._rollups.get(upstream_key)
+        if rollup is None:
+            rollup = self._rollups[upstream_key] = SymbolRollup(upstream_key[0])
+            await self._pool.add(upstream_key)
+        rollup.add(key[1])
+
+    async def _close_upstream(self, key: StreamKey) -> None:
+        if not self._is_derived(key):
+            await self._pool.remove(key)
+            return
+
+        upstream_key = (key[0], BASE_TIMEFRAME)
+        rollup = self._rollups.get(upstream_key)
+        if rollup is None:
+            return
+
+        rollup.remove(key[1])
+        if not len(rollup):
+            del self._rollups[upstream_key]
+            await self._pool.remove(upstream_key)
+
+    def _on_message(self, key: StreamKey, message: Tick) -> None:
+        # чтение из сокета не ждет оценки, устаревшие тики схлопываются,
+        # закрытие свечи не схлопывается - на нем работает режим close_only
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            self._conflator.push(key, message, keep=message.is_closed)
+            return
+
+        # окна обновляются на каждом тике до схлопывания, чтобы не потерять open окна
+        for derived in rollup.update(message):
+            self._conflator.push((key[0], derived.timeframe), derived, keep=derived.is_closed)
+
+    async def deliver(self, key: StreamKey, message: Tick) -> None:
+        """Подача сообщения мимо схлопывания с ожиданием оценки, для офлайн-прогона записей"""
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            await self._dispatch(key, message)
+            return
+
+        for derived in rollup.update(message):
+            await self._dispatch((key[0], derived.timeframe), derived)
+
+    async def _dispatch(self, key: StreamKey, message: Tick) -> None:
+        """Передача одного декодированного сообщения обработчику, если поток еще открыт"""
+        if self._listener is None or key not in self._streams:
+            return
+        try:
+            await self._listener(message)
+        except Exception as e:
+            _log_listener_error("Error in listener for %s: %s", key, e)
+
+    async def stop(self) -> None:
+        self._streams.clear()
+        self._rollups.clear()
+        await self._pool.stop()
+        await self._conflator.stop()
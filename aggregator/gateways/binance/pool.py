@@ -0,0 +1,365 @@
+import asyncio
+import itertools
+import json
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable
+
+import websockets
+
+from aggregator.core.metrics import DECODE_ERRORS, DECODE_SECONDS, WS_RECEIVED, WS_RECEIVE_LAG
+from aggregator.core.settings import settings
+from aggregator.gateways.binance.decoder import decode_frame, frame_to_tick
+
+logger = logging.getLogger(__name__)
+
+StreamKey = tuple[str, str]
+MessageHandler = Callable[[StreamKey, Any], None]
+
+# интервалы kline-потоков Binance, остальные таймфреймы можно только собрать из минутных свечей
+BINANCE_TIMEFRAMES = frozenset({
+    "1s", "1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h", "6h", "8h", "12h", "1d", "3d", "1w", "1M",
+})
+
+
+def make_key(symbol: str, timeframe: str) -> StreamKey:
+    return symbol.upper(), timeframe
+
+
+def stream_name(key: StreamKey) -> str:
+    symbol, timeframe = key
+    return f"{symbol.lower()}@kline_{timeframe}"
+
+
+def parse_stream_name(name: str) -> StreamKey:
+    symbol, _, kline = name.partition("@")
+    return symbol.upper(), kline.removeprefix("kline_")
+
+
+class ControlRejected(RuntimeError):
+    """Binance отклонил SUBSCRIBE/UNSUBSCRIBE, повтор того же запроса не поможет"""
+
+
+class StreamPool(ABC):
+    """Источник сообщений для динамического набора потоков"""
+
+    _on_message: MessageHandler | None = None
+
+    def bind(self, on_message: MessageHandler) -> None:
+        self._on_message = on_message
+
+    def _emit(self, key: StreamKey, message: Any) -> None:
+        if self._on_message is not None:
+            self._on_message(key, message)
+
+    @abstractmethod
+    async def add(self, key: StreamKey) -> None: ...
+
+    @abstractmethod
+    async def remove(self, key: StreamKey) -> None: ...
+
+    @abstractmethod
+    def stats(self) -> list[dict]: ...
+
+    @abstractmethod
+    async def stop(self) -> None: ...
+
+
+class Shard:
+    """Одно websocket-соединение и закрепленные за ним потоки"""
+
+    __slots__ = (
+        "shard_id", "streams", "subscribed", "rejected", "pending", "websocket", "task", "sync_task",
+        "sync_failures", "received", "rate", "window_started", "window_count",
+    )
+
+    def __init__(self, shard_id: int):
+        self.shard_id = shard_id
+        # потоки, которые должны быть на соединении
+        self.streams: set[StreamKey] = set()
+        # потоки, подтвержденные сервером
+        self.subscribed: set[StreamKey] = set()
+        # потоки, которые Binance отказался подписывать, на соединение они больше не отправляются
+        self.rejected: set[StreamKey] = set()
+        self.pending: dict[int, asyncio.Future] = {}
+        self.websocket = None
+        self.task: asyncio.Task | None = None
+        self.sync_task: asyncio.Task | None = None
+        # неудачные синхронизации подряд, по ним растет пауза перед следующей
+        self.sync_failures = 0
+        self.received = 0
+        self.rate = 0.0
+        self.window_started = time.monotonic()
+        self.window_count = 0
+
+    @property
+    def wanted(self) -> set[StreamKey]:
+        return self.streams - self.rejected
+
+    def count_message(self) -> None:
+        self.received += 1
+        self.window_count += 1
+        now = time.monotonic()
+        elapsed = now - self.window_started
+        if elapsed >= 1.0:
+            self.rate = self.window_count / elapsed
+            self.window_started = now
+            self.window_count = 0
+
+
+class BinanceStreamPool(StreamPool):
+    """Шардирование потоков по нескольким combined-stream соединениям Binance"""
+
+    def __init__(
+        self,
+        streams_per_connection: int = settings.BINANCE_STREAMS_PER_CONNECTION,
+        reconnect_delay: int = 5,
+        control_delay: float = 0.5,
+        ack_timeout: float = 10.0,
+        max_control_backoff: float = 30.0,
+    ):
+        self.streams_per_connection = streams_per_connection
+        self.reconnect_delay = reconnect_delay
+        # Binance принимает не больше 5 управляющих сообщений в секунду на соединение,
+        # поэтому изменения копятся и уходят одним SUBSCRIBE и одним UNSUBSCRIBE
+        self.control_delay = control_delay
+        self.ack_timeout = ack_timeout
+        # после неудачной синхронизации пауза удваивается до этого предела
+        self.max_control_backoff = max_control_backoff
+        self._shards: dict[int, Shard] = {}
+        self._stream_shard: dict[StreamKey, int] = {}
+        self._next_shard_id = 0
+        self._request_ids = itertools.count(1)
+
+    async def add(self, key: StreamKey) -> None:
+        if key in self._stream_shard:
+            return
+
+        shard = self._pick_shard()
+        self._assign(key, shard)
+        logger.info(f"Stream {stream_name(key)} assigned to connection {shard.shard_id}")
+
+    async def remove(self, key: StreamKey) -> None:
+        shard_id = self._stream_shard.pop(key, None)
+        if shard_id is None:
+            return
+
+        shard = self._shards[shard_id]
+        shard.streams.discard(key)
+        shard.rejected.discard(key)
+        if shard.streams:
+            self._schedule_sync(shard)
+        else:
+            await self._close_shard(shard)
+
+        await self._rebalance()
+
+    def _pick_shard(self) -> Shard:
+        """Наименее загруженное соединение со свободным местом, иначе новое"""
+        candidates = [s for s in self._shards.values() if len(s.streams) < self.streams_per_connection]
+        if candidates:
+            return min(candidates, key=lambda s: len(s.streams))
+
+        shard = Shard(self._next_shard_id)
+        self._next_shard_id += 1
+        self._shards[shard.shard_id] = shard
+        return shard
+
+    def _assign(self, key: StreamKey, shard: Shard) -> None:
+        shard.streams.add(key)
+        self._stream_shard[key] = shard.shard_id
+        if shard.task is None:
+            shard.task = asyncio.create_task(self._run_shard(shard))
+        else:
+            self._schedule_sync(shard)
+
+    async def _rebalance(self) -> None:
+        """Схлопывание лишних соединений, когда потоки помещаются в меньшее их число"""
+        needed = math.ceil(len(self._stream_shard) / self.streams_per_connection)
+        while len(self._shards) > needed:
+            smallest = min(self._shards.values(), key=lambda s: len(s.streams))
+            moved = list(smallest.streams)
+            smallest.streams.clear()
+            await self._close_shard(smallest)
+
+            for key in moved:
+                shard = self._pick_shard()
+                # отклоненный поток не должен снова попасть в пачку SUBSCRIBE на новом соединении
+                if key in smallest.rejected:
+                    shard.rejected.add(key)
+                self._assign(key, shard)
+
+            logger.info(f"Rebalanced {len(moved)} streams from connection {smallest.shard_id}")
+
+    def _schedule_sync(self, shard: Shard) -> None:
+        if shard.sync_task is None or shard.sync_task.done():
+            shard.sync_task = asyncio.create_task(self._sync_shard(shard))
+
+    async def _sync_shard(self, shard: Shard) -> None:
+        """Приведение подписок открытого соединения к shard.streams без переподключения"""
+        await asyncio.sleep(min(self.control_delay * 2 ** shard.sync_failures, self.max_control_backoff))
+        if shard.websocket is None:
+            # при подключении URL строится из актуального shard.streams
+            return
+
+        to_subscribe = shard.wanted - shard.subscribed
+        to_unsubscribe = shard.subscribed - shard.streams
+        try:
+            if to_subscribe:
+                await self._subscribe(shard, to_subscribe)
+            if to_unsubscribe:
+                try:
+                    await self._send_control(shard, "UNSUBSCRIBE", to_unsubscribe)
+                except ControlRejected as e:
+                    # отписка от неизвестного серверу потока ничего не меняет, повторять ее незачем
+                    logger.warning(f"Connection {shard.shard_id} UNSUBSCRIBE rejected: {e}")
+                shard.subscribed -= to_unsubscribe
+        except Exception as e:
+            shard.sync_failures += 1
+            logger.error(f"Connection {shard.shard_id} subscription sync failed ({shard.sync_failures} in a row): {e}")
+            shard.sync_task = None
+            self._schedule_sync(shard)
+            return
+
+        shard.sync_failures = 0
+        # за время ожидания подтверждений набор мог поменяться
+        if shard.wanted != shard.subscribed:
+            shard.sync_task = None
+            self._schedule_sync(shard)
+
+    async def _subscribe(self, shard: Shard, keys: set[StreamKey]) -> None:
+        """SUBSCRIBE пачкой, при отказе - по одному потоку, отклоненный поток исключается из соединения"""
+        try:
+            await self._send_control(shard, "SUBSCRIBE", keys)
+            shard.subscribed |= keys
+            return
+        except ControlRejected as e:
+            if len(keys) == 1:
+                shard.rejected |= keys
+                logger.error(f"Connection {shard.shard_id} dropped stream {stream_name(next(iter(keys)))}: {e}")
+                return
+            logger.warning(f"Connection {shard.shard_id} SUBSCRIBE of {len(keys)} streams rejected, retrying each")
+
+        for key in sorted(keys):
+            # по одному запросу за control_delay, чтобы не превысить лимит управляющих сообщений
+            await asyncio.sleep(self.control_delay)
+            if key in shard.streams:
+                await self._subscribe(shard, {key})
+
+    async def _send_control(self, shard: Shard, method: str, keys: set[StreamKey]) -> None:
+        request_id = next(self._request_ids)
+        ack = asyncio.get_running_loop().create_future()
+        shard.pending[request_id] = ack
+        try:
+            await shard.websocket.send(json.dumps({
+                "method": method,
+                "params": sorted(stream_name(key) for key in keys),
+                "id": request_id,
+            }))
+            await asyncio.wait_for(ack, timeout=self.ack_timeout)
+            logger.info(f"Connection {shard.shard_id} {method} {len(keys)} streams acknowledged (id={request_id})")
+        finally:
+            shard.pending.pop(request_id, None)
+
+    @staticmethod
+    def _handle_control(shard: Shard, raw: bytes) -> None:
+        """Ответ на SUBSCRIBE/UNSUBSCRIBE вида {"result": null, "id": 1} или {"error": {...}, "id": 1}"""
+        response = json.loads(raw)
+        ack = shard.pending.get(response.get("id"))
+        if ack is None or ack.done():
+            logger.warning(f"Connection {shard.shard_id} unexpected control response: {response}")
+            return
+
+        if "error" in response:
+            ack.set_exception(ControlRejected(f"Binance rejected request: {response['error']}"))
+        else:
+            ack.set_result(response.get("result"))
+
+    async def _close_shard(self, shard: Shard) -> None:
+        self._shards.pop(shard.shard_id, None)
+        for task in (shard.sync_task, shard.task):
+            if task is not None:
+                await self._cancel(task)
+        shard.sync_task = None
+        shard.task = None
+        logger.info(f"Closed connection {shard.shard_id}")
+
+    @staticmethod
+    async def _cancel(task: asyncio.Task) -> None:
+        if task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run_shard(self, shard: Shard) -> None:
+        while True:
+            connected_streams = shard.wanted
+            streams = "/".join(sorted(stream_name(key) for key in connected_streams))
+            stream_url = f"{settings.BINANCE_BASE_WS_URL}stream?streams={streams}"
+
+            try:
+                async with websockets.connect(stream_url) as websocket:
+                    shard.websocket = websocket
+                    shard.subscribed = connected_streams
+                    logger.info(f"Connection {shard.shard_id} opened with {len(connected_streams)} streams")
+                    if shard.wanted != shard.subscribed:
+                        self._schedule_sync(shard)
+
+                    while True:
+                        raw = await websocket.recv(decode=False)
+                        if not raw.startswith(b'{"stream"'):
+                            self._handle_control(shard, raw)
+                            continue
+
+                        started_at = time.perf_counter()
+                        frame = decode_frame(raw)
+                        DECODE_SECONDS.observe(time.perf_counter() - started_at)
+                        if frame is None:
+                            DECODE_ERRORS.inc()
+                            continue
+
+                        shard.count_message()
+                        WS_RECEIVED.inc(shard.shard_id)
+                        WS_RECEIVE_LAG.observe(time.time() - frame.event_time / 1000)
+                        key = parse_stream_name(frame.stream)
+                        message = frame_to_tick(frame, key[1])
+                        if message:
+                            self._emit(key, message)
+
+            except websockets.exceptions.ConnectionClosed:
+                logger.warning(
+                    f"Connection {shard.shard_id} closed, reconnecting in {self.reconnect_delay}s..."
+                )
+            except Exception as e:
+                logger.error(f"Connection {shard.shard_id} error: {e}, reconnecting in {self.reconnect_delay}s...")
+            finally:
+                shard.websocket = None
+                for ack in shard.pending.values():
+                    if not ack.done():
+                        ack.set_exception(ConnectionError("connection closed before acknowledgement"))
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "connection": shard.shard_id,
+                "streams": len(shard.streams),
+                "subscribed": len(shard.subscribed),
+                "rejected": len(shard.rejected),
+                "pending_requests": len(shard.pending),
+                "received": shard.received,
+                "messages_per_sec": round(shard.rate, 2),
+            }
+            for shard in self._shards.values()
+        ]
+
+    async def stop(self) -> None:
+        for shard in list(self._shards.values()):
+            await self._close_shard(shard)
+        self._stream_shard.clear()
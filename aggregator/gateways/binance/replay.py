@@ -0,0 +1,166 @@
+import asyncio
+import glob
+import gzip
+import logging
+import mmap
+import os
+import time
+from typing import Awaitable, Callable, Iterator
+
+import websockets
+
+from aggregator.core.settings import settings
+from aggregator.gateways.binance.decoder import decode_frame, frame_to_tick
+from aggregator.gateways.binance.pool import StreamKey, StreamPool, parse_stream_name, stream_name
+from aggregator.schemas.models import Tick
+
+logger = logging.getLogger(__name__)
+
+# записи - сырые кадры combined stream построчно, файлы сжаты gzip
+RECORDING_PATTERN = "*.jsonl*"
+
+
+def recording_files(path: str) -> list[str]:
+    """Файлы записи по порядку: один файл или все файлы каталога"""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, RECORDING_PATTERN)))
+    return [path]
+
+
+def read_frames(path: str) -> Iterator[bytes]:
+    """Построчное чтение записи через mmap, gzip распаковывается поверх отображения"""
+    if os.path.getsize(path) == 0:
+        return
+
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        source = gzip.GzipFile(fileobj=mapped) if path.endswith(".gz") else mapped
+        for line in iter(source.readline, b""):
+            line = line.rstrip(b"\n")
+            if line:
+                yield line
+
+
+class Recorder:
+    """Запись сырых кадров combined stream в сжатые файлы с ротацией по размеру"""
+
+    def __init__(
+        self,
+        streams: list[str],
+        directory: str,
+        rotate_bytes: int = 64 * 1024 * 1024,
+        reconnect_delay: int = 5,
+    ):
+        self.streams = streams
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        self.reconnect_delay = reconnect_delay
+        self.is_running = True
+        self.recorded = 0
+        self._file = None
+        self._written = 0
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"klines-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        self._file = gzip.open(path, "ab")
+        self._written = 0
+        logger.info(f"Recording to {path}")
+
+    def write(self, raw: bytes) -> None:
+        if self._file is None or self._written >= self.rotate_bytes:
+            self._rotate()
+
+        self._file.write(raw + b"\n")
+        self._written += len(raw) + 1
+        self.recorded += 1
+
+    async def run(self) -> None:
+        stream_url = f"{settings.BINANCE_BASE_WS_URL}stream?streams={'/'.join(self.streams)}"
+        try:
+            while self.is_running:
+                try:
+                    async with websockets.connect(stream_url) as websocket:
+                        logger.info(f"Recording {len(self.streams)} streams")
+                        while self.is_running:
+                            self.write(await websocket.recv(decode=False))
+                except websockets.exceptions.ConnectionClosed:
+                    logger.warning(f"WebSocket connection closed, reconnecting in {self.reconnect_delay}s...")
+                    await asyncio.sleep(self.reconnect_delay)
+                except OSError as e:
+                    logger.error(f"WebSocket error: {e}, reconnecting in {self.reconnect_delay}s...")
+                    await asyncio.sleep(self.reconnect_delay)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def stop(self):
+        self.is_running = False
+
+
+class ReplayPool(StreamPool):
+    """Воспроизведение записанных кадров вместо живого Binance
+
+    Файлы читаются один раз, кадр уходит подписчикам своего потока, и каждый кадр
+    дожидается оценки до чтения следующего: схлопывания нет, результат прогона
+    не зависит от планирования задач.
+
+    speed: 1 - в реальном времени по event_time кадров, N - в N раз быстрее,
+    0 - без пауз (режим бенчмарка пропускной способности).
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.files = recording_files(path)
+        self.speed = speed
+        self.is_running = True
+        self.replayed = 0
+        self._keys: set[StreamKey] = set()
+
+    async def add(self, key: StreamKey) -> None:
+        self._keys.add(key)
+
+    async def remove(self, key: StreamKey) -> None:
+        self._keys.discard(key)
+
+    def stats(self) -> list[dict]:
+        return [{"streams": sorted(stream_name(key) for key in self._keys), "received": self.replayed}]
+
+    async def run(self, deliver: Callable[[StreamKey, Tick], Awaitable[None]]) -> None:
+        """Прогон всех файлов по порядку, deliver вызывается для кадров открытых потоков"""
+        started_at = None
+        first_event_time = None
+        for path in self.files:
+            for raw in read_frames(path):
+                if not self.is_running:
+                    return
+
+                frame = decode_frame(raw)
+                if frame is None:
+                    continue
+                key = parse_stream_name(frame.stream)
+                if key not in self._keys:
+                    continue
+
+                if self.speed > 0:
+                    if first_event_time is None:
+                        started_at, first_event_time = time.monotonic(), frame.event_time
+                    delay = (frame.event_time - first_event_time) / 1000 / self.speed
+                    wait = started_at + delay - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+
+                tick = frame_to_tick(frame, key[1])
+                if tick is not None:
+                    self.replayed += 1
+                    await deliver(key, tick)
+
+        logger.info(f"Replay of {len(self.files)} files finished, {self.replayed} frames")
+
+    async def stop(self) -> None:
+        self.is_running = False
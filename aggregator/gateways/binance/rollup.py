@@ -0,0 +1,82 @@
+import logging
+import re
+
+from aggregator.schemas.models import Tick
+
+logger = logging.getLogger(__name__)
+
+BASE_TIMEFRAME = "1m"
+BASE_LENGTH_MS = 60_000
+
+_TIMEFRAME_RE = re.compile(r"(\d+)([mhd])")
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000}
+
+
+def parse_timeframe(timeframe: str) -> int | None:
+    """Длина окна в мс или None, если таймфрейм нельзя собрать из минутных свечей"""
+    match = _TIMEFRAME_RE.fullmatch(timeframe or "")
+    if match is None or int(match.group(1)) == 0:
+        return None
+    return int(match.group(1)) * _UNIT_MS[match.group(2)]
+
+
+class Window:
+    """Текущее окно одного таймфрейма: начало и цена открытия первой минутной свечи"""
+
+    __slots__ = ("timeframe", "length", "start", "open_price")
+
+    def __init__(self, timeframe: str, length: int):
+        self.timeframe = timeframe
+        self.length = length
+        self.start: int | None = None
+        self.open_price = 0.0
+
+
+class SymbolRollup:
+    """Все запрошенные таймфреймы одного символа поверх одного потока 1m, O(1) на тик и окно"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self._windows: dict[str, Window] = {}
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def add(self, timeframe: str) -> None:
+        length = parse_timeframe(timeframe)
+        if length is None:
+            raise ValueError(f"Timeframe {timeframe} can't be derived from {BASE_TIMEFRAME}")
+        self._windows.setdefault(timeframe, Window(timeframe, length))
+
+    def remove(self, timeframe: str) -> None:
+        self._windows.pop(timeframe, None)
+
+    def update(self, message: Tick) -> list[Tick]:
+        """Обновление окон минутной свечой, open - первый open окна, close - последний close"""
+        if message.open_time is None:
+            return []
+
+        result = []
+        for window in self._windows.values():
+            # окна выровнены по UTC-эпохе, как часовые и дневные свечи Binance
+            start = message.open_time - message.open_time % window.length
+            if start != window.start:
+                # при подписке посреди окна open берется из первой увиденной минуты
+                window.start = start
+                window.open_price = message.open_price
+
+            open_price = window.open_price
+            close_price = message.close_price
+            result.append(Tick(
+                message.symbol,
+                window.timeframe,
+                ((close_price - open_price) / open_price) * 100,
+                open_price,
+                close_price,
+                start,
+                message.is_closed and message.open_time + BASE_LENGTH_MS >= start + window.length,
+                message.event_time,
+                start + window.length - 1,
+            ))
+
+        return result
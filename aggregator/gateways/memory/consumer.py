@@ -0,0 +1,30 @@
+import logging
+from typing import TYPE_CHECKING, Callable
+
+from aggregator.gateways.rabbit.consumer import Consumer
+
+if TYPE_CHECKING:
+    # брокер один на процесс и создается provider, aggregator только пользуется его очередями
+    from provider.gateways.memory.base import MemoryBroker
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryConsumer(Consumer):
+    def __init__(self, broker: "MemoryBroker"):
+        self._broker = broker
+
+    async def consume(self, command: Callable, queue: str) -> None:
+        """Чтение очереди брокера в памяти до отмены задачи"""
+        memory_queue = self._broker.get_queue(queue)
+        logger.info(f"Started consuming from memory queue: {queue}")
+        while True:
+            message = await memory_queue.get()
+            try:
+                await command(await self.decode_message(message))
+            except Exception as e:
+                logger.error(f"Error in message handler: {e}")
+
+    async def decode_message(self, message: dict) -> dict:
+        """Сообщения в памяти не сериализуются"""
+        return message
@@ -0,0 +1,64 @@
+import json
+from abc import ABC, abstractmethod
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack опционален
+    msgpack = None
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+
+class Codec(ABC):
+    content_type: str
+
+    @abstractmethod
+    def encode(self, message: dict) -> bytes: ...
+
+    @abstractmethod
+    def decode(self, body: bytes) -> dict: ...
+
+
+class JsonCodec(Codec):
+    content_type = JSON_CONTENT_TYPE
+
+    def encode(self, message: dict) -> bytes:
+        return json.dumps(message).encode()
+
+    def decode(self, body: bytes) -> dict:
+        return json.loads(body)
+
+
+class MsgPackCodec(Codec):
+    """Компактный бинарный формат, числа передаются без текстового представления"""
+
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed, install the 'speedups' extra")
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, body: bytes) -> dict:
+        return msgpack.unpackb(body, raw=False)
+
+
+_CODECS: dict[str, type[Codec]] = {
+    JSON_CONTENT_TYPE: JsonCodec,
+    MSGPACK_CONTENT_TYPE: MsgPackCodec,
+}
+_instances: dict[str, Codec] = {}
+
+
+def get_codec(content_type: str | None) -> Codec:
+    """Кодек по content_type сообщения, без content_type - JSON для совместимости"""
+    content_type = content_type or JSON_CONTENT_TYPE
+    if content_type not in _instances:
+        codec_class = _CODECS.get(content_type)
+        if codec_class is None:
+            raise ValueError(f"Unsupported content type: {content_type}")
+        _instances[content_type] = codec_class()
+    return _instances[content_type]
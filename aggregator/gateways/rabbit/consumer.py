@@ -1,15 +1,21 @@
 import asyncio
-import json
 import logging
 from typing import Callable, Any
 from abc import ABC, abstractmethod
 
 from aio_pika import IncomingMessage
 
-from gateways.rabbit.base import RabbitMqConnector
+from common.consumer import KeyFunc, KeyedWorkers, user_key
+from aggregator.core.settings import settings
+from aggregator.core.logs import RateLimitedLog
+from aggregator.gateways.rabbit.base import RabbitMqConnector
+from aggregator.gateways.rabbit.codec import get_codec
 
 logger = logging.getLogger(__name__)
 
+_log_decode_error = RateLimitedLog(logger, logging.ERROR, "consumer.decode")
+_log_handler_error = RateLimitedLog(logger, logging.ERROR, "consumer.handler")
+
 
 class Consumer(ABC):
     @abstractmethod
@@ -20,19 +26,40 @@ class Consumer(ABC):
 
 
 class RabbitMqConsumer(Consumer):
-    def __init__(self, connector: RabbitMqConnector):
+    def __init__(
+        self,
+        connector: RabbitMqConnector,
+        prefetch_count: int = settings.RABBITMQ_PREFETCH_COUNT,
+        workers: int = settings.RABBITMQ_CONSUMER_WORKERS,
+        ack_batch_size: int = settings.RABBITMQ_ACK_BATCH_SIZE,
+        ack_interval: float = settings.RABBITMQ_ACK_INTERVAL,
+        key: KeyFunc = user_key,
+    ):
         self.connector = connector
         self._is_consuming = False
+        self.prefetch_count = prefetch_count
+        self.workers = workers
+        self._workers = KeyedWorkers(
+            workers,
+            ack_batch_size,
+            ack_interval,
+            decode=self.decode_message,
+            key=key,
+            log_decode_error=_log_decode_error,
+            log_handler_error=_log_handler_error,
+        )
+        self._channel = None
 
     async def consume(self, command: Callable, queue: str) -> None:
-        """Запуск потребления сообщений с использованием существующего соединения"""
+        """Запуск потребления сообщений в отдельном канале с prefetch и пулом обработчиков"""
         self._is_consuming = True
 
         try:
-            # Используем существующее соединение из connector
-            rabbit_queue = await self.connector.channel.get_queue(queue)
-            await rabbit_queue.consume(self._create_message_handler(command))
-            logger.info(f"Started consuming from queue: {queue}")
+            self._channel = await self.connector.open_channel(prefetch_count=self.prefetch_count)
+            rabbit_queue = await self._channel.get_queue(queue)
+            self._workers.start(command, queue)
+            await rabbit_queue.consume(self._workers.handle)
+            logger.info(f"Started consuming from queue: {queue} (prefetch={self.prefetch_count}, workers={self.workers})")
 
             # Бесконечный цикл для поддержания консьюмера активным
             while self._is_consuming:
@@ -43,34 +70,19 @@ class RabbitMqConsumer(Consumer):
         except Exception as e:
             logger.error(f"Error in consume loop: {e}")
             raise
-
-    def _create_message_handler(self, command: Callable) -> Callable:
-        """Создает обработчик сообщений с правильной сигнатурой"""
-
-        async def message_handler(message: IncomingMessage) -> None:
-            try:
-                decoded_message = await self.decode_message(message)
-                await command(decoded_message)
-            except Exception as e:
-                logger.error(f"Error in message handler: {e}")
-                await message.nack()
-
-        return message_handler
+        finally:
+            await self.stop_consuming()
 
     async def decode_message(self, message: IncomingMessage) -> dict:
-        """Декодирование сообщения"""
-        try:
-            async with message.process():
-                decoded = json.loads(message.body.decode())
-                logger.debug(f"Received message: {decoded}")
-                return decoded
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {e}")
-            return {}
-        except Exception as e:
-            logger.error(f"Error decoding message: {e}")
-            return {}
+        """Декодирование сообщения, подтверждение - после обработки"""
+        decoded = get_codec(message.content_type).decode(message.body)
+        logger.debug("Received message: %s", decoded)
+        return decoded
 
     async def stop_consuming(self):
-        """Остановка потребления сообщений"""
-        self._is_consuming = False
\ No newline at end of file
+        """Остановка потребления сообщений, необработанные вернутся в очередь при закрытии канала"""
+        self._is_consuming = False
+        await self._workers.stop()
+        if self._channel is not None and not self._channel.is_closed:
+            await self._channel.close()
+        self._channel = None
@@ -1,12 +1,19 @@
+import asyncio
 import logging
-import json
+import time
 from abc import ABC, abstractmethod
 
 import aio_pika
-from gateways.rabbit.base import RabbitMqConnector
+from aggregator.core.logs import RateLimitedLog
+from aggregator.core.metrics import BROKER_CONFIRM_SECONDS, PUBLISH_DROPPED, PUBLISHED
+from aggregator.gateways.rabbit.base import RabbitMqConnector
+from aggregator.gateways.rabbit.codec import Codec, get_codec
+from aggregator.core.settings import settings
 
 logger = logging.getLogger(__name__)
 
+_log_publish_error = RateLimitedLog(logger, logging.ERROR, "producer.publish")
+
 
 class Producer(ABC):
     @abstractmethod
@@ -14,22 +21,104 @@ class Producer(ABC):
 
 
 class RabbitMqProducer(Producer):
-    def __init__(self, connector: RabbitMqConnector):
+    def __init__(self, connector: RabbitMqConnector, codec: Codec | None = None):
         self._connector = connector
+        self._codec = codec or get_codec(settings.RABBITMQ_CONTENT_TYPE)
 
     async def produce(self, routing_key: str, message: dict) -> None:
         """Отправка сообщения в указанную очередь"""
+        started_at = time.perf_counter()
         try:
             await self._connector.exchanger.publish(
-                aio_pika.Message(
-                    body=json.dumps(message).encode(),
-                    content_type="application/json",
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT
-                ),
+                self._build_message(message),
                 routing_key=routing_key
             )
-            logger.debug(f"Message sent to {routing_key}: {message}")
+            BROKER_CONFIRM_SECONDS.observe(time.perf_counter() - started_at)
+            PUBLISHED.inc("ok")
+            logger.debug("Message sent to %s: %s", routing_key, message)
 
         except Exception as e:
-            logger.exception(f"Failed to send message to {routing_key}: {e}")
+            PUBLISHED.inc("failed")
+            _log_publish_error("Failed to send message to %s: %s", routing_key, e, exc_info=True)
             raise
+
+    def _build_message(self, message: dict) -> aio_pika.Message:
+        return aio_pika.Message(
+            body=self._codec.encode(message),
+            content_type=self._codec.content_type,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+        )
+
+
+class PipelinedRabbitMqProducer(RabbitMqProducer):
+    """Конвейерная отправка с подтверждениями брокера: produce не ждет подтверждения
+
+    Публикация начинается сразу, одновременно ждут подтверждения не больше max_in_flight
+    сообщений, при достижении предела produce ждет освобождения места.
+    """
+
+    def __init__(
+        self,
+        connector: RabbitMqConnector,
+        codec: Codec | None = None,
+        max_in_flight: int = settings.RABBITMQ_MAX_IN_FLIGHT,
+        retries: int = settings.RABBITMQ_PUBLISH_RETRIES,
+        retry_delay: float = settings.RABBITMQ_PUBLISH_RETRY_DELAY,
+    ):
+        super().__init__(connector, codec)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        # ограничение неподтвержденных публикаций, produce ждет при его достижении
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._pending: set[asyncio.Task] = set()
+        self.published = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def produce(self, routing_key: str, message: dict) -> None:
+        """Запуск публикации без ожидания подтверждения брокера"""
+        await self._in_flight.acquire()
+        task = asyncio.create_task(self._publish(routing_key, message))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish(self, routing_key: str, message: dict) -> None:
+        try:
+            for attempt in range(self.retries + 1):
+                started_at = time.perf_counter()
+                try:
+                    # при publisher confirms publish завершается после подтверждения брокера
+                    await self._connector.exchanger.publish(self._build_message(message), routing_key=routing_key)
+                    BROKER_CONFIRM_SECONDS.observe(time.perf_counter() - started_at)
+                    PUBLISHED.inc("ok")
+                    self.published += 1
+                    return
+                except Exception as e:
+                    PUBLISHED.inc("failed")
+                    self.failed += 1
+                    _log_publish_error(
+                        "Failed to send message to %s (attempt %s/%s): %s",
+                        routing_key, attempt + 1, self.retries + 1, e, exc_info=True,
+                    )
+                if attempt < self.retries:
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                    # после разрыва соединение переоткрывается, робастное соединение восстанавливает канал само
+                    await self._reconnect()
+
+            PUBLISH_DROPPED.inc(routing_key)
+            self.dropped += 1
+            logger.error(f"Dropped message to {routing_key} after {self.retries + 1} attempts: {message}")
+        finally:
+            self._in_flight.release()
+
+    async def _reconnect(self) -> None:
+        try:
+            await self._connector.connect()
+        except Exception as e:
+            logger.error(f"Failed to reconnect to RabbitMQ: {e}")
+
+    async def drain(self) -> None:
+        """Ожидание подтверждения всех начатых публикаций, для остановки сервиса"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        logger.info(f"Producer drained: published={self.published}, failed={self.failed}, dropped={self.dropped}")
@@ -1,29 +1,70 @@
 import asyncio
 import logging
 import signal
-
-from aggregator.gateways.binance.base import Client, BinanceClient
+from collections import Counter
+from typing import TYPE_CHECKING
+
+from aggregator.core.cluster import ClusterCoordinator
+from aggregator.core.evaluator import Evaluator, LocalEvaluator
+from aggregator.core.logs import setup_logging
+from aggregator.core.loop_monitor import LoopMonitor
+from aggregator.core.metrics import COMMANDS, MetricsServer
+from aggregator.core.settings import settings
+from aggregator.core.store import SubscriptionStore
+from aggregator.core.workers import ProcessPoolEvaluator
+from aggregator.gateways.binance.hub import StreamHub
+from aggregator.gateways.binance.pool import StreamPool, BinanceStreamPool
+from aggregator.gateways.memory.consumer import MemoryConsumer
+from aggregator.gateways.memory.producer import MemoryProducer
 from aggregator.gateways.rabbit.base import RabbitMqConnector
 from aggregator.gateways.rabbit.consumer import Consumer, RabbitMqConsumer
-from aggregator.gateways.rabbit.producer import Producer, RabbitMqProducer
-from aggregator.schemas.models import InputCommand, ActionEnum
+from aggregator.gateways.rabbit.producer import Producer, RabbitMqProducer, PipelinedRabbitMqProducer
+from aggregator.schemas.models import InputCommand, ActionEnum, Tick
+
+if TYPE_CHECKING:
+    from provider.gateways.memory.base import MemoryBroker
 
 logger = logging.getLogger(__name__)
 
 
 class MainService:
-    def __init__(self, consumer: Consumer, producer: Producer, client: Client) -> None:
+    def __init__(
+        self,
+        consumer: Consumer,
+        producer: Producer,
+        pool: StreamPool,
+        evaluator: Evaluator | None = None,
+        coordinator: ClusterCoordinator | None = None,
+        store: SubscriptionStore | None = None,
+    ) -> None:
         self._producer = producer
         self._consumer = consumer
-        self._client = client
-
-        self.active_connections: dict[str, asyncio.Task] = {}
-        self.user_subscriptions: dict[str, set[str]] = {}
+        self._hub = StreamHub(pool)
+        # тики всех потоков идут оценщику, раздача по пользователям идет внутри него
+        self._hub.bind(self.send_ticker_info)
+        self._evaluator = evaluator or LocalEvaluator(producer=producer)
+        # единственный счетчик ссылок: число пользователей на поток, поток в хабе открыт пока он больше нуля
+        self._stream_refs: Counter = Counter()
+
+        self.user_subscriptions: dict[str, InputCommand] = {}
         self.is_running = True
+        self._store = store
+
+        # в кластере команды применяются только к пользователям, которыми владеет этот узел
+        self._coordinator = coordinator
+        if coordinator is not None:
+            coordinator.bind(
+                subscribe=self._subscribe_user, unsubscribe=self._unsubscribe_user, forget=self._forget_user
+            )
 
     async def process_command(self, message: dict) -> None:
         try:
             message_schema = InputCommand(**message)
+            COMMANDS.inc(message_schema.action.value)
+            if self._coordinator is not None:
+                await self._coordinator.broadcast_command(message_schema.model_dump(mode="json"))
+                return
+
             if message_schema.action == ActionEnum.SUBSCRIBE:
                 await self._subscribe_user(message_schema=message_schema)
             elif message_schema.action == ActionEnum.UNSUBSCRIBE:
@@ -34,84 +75,105 @@ class MainService:
         except Exception as e:
             logger.error(f"Error processing command: {e}")
 
-    async def send_ticker_info(self, message_schema: InputCommand) -> None:
-        """Отправка информации о тикерах для конкретного пользователя"""
-        try:
-            async for message in self._client.get_ticket_info(
-                    symbols=message_schema.symbols, timeframe=message_schema.timeframe
-            ):
-                logger.info(
-                    f"Start get message {message}"
-                )
-                if not message:
-                    continue
-
-                change_level = self._calculate_change_level(message.price_change_percent, message_schema.thresholds)
-
-                # пропускаем если процент меньше чем нужно
-                if change_level == 0:
-                    continue
-
-                routing_key = f"level_{change_level}"
-
-                message.user_id = message_schema.user_id
-                message.change_level = change_level
-
-                await self._producer.produce(routing_key=routing_key, message=message.model_dump(mode="json"))
-                logger.info(
-                    f'Sent {message.symbol} change {message.price_change_percent:.2f}% to level {change_level}'
-                )
-
-        except Exception as e:
-            logger.error(f"Error in send_ticker_info for user {message_schema.user_id}: {e}")
+    async def send_ticker_info(self, message: Tick) -> None:
+        """Передача тика оценщику, который отправляет уведомления подписчикам"""
+        await self._evaluator.evaluate(message)
+
+    @property
+    def hub(self) -> StreamHub:
+        return self._hub
+
+    def stats(self) -> dict:
+        return self._hub.stats()
+
+    async def restore(self, commands: list[InputCommand]) -> None:
+        """Массовое восстановление подписок: сначала все пользователи, затем каждый уникальный поток открывается один раз"""
+        new_keys = []
+        for message_schema in commands:
+            if self._rejection(message_schema) is not None:
+                continue
+
+            await self._evaluator.add(message_schema)
+            for symbol in set(message_schema.symbols):
+                key = (symbol.upper(), message_schema.timeframe)
+                self._stream_refs[key] += 1
+                if self._stream_refs[key] == 1:
+                    new_keys.append(key)
+            self.user_subscriptions[message_schema.user_id] = message_schema
+
+        for symbol, timeframe in new_keys:
+            await self._hub.open(symbol, timeframe)
+        logger.info(f"Restored {len(self.user_subscriptions)} subscriptions, opened {len(new_keys)} streams")
+
+    def _rejection(self, message_schema: InputCommand) -> str | None:
+        """Причина, по которой подписку нельзя обслужить, или None"""
+        if not message_schema.symbols:
+            return "no symbols provided"
+        if not self._hub.supports(message_schema.timeframe):
+            return f"unsupported timeframe {message_schema.timeframe}"
+        return None
 
-    @staticmethod
-    def _calculate_change_level(change_percent: float, thresholds: list[float]) -> int:
-        """Определение уровня изменения на основе порогов"""
-        change_abs = abs(change_percent)
-        max_level = 0
+    async def _subscribe_user(self, message_schema: InputCommand) -> None:
+        await self._unsubscribe_user(message_schema.user_id, persist=False)
+
+        rejection = self._rejection(message_schema)
+        if rejection is not None:
+            logger.error(f"Can't subscribe user {message_schema.user_id}: {rejection}")
+            # старая подписка уже снята, без удаления из хранилища перезапуск вернул бы ее
+            if self._store is not None:
+                self._store.delete(message_schema.user_id)
+            return
 
-        for level, threshold in enumerate(thresholds, 1):
-            if change_abs >= threshold:
-                max_level = level
-            else:
-                break
+        await self._evaluator.add(message_schema)
+        for symbol in set(message_schema.symbols):
+            key = (symbol.upper(), message_schema.timeframe)
+            self._stream_refs[key] += 1
+            if self._stream_refs[key] == 1:
+                await self._hub.open(symbol, message_schema.timeframe)
+
+        self.user_subscriptions[message_schema.user_id] = message_schema
+        if self._store is not None:
+            self._store.save(message_schema.model_dump(mode="json"))
+        logger.info(f"Started monitoring for user {message_schema.user_id}: {message_schema.symbols}")
+
+    async def _unsubscribe_user(self, user_id: str, persist: bool = True) -> None:
+        message_schema = self.user_subscriptions.pop(user_id, None)
+        if message_schema is None:
+            return
 
-        return max_level
+        if persist and self._store is not None:
+            self._store.delete(user_id)
 
-    async def _subscribe_user(self, message_schema: InputCommand) -> None:
-        await self._unsubscribe_user(message_schema.user_id)
+        await self._evaluator.remove(message_schema)
+        for symbol in set(message_schema.symbols):
+            key = (symbol.upper(), message_schema.timeframe)
+            self._stream_refs[key] -= 1
+            if self._stream_refs[key] <= 0:
+                del self._stream_refs[key]
+                await self._hub.close(symbol, message_schema.timeframe)
 
-        if not message_schema.symbols:
-            logger.error(f"No symbols provided for user {message_schema.user_id}")
-            return
+        logger.info(f"Unsubscribed user {user_id}")
 
-        task = asyncio.create_task(self.send_ticker_info(message_schema=message_schema))
-        self.active_connections[message_schema.user_id] = task
-        self.user_subscriptions[message_schema.user_id] = set(message_schema.symbols)
-        logger.info(f"Started WebSocket monitoring for user {message_schema.user_id}: {message_schema.symbols}")
-
-    async def _unsubscribe_user(self, user_id: str) -> None:
-        if user_id in self.active_connections:
-            task = self.active_connections[user_id]
-            if not task.done():
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    logger.debug(f"Task for user {user_id} cancelled")
-                except Exception as e:
-                    logger.error(f"Error cancelling task for user {user_id}: {e}")
-
-            del self.active_connections[user_id]
-            if user_id in self.user_subscriptions:
-                del self.user_subscriptions[user_id]
-
-            logger.info(f"Unsubscribed user {user_id}")
+    def _forget_user(self, user_id: str) -> None:
+        """Удаление из хранилища пользователя, которого этот узел не обслуживает"""
+        if self._store is not None:
+            self._store.delete(user_id)
 
     async def start(self):
         """Запуск сервиса"""
         logger.info("Starting MainService...")
+        await self._evaluator.start()
+
+        if self._store is not None:
+            commands = [InputCommand(**command) for command in self._store.load().values()]
+            if self._coordinator is not None:
+                # в кластере владельцев определяет кольцо, снимок только пополняет справочник
+                self._coordinator.seed([command.model_dump(mode="json") for command in commands])
+            else:
+                await self.restore(commands)
+
+        if self._coordinator is not None:
+            await self._coordinator.start()
 
         # Запускаем потребителя в отдельной задаче
         consume_task = asyncio.create_task(
@@ -127,31 +189,87 @@ class MainService:
             except asyncio.CancelledError:
                 pass
 
-    async def stop(self, connector):
+    async def stop(self, connector: RabbitMqConnector | None = None):
         logger.info("Stopping MainService...")
         self.is_running = False
 
-        if hasattr(self._client, "stop"):
-            await self._client.stop()
+        # сначала сообщаем о выходе из кластера, чтобы соседи забрали пользователей
+        if self._coordinator is not None:
+            await self._coordinator.stop()
 
-        # Отписываем всех пользователей
-        for user_id in list(self.active_connections.keys()):
-            await self._unsubscribe_user(user_id)
+        # Отписываем всех пользователей, сохраненная таблица остается для перезапуска
+        for user_id in list(self.user_subscriptions.keys()):
+            await self._unsubscribe_user(user_id, persist=False)
 
-        await connector.disconnect()
+        if self._store is not None:
+            self._store.close()
+
+        await self._hub.stop()
+        await self._evaluator.stop()
+
+        if connector is not None:
+            await connector.disconnect()
         logger.info("MainService stopped")
 
 
+def create_in_process_service(broker: "MemoryBroker") -> MainService:
+    """MainService поверх брокера в памяти для запуска в одном процессе с provider"""
+    store = None
+    if settings.AGGREGATOR_STORE_PATH:
+        store = SubscriptionStore(path=settings.AGGREGATOR_STORE_PATH)
+
+    return MainService(
+        consumer=MemoryConsumer(broker=broker),
+        producer=MemoryProducer(broker=broker),
+        pool=BinanceStreamPool(),
+        store=store,
+    )
+
+
 async def main():
     connector = RabbitMqConnector()
     await connector.connect()
 
+    if settings.RABBITMQ_PIPELINED_PUBLISHING:
+        producer = PipelinedRabbitMqProducer(connector=connector)
+    else:
+        producer = RabbitMqProducer(connector=connector)
+
+    evaluator = None
+    if settings.AGGREGATOR_WORKERS > 0:
+        # оценка и публикация в отдельных процессах, шардирование по символу
+        evaluator = ProcessPoolEvaluator(workers=settings.AGGREGATOR_WORKERS)
+
+    coordinator = None
+    if settings.CLUSTER_ENABLED:
+        coordinator = ClusterCoordinator(connector=connector)
+
+    store = None
+    if settings.AGGREGATOR_STORE_PATH:
+        store = SubscriptionStore(path=settings.AGGREGATOR_STORE_PATH)
+
     service = MainService(
         consumer=RabbitMqConsumer(connector=connector),
-        producer=RabbitMqProducer(connector=connector),
-        client=BinanceClient()
+        producer=producer,
+        pool=BinanceStreamPool(),
+        evaluator=evaluator,
+        coordinator=coordinator,
+        store=store,
     )
 
+    monitor = None
+    if settings.LOOP_MONITOR_ENABLED:
+        monitor = LoopMonitor()
+        monitor.start()
+
+    metrics_server = None
+    if settings.AGGREGATOR_METRICS_PORT:
+        metrics_server = MetricsServer(
+            status=lambda: {"loop": monitor.status() if monitor else None, **service.stats()},
+            profiler=monitor.profile if monitor else None,
+        )
+        await metrics_server.start()
+
     def signal_handler(signum, frame):
         logger.info(f"Received signal {signum}")
         asyncio.create_task(service.stop(connector=connector))
@@ -168,11 +286,12 @@ async def main():
     finally:
         if service.is_running:
             await service.stop(connector=connector)
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if monitor is not None:
+            await monitor.stop()
 
 
 if __name__ == "__main__":
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    asyncio.run(main())
\ No newline at end of file
+    setup_logging()
+    asyncio.run(main())
@@ -7,12 +7,23 @@ class ActionEnum(str, Enum):
     UNSUBSCRIBE = "unsubscribe"
 
 
+class AlertMode(str, Enum):
+    EVERY_TICK = "every_tick"
+    CLOSE_ONLY = "close_only"
+    RISING = "rising"
+    HYSTERESIS = "hysteresis"
+    COOLDOWN = "cooldown"
+
+
 class InputCommand(BaseModel):
     action: ActionEnum
     user_id: str
     symbols: list[str] = Field(default_factory=list)
     timeframe: str | None = None
     thresholds: list[float] = Field(default_factory=list)
+    alert_mode: AlertMode = AlertMode.EVERY_TICK
+    hysteresis: float = 0.0  # в процентах, для режима hysteresis
+    cooldown: float = 0.0  # в секундах, для режима cooldown
 
 
 class PriceChangeMessage(BaseModel):
@@ -22,4 +33,67 @@ class PriceChangeMessage(BaseModel):
     price_change_percent: float
     open_price: float
     close_price: float
-    change_level: int | None = None
\ No newline at end of file
+    open_time: int | None = None  # начало свечи, мс
+    is_closed: bool = False
+    change_level: int | None = None
+    # метки времени в мс эпохи: событие и конец свечи по часам Binance, оценка и передача на публикацию по часам aggregator
+    event_time: int | None = None
+    close_time: int | None = None
+    evaluated_at: int | None = None
+    published_at: int | None = None
+
+
+class Tick:
+    """Тик внутри aggregator: без валидации pydantic, PriceChangeMessage строится только для уведомлений"""
+
+    __slots__ = (
+        "symbol", "timeframe", "price_change_percent", "open_price", "close_price", "open_time", "is_closed",
+        "event_time", "close_time",
+    )
+
+    def __init__(
+        self,
+        symbol: str,
+        timeframe: str,
+        price_change_percent: float,
+        open_price: float,
+        close_price: float,
+        open_time: int | None = None,
+        is_closed: bool = False,
+        event_time: int | None = None,
+        close_time: int | None = None,
+    ):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.price_change_percent = price_change_percent
+        self.open_price = open_price
+        self.close_price = close_price
+        self.open_time = open_time
+        self.is_closed = is_closed
+        self.event_time = event_time
+        self.close_time = close_time
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"Tick({fields})"
+
+    def as_tuple(self) -> tuple:
+        """Поля в порядке __slots__, для передачи между процессами"""
+        return (
+            self.symbol, self.timeframe, self.price_change_percent, self.open_price, self.close_price,
+            self.open_time, self.is_closed, self.event_time, self.close_time,
+        )
+
+    def to_message(self, **update) -> PriceChangeMessage:
+        return PriceChangeMessage(
+            symbol=self.symbol,
+            timeframe=self.timeframe,
+            price_change_percent=self.price_change_percent,
+            open_price=self.open_price,
+            close_price=self.close_price,
+            open_time=self.open_time,
+            is_closed=self.is_closed,
+            event_time=self.event_time,
+            close_time=self.close_time,
+            **update,
+        )
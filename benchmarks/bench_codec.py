@@ -0,0 +1,54 @@
+"""Микро-бенчмарк форматов сообщений PriceChangeMessage: размер и скорость encode/decode.
+
+Запуск из корня репозитория: python -m benchmarks.bench_codec [--rounds N]
+"""
+import argparse
+import time
+
+from aggregator.gateways.rabbit.codec import JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPE, get_codec
+from aggregator.schemas.models import PriceChangeMessage
+
+MESSAGE = PriceChangeMessage(
+    user_id="123456789",
+    symbol="BTCUSDT",
+    timeframe="1m",
+    price_change_percent=-1.2345678,
+    open_price=67250.01,
+    close_price=66419.77,
+    change_level=2,
+).model_dump(mode="json")
+
+
+def run(content_type: str, rounds: int) -> None:
+    try:
+        codec = get_codec(content_type)
+    except RuntimeError as e:
+        print(f"{content_type:<22} skipped: {e}")
+        return
+
+    body = codec.encode(MESSAGE)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        codec.encode(MESSAGE)
+    encode_rate = rounds / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        codec.decode(body)
+    decode_rate = rounds / (time.perf_counter() - started)
+
+    print(f"{content_type:<22} {len(body):>5} bytes {encode_rate:>12,.0f} enc/sec {decode_rate:>12,.0f} dec/sec")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200_000)
+    args = parser.parse_args()
+
+    for content_type in (JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPE):
+        run(content_type, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Микро-бенчмарк разбора kline-кадров: старый путь с тройным json против decode_frame.
+
+Запуск из корня репозитория: python -m benchmarks.bench_decode [--rounds N]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from aggregator.gateways.binance.decoder import decode_frame, frame_to_tick
+from aggregator.schemas.models import PriceChangeMessage, Tick
+
+FRAMES_PATH = Path(__file__).parent / "data" / "kline_frames.jsonl"
+
+
+def load_frames() -> list[bytes]:
+    return [line.encode() for line in FRAMES_PATH.read_text().splitlines() if line]
+
+
+def legacy_path(raw: bytes) -> PriceChangeMessage:
+    """Путь до оптимизации: loads -> dumps(data) -> loads -> pydantic"""
+    data = json.loads(raw)
+    symbol = data.get("stream", "").split("@")[0].upper()
+    kline = json.loads(json.dumps(data["data"]))["k"]
+    close_price = float(kline["c"])
+    open_price = float(kline["o"])
+    return PriceChangeMessage(
+        symbol=symbol,
+        timeframe="1m",
+        price_change_percent=((close_price - open_price) / open_price) * 100,
+        open_price=open_price,
+        close_price=close_price,
+    )
+
+
+def fast_path(raw: bytes) -> Tick:
+    return frame_to_tick(decode_frame(raw), "1m")
+
+
+def run(name: str, func, frames: list[bytes], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for raw in frames:
+            func(raw)
+    elapsed = time.perf_counter() - started
+    rate = len(frames) * rounds / elapsed
+    print(f"{name:<24} {rate:>14,.0f} frames/sec")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    frames = load_frames()
+    print(f"{len(frames)} frames x {args.rounds} rounds")
+
+    before = run("legacy (3x json)", legacy_path, frames, args.rounds)
+    after = run("decode_frame + tick", fast_path, frames, args.rounds)
+    run("decode_frame only", decode_frame, frames, args.rounds)
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Сквозной бенчмарк: фейковый Binance -> MainService -> MemoryBroker -> NotificationService -> фейковый Telegram.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_e2e --scenario 10k-users-200-symbols --output result.json
+
+Печатает и сохраняет json с ticks/sec, alerts/sec, p50/p99 задержки от отправки кадра до уведомления и RSS.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import resource
+import time
+
+import numpy as np
+
+from benchmarks.fakes import CountingMemoryProducer, FakeBinanceServer, FakeNotificationClient
+from aggregator.core.settings import settings
+from aggregator.gateways.binance.pool import BinanceStreamPool
+from aggregator.gateways.memory.consumer import MemoryConsumer as AggregatorMemoryConsumer
+from aggregator.main import MainService
+from aggregator.schemas.models import ActionEnum, InputCommand
+from provider.core.settings import settings as provider_settings
+from provider.gateways.memory.base import MemoryBroker
+from provider.gateways.memory.consumer import MemoryConsumer
+from provider.services.notification import NotificationService
+
+SCENARIOS = {
+    # users, symbols, symbols_per_user, кадров в секунду на поток
+    "1k-users-50-symbols": (1_000, 50, 5, 2.0),
+    "10k-users-200-symbols": (10_000, 200, 5, 2.0),
+    "10k-users-200-symbols-burst": (10_000, 200, 5, 20.0),
+}
+
+
+def build_commands(users: int, symbols: int, symbols_per_user: int, seed: int = 1) -> list[InputCommand]:
+    rng = random.Random(seed)
+    names = [f"SYM{index}USDT" for index in range(symbols)]
+    return [
+        InputCommand(
+            action=ActionEnum.SUBSCRIBE,
+            user_id=str(user_id),
+            symbols=rng.sample(names, symbols_per_user),
+            timeframe="1m",
+            thresholds=sorted(rng.uniform(0.2, 1.5) for _ in range(3)),
+        )
+        for user_id in range(users)
+    ]
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as file:
+        pages = int(file.read().split()[1])
+    return pages * resource.getpagesize() / 2**20
+
+
+class Recorder:
+    """Задержки и счетчики уведомлений в окне измерения"""
+
+    def __init__(self, server: FakeBinanceServer):
+        self._server = server
+        self.latencies_ns: list[int] = []
+        self.notifications = 0
+
+    def reset(self) -> None:
+        self.latencies_ns = []
+        self.notifications = 0
+
+    def record(self, message: dict) -> None:
+        self.notifications += 1
+        sent_at = self._server.sent_at.get((message["symbol"], message["close_price"]))
+        if sent_at is not None:
+            self.latencies_ns.append(time.perf_counter_ns() - sent_at)
+
+
+def _counters(service: MainService) -> tuple[int, int]:
+    stats = service.stats()
+    received = sum(connection["received"] for connection in stats["connections"])
+    evaluated = sum(stream["evaluated"] for stream in stats["streams"].values())
+    return received, evaluated
+
+
+async def run(users: int, symbols: int, symbols_per_user: int, rate: float, warmup: float, duration: float) -> dict:
+    server = FakeBinanceServer(rate=rate)
+    server.start()
+    settings.BINANCE_BASE_WS_URL = server.url
+
+    broker = MemoryBroker(maxsize=provider_settings.MEMORY_BROKER_QUEUE_SIZE)
+    producer = CountingMemoryProducer(broker)
+    service = MainService(consumer=AggregatorMemoryConsumer(broker), producer=producer, pool=BinanceStreamPool())
+    notification_client = FakeNotificationClient()
+    notification_service = NotificationService(client=notification_client)
+    recorder = Recorder(server)
+
+    async def notify(message: dict) -> None:
+        await notification_service.process_price_change(message)
+        recorder.record(message)
+
+    provider_consumers = [MemoryConsumer(broker) for _ in range(3)]
+    for consumer, queue in zip(provider_consumers, (
+        provider_settings.PRICE_CHANGE_QUEUE_LEVEL_1,
+        provider_settings.PRICE_CHANGE_QUEUE_LEVEL_2,
+        provider_settings.PRICE_CHANGE_QUEUE_LEVEL_3,
+    )):
+        await consumer.consume(command=notify, queue=queue)
+
+    started_at = time.perf_counter()
+    await service.restore(build_commands(users, symbols, symbols_per_user))
+    restore_s = time.perf_counter() - started_at
+
+    await asyncio.sleep(warmup)
+    recorder.reset()
+    received_before, evaluated_before = _counters(service)
+    published_before = producer.published
+    window_started = time.perf_counter()
+
+    await asyncio.sleep(duration)
+
+    elapsed = time.perf_counter() - window_started
+    received, evaluated = _counters(service)
+    published = producer.published - published_before
+    latencies_ms = np.array(recorder.latencies_ns) / 1e6
+    rss_mb = current_rss_mb()
+
+    for consumer in provider_consumers:
+        await consumer.stop_consuming()
+    await notification_service.stop()
+    await service.stop()
+    server.stop()
+
+    return {
+        "users": users,
+        "symbols": symbols,
+        "symbols_per_user": symbols_per_user,
+        "rate_per_stream": rate,
+        "duration_s": round(elapsed, 3),
+        "restore_s": round(restore_s, 3),
+        "ticks_per_s": round((received - received_before) / elapsed, 1),
+        "evaluated_per_s": round((evaluated - evaluated_before) / elapsed, 1),
+        "alerts_per_s": round(published / elapsed, 1),
+        "notifications_per_s": round(recorder.notifications / elapsed, 1),
+        "latency_ms": {
+            "samples": len(latencies_ms),
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3) if len(latencies_ms) else None,
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3) if len(latencies_ms) else None,
+            "max": round(float(latencies_ms.max()), 3) if len(latencies_ms) else None,
+        },
+        # RSS общий для процесса, включая поток фейкового Binance
+        "rss_mb": round(rss_mb, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS, default="1k-users-50-symbols")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--symbols", type=int)
+    parser.add_argument("--symbols-per-user", type=int)
+    parser.add_argument("--rate", type=float, help="кадров в секунду на поток")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--output", help="путь для сохранения результата в json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    users, symbols, symbols_per_user, rate = SCENARIOS[args.scenario]
+    result = asyncio.run(run(
+        users=args.users or users,
+        symbols=args.symbols or symbols,
+        symbols_per_user=args.symbols_per_user or symbols_per_user,
+        rate=args.rate or rate,
+        warmup=args.warmup,
+        duration=args.duration,
+    ))
+    result = {
+        "benchmark": "e2e",
+        "scenario": args.scenario,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        **result,
+    }
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Локальные заменители внешних систем для бенчмарков: Binance и Telegram, брокер - MemoryBroker сервиса."""
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+# настройки provider требуют токен бота, в бенчмарках Telegram не используется
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+from aggregator.gateways.memory.producer import MemoryProducer
+from provider.gateways.memory.base import MemoryBroker
+from provider.gateways.telegram.client import NotificationClient
+
+logger = logging.getLogger(__name__)
+
+
+class FakeBinanceServer:
+    """Websocket-сервер combined stream в отдельном потоке с синтетическими kline-кадрами
+
+    Понимает URL вида /stream?streams=a/b и SUBSCRIBE/UNSUBSCRIBE, как BinanceStreamPool.
+    Время отправки каждого кадра запоминается по (symbol, close_price) для замера задержки.
+    """
+
+    def __init__(self, rate: float = 1.0, volatility: float = 0.5, host: str = "127.0.0.1", port: int = 0):
+        # кадров в секунду на поток
+        self.rate = rate
+        # стандартное отклонение изменения цены в процентах
+        self.volatility = volatility
+        self.host = host
+        self.port = port
+        self.sent = 0
+        self.sent_at: dict[tuple[str, float], int] = {}
+        self._open_prices: dict[str, float] = {}
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopped: asyncio.Event | None = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(),), name="fake-binance", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._thread.join()
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        async with websockets.serve(self._handle_connection, self.host, self.port) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stopped.wait()
+
+    async def _handle_connection(self, connection) -> None:
+        query = parse_qs(urlparse(connection.request.path).query)
+        streams = set(filter(None, query.get("streams", [""])[0].split("/")))
+        emitter = asyncio.create_task(self._emit(connection, streams))
+        try:
+            async for raw in connection:
+                request = json.loads(raw)
+                params = set(request.get("params", []))
+                if request["method"] == "SUBSCRIBE":
+                    streams |= params
+                elif request["method"] == "UNSUBSCRIBE":
+                    streams -= params
+                await connection.send(json.dumps({"result": None, "id": request["id"]}))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            emitter.cancel()
+
+    async def _emit(self, connection, streams: set[str], tick: float = 0.01) -> None:
+        budget = 0.0
+        position = 0
+        while True:
+            await asyncio.sleep(tick)
+            budget += self.rate * tick * len(streams)
+            count, budget = int(budget), budget - int(budget)
+            if not streams:
+                continue
+
+            ordered = sorted(streams)
+            for _ in range(count):
+                await connection.send(self._frame(ordered[position % len(ordered)]))
+                position += 1
+
+    def _frame(self, stream: str) -> str:
+        symbol, _, kline = stream.partition("@")
+        symbol = symbol.upper()
+        open_price = self._open_prices.setdefault(symbol, random.uniform(10, 1000))
+        close = f"{open_price * (1 + random.gauss(0, self.volatility) / 100):.8f}"
+
+        now = int(time.time() * 1000)
+        open_time = now - now % 60_000
+        self.sent_at[(symbol, float(close))] = time.perf_counter_ns()
+        self.sent += 1
+
+        return json.dumps({
+            "stream": stream,
+            "data": {
+                "e": "kline", "E": now, "s": symbol,
+                "k": {
+                    "t": open_time, "T": open_time + 59_999, "s": symbol, "i": kline.removeprefix("kline_"),
+                    "o": f"{open_price:.8f}", "c": close, "h": close, "l": close,
+                    "v": "1.00000000", "n": 1, "x": False,
+                },
+            },
+        })
+
+
+class CountingMemoryProducer(MemoryProducer):
+    """Продюсер брокера в памяти со счетчиком опубликованных уведомлений"""
+
+    def __init__(self, broker: MemoryBroker):
+        super().__init__(broker)
+        self.published = 0
+
+    async def produce(self, routing_key: str, message: dict) -> None:
+        await super().produce(routing_key, message)
+        self.published += 1
+
+
+class FakeNotificationClient(NotificationClient):
+    """Считает отправки вместо Telegram, delay имитирует время ответа API"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = 0
+
+    async def send_message(self, chat_id: str, message: str, priority: int = 1) -> bool:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent += 1
+        return True
+
+    async def send_init_message(
+        self, chat_id: str, symbols: list[str], timeframe: str, thresholds: list[float]
+    ) -> bool:
+        return await self.send_message(chat_id, "")
+
+    async def send_message_with_buttons(
+        self, chat_id: str, message: str, buttons: list[list[str]], priority: int = 1
+    ) -> bool:
+        return await self.send_message(chat_id, message, priority)
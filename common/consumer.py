@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import zlib
+from collections import deque
+from typing import Awaitable, Callable
+
+from aio_pika import IncomingMessage
+
+logger = logging.getLogger(__name__)
+
+KeyFunc = Callable[[dict], str | None]
+DecodeFunc = Callable[[IncomingMessage], Awaitable[dict]]
+
+
+def user_key(message: dict) -> str | None:
+    return message.get("user_id")
+
+
+class AckBatcher:
+    """Пакетное подтверждение: один multiple-ack до наибольшего номера доставки, до которого обработано все"""
+
+    def __init__(self, batch_size: int, interval: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        # доставленные и еще не подтвержденные, в порядке номеров доставки
+        self._delivered: deque[IncomingMessage] = deque()
+        # номер доставки -> обработано успешно (False - уже отклонено через nack)
+        self._finished: dict[int, bool] = {}
+        self._since_flush = 0
+        self._flush_task: asyncio.Task | None = None
+
+    def track(self, message: IncomingMessage) -> None:
+        self._delivered.append(message)
+
+    async def finish(self, message: IncomingMessage, success: bool = True) -> None:
+        self._finished[message.delivery_tag] = success
+        self._since_flush += 1
+        if self._since_flush >= self.batch_size:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        self._since_flush = 0
+        last_success = None
+        while self._delivered and self._delivered[0].delivery_tag in self._finished:
+            message = self._delivered.popleft()
+            if self._finished.pop(message.delivery_tag):
+                last_success = message
+
+        # отклоненные уже не числятся неподтвержденными, multiple-ack их не затрагивает
+        if last_success is not None:
+            try:
+                await last_success.ack(multiple=True)
+            except Exception as e:
+                logger.error(f"Error acknowledging messages up to {last_success.delivery_tag}: {e}")
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+
+class KeyedWorkers:
+    """Пул обработчиков очереди с разбиением по ключу и пакетным подтверждением"""
+
+    def __init__(
+        self,
+        workers: int,
+        ack_batch_size: int,
+        ack_interval: float,
+        decode: DecodeFunc,
+        key: KeyFunc = user_key,
+        log_decode_error: Callable[..., None] | None = None,
+        log_handler_error: Callable[..., None] | None = None,
+    ):
+        self.workers = workers
+        self._decode = decode
+        self._key = key
+        self._log_decode_error = log_decode_error or logger.error
+        self._log_handler_error = log_handler_error or logger.error
+        self._acks = AckBatcher(batch_size=ack_batch_size, interval=ack_interval)
+        # очереди обработчиков без лимита: больше prefetch_count брокер не отдаст
+        self._inboxes: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self._queue = ""
+
+    def start(self, command: Callable, queue: str = "") -> None:
+        self._queue = queue
+        for _ in range(self.workers):
+            inbox = asyncio.Queue()
+            self._inboxes.append(inbox)
+            self._tasks.append(asyncio.create_task(self._work(command, inbox)))
+
+    async def handle(self, message: IncomingMessage) -> None:
+        """Обработчик для queue.consume, подтверждение - после обработки"""
+        self._acks.track(message)
+        try:
+            decoded_message = await self._decode(message)
+        except Exception as e:
+            self._log_decode_error("Decode error for %s (%s): %s", self._queue, message.content_type, e)
+            await message.reject(requeue=False)
+            await self._acks.finish(message, success=False)
+            return
+
+        # сообщения одного ключа всегда попадают к одному обработчику и идут по порядку
+        key = self._key(decoded_message)
+        shard = zlib.crc32(key.encode()) if key else message.delivery_tag
+        self._inboxes[shard % len(self._inboxes)].put_nowait((message, decoded_message))
+
+    async def _work(self, command: Callable, inbox: asyncio.Queue) -> None:
+        while True:
+            message, decoded_message = await inbox.get()
+            try:
+                await command(decoded_message)
+            except Exception as e:
+                self._log_handler_error("Error in message handler for %s: %s", self._queue, e)
+                # повторная доставка дается один раз, сообщение, упавшее снова, уходит в dead-letter,
+                # иначе одно ядовитое сообщение возвращается в очередь бесконечно и занимает слот prefetch
+                await message.nack(requeue=not message.redelivered)
+                await self._acks.finish(message, success=False)
+            else:
+                await self._acks.finish(message)
+
+    async def stop(self) -> None:
+        """Остановка обработчиков и подтверждение того, что успело обработаться"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._inboxes.clear()
+        await self._acks.close()
@@ -0,0 +1,140 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Protocol
+
+DEFAULT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# стандартные атрибуты LogRecord, все остальное пришло через extra и попадает в json
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: QueueListener | None = None
+
+
+class CounterLike(Protocol):
+    """Счетчик метрик сервиса, в который пишутся пропущенные и отброшенные записи"""
+
+    def inc(self, *labels, value: float = 1.0) -> None: ...
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка json, поля из extra добавляются как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Запись только кладется в очередь, форматирование и вывод - в потоке слушателя"""
+
+    def __init__(self, log_queue: queue.Queue, dropped_total: CounterLike | None = None):
+        super().__init__(log_queue)
+        self.dropped_total = dropped_total
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # стандартный QueueHandler форматирует сообщение в вызывающем потоке, то есть в цикле событий
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.dropped_total is not None:
+                self.dropped_total.inc()
+
+
+class RateLimitedLog:
+    """Точка логирования горячего пути: не чаще одной записи за interval, пропущенные считаются
+
+    Аргументы передаются как в logging (%-формат), поэтому при выключенном уровне и
+    пропуске по лимиту сообщение не форматируется вовсе.
+    """
+
+    __slots__ = ("logger", "level", "interval", "site", "suppressed", "suppressed_total", "_next_at")
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        level: int,
+        site: str,
+        interval: float,
+        suppressed_total: CounterLike | None = None,
+    ):
+        self.logger = logger
+        self.level = level
+        self.interval = interval
+        self.site = site
+        self.suppressed = 0
+        self.suppressed_total = suppressed_total
+        self._next_at = 0.0
+
+    def __call__(self, msg: str, *args, **kwargs) -> None:
+        if not self.logger.isEnabledFor(self.level):
+            return
+
+        now = time.monotonic()
+        if now < self._next_at:
+            self.suppressed += 1
+            if self.suppressed_total is not None:
+                self.suppressed_total.inc(self.site)
+            return
+
+        self._next_at = now + self.interval
+        if self.suppressed:
+            msg = f"{msg} (suppressed {self.suppressed} similar in last {self.interval:g}s)"
+            self.suppressed = 0
+        self.logger.log(self.level, msg, *args, stacklevel=2, **kwargs)
+
+
+def setup_logging(
+    level: str,
+    json_output: bool,
+    queue_size: int,
+    fmt: str = DEFAULT_FORMAT,
+    dropped_total: CounterLike | None = None,
+) -> None:
+    """Настройка корневого логгера один раз на процесс: очередь в памяти и вывод в stdout из отдельного потока
+
+    Повторный вызов, в том числе из другого сервиса в том же процессе, ничего не меняет.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if json_output else logging.Formatter(fmt))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(NonBlockingQueueHandler(log_queue, dropped_total=dropped_total))
+    root.setLevel(level)
+
+
+def stop_logging() -> None:
+    """Вывод оставшихся в очереди записей и остановка потока слушателя"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Callable, Protocol
+
+from common.logs import CounterLike
+
+logger = logging.getLogger(__name__)
+
+# глубина стека в отчете о зависании, самые внутренние кадры
+STACK_DEPTH = 20
+
+
+class HistogramLike(Protocol):
+    """Гистограмма метрик сервиса для задержки планирования"""
+
+    def observe(self, value: float, *labels) -> None: ...
+
+
+def _format_stack(frame) -> list[str]:
+    return [line.rstrip() for line in traceback.format_stack(frame)[-STACK_DEPTH:]]
+
+
+class LoopMonitor:
+    """Здоровье цикла событий: задержка планирования, зависания со стеком, профилировщик по запросу
+
+    Задача в цикле просыпается каждые interval и меряет опоздание. Сторожевой поток
+    видит, что задача давно не просыпалась, и снимает стек потока цикла прямо во время
+    зависания; стек попадает в отчет, когда цикл освободится. Накладные расходы -
+    одно пробуждение задачи и потока за interval.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        slow_threshold: float,
+        profile_max_seconds: float,
+        lag_seconds: HistogramLike | None = None,
+        stalls_total: CounterLike | None = None,
+        log_stall: Callable[..., None] | None = None,
+        max_reports: int = 20,
+    ):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.profile_max_seconds = profile_max_seconds
+        self._lag_seconds = lag_seconds
+        self._stalls_total = stalls_total
+        self._log_stall = log_stall or logger.warning
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.reports: deque[dict] = deque(maxlen=max_reports)
+        self._loop_thread_id: int | None = None
+        self._last_beat = 0.0
+        self._stall_stack: list[str] | None = None
+        self._stall_beat = 0.0
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._profile_lock = asyncio.Lock()
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop monitor started (interval={self.interval}s, slow threshold={self.slow_threshold}s)")
+
+    async def _measure(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+
+            if self._lag_seconds is not None:
+                self._lag_seconds.observe(lag)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.slow_threshold:
+                self._report_stall(lag)
+            self._last_beat = now
+
+    def _report_stall(self, lag: float) -> None:
+        # стек относится к этому зависанию, только если снят после предыдущего пробуждения
+        stack = self._stall_stack if self._stall_beat == self._last_beat else None
+        self._stall_stack = None
+        self.stalls += 1
+        if self._stalls_total is not None:
+            self._stalls_total.inc()
+        self.reports.append({"at": time.time(), "duration": round(lag, 4), "stack": stack})
+        self._log_stall(
+            "Event loop blocked for %.3fs%s",
+            lag,
+            ":\n" + "\n".join(stack) if stack else "",
+        )
+
+    def _watch(self) -> None:
+        check_every = max(self.slow_threshold / 2, 0.01)
+        while not self._stopped.wait(check_every):
+            beat = self._last_beat
+            if self._stall_beat == beat and self._stall_stack is not None:
+                continue
+            if time.monotonic() - beat > self.interval + self.slow_threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._stall_stack = _format_stack(frame)
+                    self._stall_beat = beat
+
+    async def profile(self, seconds: float, sample_interval: float = 0.005) -> str:
+        """Сэмплирование стека потока цикла в течение seconds, результат - свернутые стеки (формат flamegraph)"""
+        seconds = min(max(seconds, 0.1), self.profile_max_seconds)
+        if self._profile_lock.locked():
+            raise RuntimeError("Profiling is already running")
+
+        async with self._profile_lock:
+            logger.info(f"Sampling event loop for {seconds}s")
+            samples = await asyncio.to_thread(self._sample, seconds, sample_interval)
+
+        lines = [f"{stack} {count}" for stack, count in samples.most_common()]
+        return "\n".join(lines) + "\n"
+
+    def _sample(self, seconds: float, sample_interval: float) -> Counter:
+        samples = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                samples[";".join(reversed(stack))] += 1
+            time.sleep(sample_interval)
+        return samples
+
+    def status(self) -> dict:
+        return {
+            "lag_last": round(self.last_lag, 4),
+            "lag_max": round(self.max_lag, 4),
+            "slow_threshold": self.slow_threshold,
+            "stalls": self.stalls,
+            "recent_stalls": list(self.reports),
+        }
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
@@ -0,0 +1,153 @@
+import bisect
+from collections import defaultdict
+
+# границы гистограмм задержек в секундах: от 100 мкс до 10 с
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INF_LABEL = 'le="+Inf"'
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Монотонный счетчик с метками, значения меток передаются позиционно в порядке labelnames"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.series: dict[tuple, float] = defaultdict(float)
+
+    def inc(self, *labels, value: float = 1.0) -> None:
+        self.series[labels] += value
+
+    def snapshot(self) -> dict[tuple, float]:
+        return dict(self.series)
+
+    @staticmethod
+    def merge(total: float | None, state: float) -> float:
+        return state if total is None else total + state
+
+    def render(self, series: dict[tuple, float]) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in series.items()]
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами, хранит некумулятивные счетчики корзин, сумму и число"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # метки -> [счетчики корзин (последняя - больше верхней границы), сумма, число]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        state = self.series.get(labels)
+        if state is None:
+            state = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def snapshot(self) -> dict[tuple, list]:
+        return {labels: [list(counts), total, count] for labels, (counts, total, count) in self.series.items()}
+
+    @staticmethod
+    def merge(total: list | None, state: list) -> list:
+        if total is None:
+            return [list(state[0]), state[1], state[2]]
+        return [[a + b for a, b in zip(total[0], state[0])], total[1] + state[1], total[2] + state[2]]
+
+    def render(self, series: dict[tuple, list]) -> list[str]:
+        lines = []
+        for labels, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, INF_LABEL)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Метрики процесса в формате Prometheus
+
+    К выдаче добавляются присланные снимки других процессов (процессов оценки aggregator)
+    и подключенные реестры (aggregator в одном процессе с provider).
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+        # источник -> имя метрики -> метки -> состояние, снимки накопительные и заменяют предыдущие
+        self._remote: dict[str, dict[str, dict]] = {}
+        self._included: list = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def update_remote(self, source: str, snapshot: dict[str, dict]) -> None:
+        self._remote[source] = snapshot
+
+    def include(self, other) -> None:
+        """Добавление к выдаче другого реестра с методом render()"""
+        if other not in self._included:
+            self._included.append(other)
+
+    def render(self) -> str:
+        lines = []
+        for name, metric in self._metrics.items():
+            series = {}
+            for snapshot in (metric.snapshot(), *(remote.get(name, {}) for remote in self._remote.values())):
+                for labels, state in snapshot.items():
+                    series[labels] = metric.merge(series.get(labels), state)
+
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(series))
+        return "\n".join(lines) + "\n" + "".join(other.render() for other in self._included)
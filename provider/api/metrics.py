@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from provider.core.metrics import registry
+from provider.gateways.telegram.dispatcher import get_scheduler
+
+router = APIRouter(tags=["metrics"])
+# отладочные эндпоинты подключаются только при LOOP_PROFILE_ENABLED
+debug_router = APIRouter(tags=["debug"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/status")
+async def status(request: Request) -> dict:
+    monitor = getattr(request.app.state, "loop_monitor", None)
+    aggregator_service = getattr(request.app.state, "aggregator_service", None)
+    return {
+        "loop": monitor.status() if monitor else None,
+        "dispatcher": get_scheduler().stats(),
+        "aggregator": aggregator_service.stats() if aggregator_service else None,
+    }
+
+
+@debug_router.get("/debug/profile", response_class=PlainTextResponse)
+async def profile(request: Request, seconds: float = 5.0) -> PlainTextResponse:
+    """Сэмплирующий профиль цикла событий за seconds секунд в формате свернутых стеков"""
+    monitor = getattr(request.app.state, "loop_monitor", None)
+    if monitor is None:
+        raise HTTPException(status_code=404, detail="Loop monitor is disabled")
+
+    try:
+        return PlainTextResponse(await monitor.profile(seconds))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,29 @@
+import logging
+
+from common import logs
+from common.logs import DEFAULT_FORMAT
+from provider.core.metrics import registry
+from provider.core.settings import settings
+
+LOG_SUPPRESSED = registry.counter(
+    "provider_log_suppressed_total", "Hot-path log lines suppressed by rate limiting", ("site",)
+)
+LOG_DROPPED = registry.counter("provider_log_dropped_total", "Log records dropped because the log queue was full")
+
+
+class RateLimitedLog(logs.RateLimitedLog):
+    """Точка логирования горячего пути с интервалом из настроек, пропуски попадают в /metrics"""
+
+    __slots__ = ()
+
+    def __init__(self, logger: logging.Logger, level: int, site: str, interval: float = settings.LOG_RATE_LIMIT_INTERVAL):
+        super().__init__(logger, level, site, interval, suppressed_total=LOG_SUPPRESSED)
+
+
+def setup_logging(
+    level: str = settings.LOG_LEVEL,
+    json_output: bool = settings.LOG_JSON,
+    queue_size: int = settings.LOG_QUEUE_SIZE,
+    fmt: str = DEFAULT_FORMAT,
+) -> None:
+    logs.setup_logging(level, json_output, queue_size, fmt=fmt, dropped_total=LOG_DROPPED)
@@ -0,0 +1,31 @@
+import logging
+
+from common import loop_monitor
+from provider.core.logs import RateLimitedLog
+from provider.core.metrics import registry
+from provider.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = registry.histogram("provider_loop_lag_seconds", "Event loop scheduling lag")
+LOOP_STALLS = registry.counter("provider_loop_stalls_total", "Callbacks that held the event loop over the threshold")
+
+
+class LoopMonitor(loop_monitor.LoopMonitor):
+    """Монитор цикла событий с порогами из настроек и метриками сервиса"""
+
+    def __init__(
+        self,
+        interval: float = settings.LOOP_MONITOR_INTERVAL,
+        slow_threshold: float = settings.LOOP_SLOW_CALLBACK_THRESHOLD,
+        max_reports: int = 20,
+    ):
+        super().__init__(
+            interval=interval,
+            slow_threshold=slow_threshold,
+            profile_max_seconds=settings.LOOP_PROFILE_MAX_SECONDS,
+            lag_seconds=LOOP_LAG_SECONDS,
+            stalls_total=LOOP_STALLS,
+            log_stall=RateLimitedLog(logger, logging.WARNING, "loop_monitor.stall"),
+            max_reports=max_reports,
+        )
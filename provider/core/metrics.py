@@ -0,0 +1,30 @@
+from common.metrics import Registry
+
+registry = Registry()
+
+# этапы от сообщения брокера до ответа Bot API
+CONSUMED = registry.counter("provider_consumed_total", "Price change messages consumed", ("queue",))
+CONSUME_SECONDS = registry.histogram(
+    "provider_consume_seconds", "Handler time per consumed price change message", ("queue",)
+)
+FORMAT_SECONDS = registry.histogram("provider_format_seconds", "Notification text formatting time", ("kind",))
+NOTIFICATIONS = registry.counter("provider_notifications_total", "Notifications handed to the client", ("kind",))
+DIGEST_BUFFERED = registry.counter("provider_digest_buffered_total", "Alerts buffered into a user digest")
+DISPATCH_WAIT_SECONDS = registry.histogram(
+    "provider_dispatch_wait_seconds", "Time in the Telegram dispatch queue before sending", ("priority",)
+)
+# границы для возраста уведомлений: от 10 мс до 5 минут
+AGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+ALERT_AGE_SECONDS = registry.histogram(
+    "provider_alert_age_seconds", "Binance event time to provider consume, includes clock skew", ("level",), AGE_BUCKETS
+)
+ALERT_DELIVERY_SECONDS = registry.histogram(
+    "provider_alert_delivery_seconds", "Binance event time to Bot API response", ("level",), AGE_BUCKETS
+)
+ALERT_STAGE_SECONDS = registry.histogram(
+    "provider_alert_stage_seconds", "Time between pipeline timestamps carried by the alert", ("stage",), AGE_BUCKETS
+)
+STALE_ALERTS = registry.counter("provider_stale_alerts_total", "Alerts older than the staleness budget", ("action",))
+TELEGRAM_SEND_SECONDS = registry.histogram(
+    "provider_telegram_send_seconds", "Bot API send_message round trip", ("result",)
+)
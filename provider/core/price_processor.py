@@ -1,7 +1,10 @@
 import logging
 import asyncio
+import time
+from typing import Callable
 
 
+from provider.core.metrics import CONSUMED, CONSUME_SECONDS
 from provider.gateways.rabbitmq.consumer import Consumer, RabbitMqConsumer
 from provider.gateways.rabbitmq.base import RabbitMqConnector
 from provider.core.settings import settings
@@ -11,9 +14,15 @@ logger = logging.getLogger(__name__)
 
 
 class PriceConsumerProcessor:
-    def __init__(self, connector: RabbitMqConnector, notification_service: NotificationService):
+    def __init__(
+        self,
+        connector: RabbitMqConnector | None,
+        notification_service: NotificationService,
+        consumer_factory: Callable[[], Consumer] | None = None,
+    ):
         self._connector = connector
         self._notification_service = notification_service
+        self._consumer_factory = consumer_factory or (lambda: RabbitMqConsumer(self._connector))
         self.is_running = False
         self._consumers: list[Consumer] = []
 
@@ -26,15 +35,23 @@ class PriceConsumerProcessor:
 
         for queue in queues:
             logger.info(f"Creating consumer for queue: {queue}")
-            consumer = RabbitMqConsumer(self._connector)
+            consumer = self._consumer_factory()
             self._consumers.append(consumer)
 
-            await consumer.consume(
-                command=lambda msg: self._notification_service.process_price_change(msg, queue),
-                queue=queue
-            )
+            await consumer.consume(command=self._create_handler(queue), queue=queue)
             logger.info(f"✅ Consumer for {queue} started")
 
+    def _create_handler(self, queue: str) -> Callable:
+        async def handler(message: dict) -> None:
+            started_at = time.perf_counter()
+            try:
+                await self._notification_service.process_price_change(message, queue)
+            finally:
+                CONSUMED.inc(queue)
+                CONSUME_SECONDS.observe(time.perf_counter() - started_at, queue)
+
+        return handler
+
     async def start(self) -> None:
         self.is_running = True
         logger.info("Starting Notification Processor...")
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import logging
+import os
+from functools import cache
+
+from provider.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# та же маршрутизация, что у exchange price_changes в scripts/rabbit-init.sh
+DEFAULT_BINDINGS = {
+    "commands": "commands",
+    "level_1": "price_change_level_1",
+    "level_2": "price_change_level_2",
+    "level_3": "price_change_level_3",
+}
+
+
+class MemoryBroker:
+    """Брокер в памяти процесса для запуска provider и aggregator вместе: ограниченные asyncio-очереди
+
+    Заполненная очередь останавливает публикацию до освобождения места. При заданном persist_path
+    недоставленные сообщения сохраняются при остановке и возвращаются в очереди при запуске.
+    """
+
+    def __init__(self, maxsize: int = 10000, persist_path: str = "", bindings: dict[str, str] | None = None):
+        self.maxsize = maxsize
+        self.persist_path = persist_path
+        self.bindings = bindings or DEFAULT_BINDINGS
+        self._queues: dict[str, asyncio.Queue] = {}
+
+    def get_queue(self, name: str) -> asyncio.Queue:
+        if name not in self._queues:
+            self._queues[name] = asyncio.Queue(maxsize=self.maxsize)
+        return self._queues[name]
+
+    async def publish(self, routing_key: str, message: dict) -> None:
+        await self.get_queue(self.bindings.get(routing_key, routing_key)).put(message)
+
+    def load(self) -> None:
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+
+        with open(self.persist_path) as file:
+            saved = json.load(file)
+        os.remove(self.persist_path)
+
+        for name, messages in saved.items():
+            queue = self.get_queue(name)
+            for message in messages:
+                if queue.full():
+                    logger.warning(f"Memory queue {name} is full, dropped saved messages")
+                    break
+                queue.put_nowait(message)
+            logger.info(f"Restored {queue.qsize()} messages into memory queue {name}")
+
+    def save(self) -> None:
+        if not self.persist_path:
+            return
+
+        saved = {}
+        for name, queue in self._queues.items():
+            messages = []
+            while not queue.empty():
+                messages.append(queue.get_nowait())
+            if messages:
+                saved[name] = messages
+
+        with open(self.persist_path, "w") as file:
+            json.dump(saved, file)
+        logger.info(f"Saved {sum(map(len, saved.values()))} undelivered messages to {self.persist_path}")
+
+
+@cache
+def get_broker() -> MemoryBroker:
+    return MemoryBroker(maxsize=settings.MEMORY_BROKER_QUEUE_SIZE, persist_path=settings.MEMORY_BROKER_PERSIST_PATH)
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+from typing import Callable
+
+from provider.core.logs import RateLimitedLog
+from provider.gateways.memory.base import MemoryBroker
+from provider.gateways.rabbitmq.consumer import Consumer
+
+logger = logging.getLogger(__name__)
+
+_log_handler_error = RateLimitedLog(logger, logging.ERROR, "memory_consumer.handler")
+
+
+class MemoryConsumer(Consumer):
+    def __init__(self, broker: MemoryBroker):
+        self._broker = broker
+        self._consuming_task: asyncio.Task | None = None
+
+    async def consume(self, command: Callable, queue: str) -> None:
+        if self._consuming_task is not None:
+            logger.warning(f"Consumer for {queue} is already running")
+            return
+
+        self._consuming_task = asyncio.create_task(self._consume_loop(command, queue))
+        logger.info(f"✅ Registered memory consumer for queue: {queue}")
+
+    async def _consume_loop(self, command: Callable, queue: str) -> None:
+        memory_queue = self._broker.get_queue(queue)
+        while True:
+            message = await memory_queue.get()
+            try:
+                await command(await self.decode_message(message))
+            except Exception as e:
+                _log_handler_error("Error in message handler for %s: %s", queue, e)
+
+    async def decode_message(self, message: dict) -> dict:
+        """Сообщения в памяти не сериализуются"""
+        return message
+
+    async def stop_consuming(self):
+        if self._consuming_task is not None:
+            self._consuming_task.cancel()
+            try:
+                await self._consuming_task
+            except asyncio.CancelledError:
+                pass
+            self._consuming_task = None
+        logger.info("Stopped consuming from memory queue")
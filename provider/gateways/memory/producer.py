@@ -0,0 +1,16 @@
+import logging
+
+from provider.gateways.memory.base import MemoryBroker
+from provider.gateways.rabbitmq.producer import Producer
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryProducer(Producer):
+    def __init__(self, broker: MemoryBroker):
+        self._broker = broker
+
+    async def produce(self, routing_key: str, message: dict) -> None:
+        """Постановка сообщения в очередь брокера, ждет при заполненной очереди"""
+        await self._broker.publish(routing_key, message)
+        logger.debug("Message sent to %s: %s", routing_key, message)
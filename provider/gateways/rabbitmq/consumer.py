@@ -1,15 +1,21 @@
 import asyncio
-import json
 import logging
 from typing import Callable, Any
 from abc import ABC, abstractmethod
 
 from aio_pika import IncomingMessage
 
+from common.consumer import KeyFunc, KeyedWorkers, user_key
+from provider.core.logs import RateLimitedLog
+from provider.core.settings import settings
 from provider.gateways.rabbitmq.base import RabbitMqConnector
+from provider.gateways.rabbitmq.codec import get_codec
 
 logger = logging.getLogger(__name__)
 
+_log_decode_error = RateLimitedLog(logger, logging.ERROR, "consumer.decode")
+_log_handler_error = RateLimitedLog(logger, logging.ERROR, "consumer.handler")
+
 
 class Consumer(ABC):
     @abstractmethod
@@ -23,10 +29,29 @@ class Consumer(ABC):
 
 
 class RabbitMqConsumer(Consumer):
-    def __init__(self, connector: RabbitMqConnector):
+    def __init__(
+        self,
+        connector: RabbitMqConnector,
+        prefetch_count: int = settings.RABBITMQ_PREFETCH_COUNT,
+        workers: int = settings.RABBITMQ_CONSUMER_WORKERS,
+        ack_batch_size: int = settings.RABBITMQ_ACK_BATCH_SIZE,
+        ack_interval: float = settings.RABBITMQ_ACK_INTERVAL,
+        key: KeyFunc = user_key,
+    ):
         self.connector = connector
         self._is_consuming = False
-        self._consuming_task = None
+        self.prefetch_count = prefetch_count
+        self.workers = workers
+        self._workers = KeyedWorkers(
+            workers,
+            ack_batch_size,
+            ack_interval,
+            decode=self.decode_message,
+            key=key,
+            log_decode_error=_log_decode_error,
+            log_handler_error=_log_handler_error,
+        )
+        self._channel = None
 
     async def consume(self, command: Callable, queue: str) -> None:
         if self._is_consuming:
@@ -36,18 +61,11 @@ class RabbitMqConsumer(Consumer):
         self._is_consuming = True
 
         try:
-            rabbit_queue = await self.connector.channel.get_queue(queue)
-
-            async def message_handler(message: IncomingMessage):
-                try:
-                    decoded_message = await self.decode_message(message)
-                    await command(decoded_message)
-                except Exception as e:
-                    logger.error(f"Error in message handler for {queue}: {e}")
-                    await message.nack()
-
-            await rabbit_queue.consume(message_handler)
-            logger.info(f"✅ Registered consumer for queue: {queue}")
+            self._channel = await self.connector.open_channel(prefetch_count=self.prefetch_count)
+            rabbit_queue = await self._channel.get_queue(queue)
+            self._workers.start(command, queue)
+            await rabbit_queue.consume(self._workers.handle)
+            logger.info(f"✅ Registered consumer for queue: {queue} (prefetch={self.prefetch_count}, workers={self.workers})")
 
         except asyncio.CancelledError:
             logger.info(f"Consuming from {queue} cancelled")
@@ -56,20 +74,16 @@ class RabbitMqConsumer(Consumer):
             raise
 
     async def decode_message(self, message: IncomingMessage) -> dict:
-        """Декодирование сообщения"""
-        try:
-            async with message.process():
-                decoded = json.loads(message.body.decode())
-                logger.debug(f"Received message from queue: {decoded}")
-                return decoded
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {e}")
-            return {}
-        except Exception as e:
-            logger.error(f"Error decoding message: {e}")
-            return {}
+        """Декодирование сообщения, подтверждение - после обработки"""
+        decoded = get_codec(message.content_type).decode(message.body)
+        logger.debug("Received message from queue: %s", decoded)
+        return decoded
 
     async def stop_consuming(self):
-        """Остановка потребления сообщений"""
+        """Остановка потребления сообщений, необработанные вернутся в очередь при закрытии канала"""
         self._is_consuming = False
-        logger.info("Stopped consuming from all queues")
\ No newline at end of file
+        await self._workers.stop()
+        if self._channel is not None and not self._channel.is_closed:
+            await self._channel.close()
+        self._channel = None
+        logger.info("Stopped consuming from all queues")
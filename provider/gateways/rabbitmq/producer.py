@@ -1,12 +1,16 @@
 import logging
-import json
 from abc import ABC, abstractmethod
 
 import aio_pika
+from provider.core.logs import RateLimitedLog
 from provider.gateways.rabbitmq.base import RabbitMqConnector
+from provider.gateways.rabbitmq.codec import Codec, get_codec
+from provider.core.settings import settings
 
 logger = logging.getLogger(__name__)
 
+_log_publish_error = RateLimitedLog(logger, logging.ERROR, "producer.publish")
+
 
 class Producer(ABC):
     @abstractmethod
@@ -14,23 +18,28 @@ class Producer(ABC):
 
 
 class RabbitMqProducer(Producer):
-    def __init__(self, connector: RabbitMqConnector):
+    def __init__(self, connector: RabbitMqConnector, codec: Codec | None = None):
         self._connector = connector
+        self._codec = codec or get_codec(settings.RABBITMQ_CONTENT_TYPE)
 
     async def produce(self, routing_key: str, message: dict) -> None:
         """Отправка сообщения в указанную очередь"""
         try:
-            await self._connector.connect()
-            await self._connector.exchanger.publish(
-                aio_pika.Message(
-                    body=json.dumps(message).encode(),
-                    content_type="application/json",
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT
-                ),
-                routing_key=routing_key
-            )
-            logger.debug(f"Message sent to {routing_key}: {message}")
+            async with self._connector.acquire_exchange() as exchange:
+                await exchange.publish(
+                    self._build_message(message),
+                    routing_key=routing_key
+                )
+            logger.debug("Message sent to %s: %s", routing_key, message)
 
         except Exception as e:
-            logger.exception(f"Failed to send message to {routing_key}: {e}")
+            _log_publish_error("Failed to send message to %s: %s", routing_key, e, exc_info=True)
             raise
+
+    def _build_message(self, message: dict) -> aio_pika.Message:
+        return aio_pika.Message(
+            body=self._codec.encode(message),
+            content_type=self._codec.content_type,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+        )
+
@@ -1,17 +1,25 @@
 import logging
+import time
 from abc import ABC, abstractmethod
 
 from telegram import Bot
-from telegram.error import TelegramError
+from telegram.error import RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
 
+from provider.core.logs import RateLimitedLog
+from provider.core.metrics import TELEGRAM_SEND_SECONDS
 from provider.core.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# при недоступности Bot API ошибка повторяется на каждом уведомлении
+_log_send_error = RateLimitedLog(logger, logging.ERROR, "telegram.send")
+
 
 class NotificationClient(ABC):
+    # priority - уровень изменения (3 > 2 > 1), учитывается планировщиком отправки
     @abstractmethod
-    async def send_message(self, chat_id: str, message: str) -> bool: ...
+    async def send_message(self, chat_id: str, message: str, priority: int = 1) -> bool: ...
 
     @abstractmethod
     async def send_init_message(
@@ -19,27 +27,52 @@ self, chat_id: str, symbols: list[str], timeframe: str, thresholds: list[float]
     ) -> bool: ...
 
     @abstractmethod
-    async def send_message_with_buttons(self, chat_id: str, message: str, buttons: list[list[str]]) -> bool: ...
+    async def send_message_with_buttons(
+        self, chat_id: str, message: str, buttons: list[list[str]], priority: int = 1
+    ) -> bool: ...
 
 
 class TelegramClient(NotificationClient):
-    def __init__(self):
-        self.bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-
-    async def send_message(self, chat_id: str, message: str, parse_mode: str = "HTML") -> bool:
+    def __init__(self, connection_pool_size: int = settings.TELEGRAM_CONNECTION_POOL_SIZE):
+        self._request = HTTPXRequest(connection_pool_size=connection_pool_size)
+        self.bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, request=self._request)
+
+    async def close(self) -> None:
+        """Закрытие пула HTTP-соединений бота"""
+        await self._request.shutdown()
+
+    async def _send(self, **kwargs) -> None:
+        """Вызов Bot API с замером времени ответа"""
+        started_at = time.perf_counter()
+        result = "ok"
         try:
-            await self.bot.send_message(
+            await self.bot.send_message(**kwargs)
+        except RetryAfter:
+            result = "rate_limited"
+            raise
+        except Exception:
+            result = "error"
+            raise
+        finally:
+            TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started_at, result)
+
+    async def send_message(self, chat_id: str, message: str, priority: int = 1, parse_mode: str = "HTML") -> bool:
+        try:
+            await self._send(
                 chat_id=chat_id,
                 text=message,
                 parse_mode=parse_mode
             )
             return True
 
+        except RetryAfter:
+            # 429 обрабатывает планировщик отправки
+            raise
         except TelegramError as e:
-            logger.error(f"Telegram API error: {e}")
+            _log_send_error("Telegram API error: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Failed to send Telegram message: {e}")
+            _log_send_error("Failed to send Telegram message: %s", e)
             return False
 
     async def send_init_message(
@@ -52,7 +85,9 @@ class TelegramClient(NotificationClient):
         )
         return await self.send_message(chat_id, message)
 
-    async def send_message_with_buttons(self, chat_id: str, message: str, buttons: list[list[str]]) -> bool:
+    async def send_message_with_buttons(
+        self, chat_id: str, message: str, buttons: list[list[str]], priority: int = 1
+    ) -> bool:
         try:
             from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -65,7 +100,7 @@ class TelegramClient(NotificationClient):
 
             reply_markup = InlineKeyboardMarkup(keyboard)
 
-            await self.bot.send_message(
+            await self._send(
                 chat_id=chat_id,
                 text=message,
                 parse_mode="HTML",
@@ -73,6 +108,8 @@ class TelegramClient(NotificationClient):
             )
             return True
 
+        except RetryAfter:
+            raise
         except Exception as e:
-            logger.error(f"Failed to send message with buttons: {e}")
+            _log_send_error("Failed to send message with buttons: %s", e)
             return False
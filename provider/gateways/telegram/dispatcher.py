@@ -0,0 +1,274 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import timedelta
+from functools import cache
+from typing import Awaitable, Callable
+
+from telegram.error import RetryAfter
+
+from provider.core.logs import RateLimitedLog
+from provider.core.metrics import DISPATCH_WAIT_SECONDS
+from provider.core.settings import settings
+from provider.gateways.telegram.client import NotificationClient
+
+logger = logging.getLogger(__name__)
+
+_log_rate_limited = RateLimitedLog(logger, logging.WARNING, "dispatcher.rate_limit")
+_log_dispatch_error = RateLimitedLog(logger, logging.ERROR, "dispatcher.send")
+
+# приоритет совпадает с уровнем изменения: 3 > 2 > 1
+PRIORITIES = (1, 2, 3)
+INIT_PRIORITY = 3
+# как часто удалять очереди чатов без ожидающих отправок, секунды
+IDLE_SWEEP_INTERVAL = 60.0
+
+Send = Callable[[], Awaitable[bool]]
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше capacity подряд"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class ChatQueue:
+    """Ожидающие отправки одного чата, по приоритету и порядку поступления"""
+
+    __slots__ = ("jobs", "bucket", "scheduled", "in_flight")
+
+    def __init__(self, rate: float):
+        # (-priority, seq, send, future, enqueued_at)
+        self.jobs: list[tuple] = []
+        self.bucket = TokenBucket(rate)
+        self.scheduled = False
+        # отправки в Bot API, которые на 429 вернут сообщение в эту очередь
+        self.in_flight = 0
+
+    def is_idle(self, now: float) -> bool:
+        """Пустая очередь с восстановленным токеном: удаление не ослабит лимит на чат"""
+        return not self.jobs and not self.scheduled and not self.in_flight and self.bucket.wait_time(now) == 0
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class DispatchScheduler:
+    """Отправка в Bot API не быстрее глобального лимита и лимита на чат, старшие уровни первыми
+
+    Чат попадает в очередь готовых, когда у него есть токен; цикл берет самый приоритетный
+    готовый чат, как только есть глобальный токен. На 429 отправка приостанавливается
+    на retry_after, а сообщение возвращается в начало очереди своего чата.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = settings.TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = settings.TELEGRAM_CHAT_RATE,
+        max_pending: int = settings.TELEGRAM_MAX_PENDING,
+    ):
+        self.chat_rate = chat_rate
+        self._global = TokenBucket(global_rate)
+        self._chats: dict[str, ChatQueue] = {}
+        # (-priority, seq, chat_id) чатов, которым уже можно отправлять
+        self._ready: list[tuple[int, int, str]] = []
+        self._wakeup = asyncio.Event()
+        self._paused_until = 0.0
+        # ограничение ожидающих по каждому приоритету, при заполнении submit ждет
+        self._slots = {priority: asyncio.Semaphore(max_pending) for priority in PRIORITIES}
+        self._seq = itertools.count()
+        self._task: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()
+        self._next_sweep_at = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, chat_id: str, priority: int, send: Send) -> bool:
+        """Постановка отправки в очередь, результат - после фактической отправки"""
+        self._ensure_started()
+        priority = min(max(priority, PRIORITIES[0]), PRIORITIES[-1])
+
+        async with self._slots[priority]:
+            future = asyncio.get_running_loop().create_future()
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = ChatQueue(self.chat_rate)
+
+            heapq.heappush(chat.jobs, (-priority, next(self._seq), send, future, time.monotonic()))
+            self._schedule_chat(chat_id, chat)
+            return await future
+
+    def _schedule_chat(self, chat_id: str, chat: ChatQueue) -> None:
+        if chat.scheduled or not chat.jobs:
+            return
+
+        chat.scheduled = True
+        delay = chat.bucket.wait_time(time.monotonic())
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._mark_ready, chat_id, chat)
+        else:
+            self._mark_ready(chat_id, chat)
+
+    def _mark_ready(self, chat_id: str, chat: ChatQueue) -> None:
+        if not chat.jobs:
+            chat.scheduled = False
+            return
+
+        negative_priority, seq = chat.jobs[0][:2]
+        heapq.heappush(self._ready, (negative_priority, seq, chat_id))
+        self._wakeup.set()
+
+    def _evict_idle(self, now: float) -> None:
+        for chat_id, chat in list(self._chats.items()):
+            if chat.is_idle(now):
+                del self._chats[chat_id]
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now >= self._next_sweep_at:
+                self._evict_idle(now)
+                self._next_sweep_at = now + IDLE_SWEEP_INTERVAL
+
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = max(self._global.wait_time(now), self._paused_until - now)
+            if delay > 0:
+                # за время ожидания может появиться более приоритетный чат
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            chat = self._chats[chat_id]
+            chat.scheduled = False
+            job = heapq.heappop(chat.jobs)
+
+            self._global.take(now)
+            chat.bucket.take(now)
+            DISPATCH_WAIT_SECONDS.observe(now - job[4], -job[0])
+            # лимит соблюдается в момент выдачи, ответ API не задерживает следующие отправки
+            chat.in_flight += 1
+            task = asyncio.create_task(self._send(chat_id, chat, job))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+            self._schedule_chat(chat_id, chat)
+
+    async def _send(self, chat_id: str, chat: ChatQueue, job: tuple) -> None:
+        send, future = job[2], job[3]
+        try:
+            result = await send()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except RetryAfter as e:
+            delay = _retry_after_seconds(e)
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            _log_rate_limited("Telegram rate limit for chat %s, pausing dispatch for %ss", chat_id, delay)
+            heapq.heappush(chat.jobs, job)
+            self._schedule_chat(chat_id, chat)
+            return
+        except Exception as e:
+            _log_dispatch_error("Failed to dispatch message to chat %s: %s", chat_id, e)
+            result = False
+        finally:
+            chat.in_flight -= 1
+
+        if result:
+            self.sent += 1
+        else:
+            self.failed += 1
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            "queued": sum(len(chat.jobs) for chat in self._chats.values()),
+            "chats": len(self._chats),
+        }
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # уже выданные отправки доводятся до конца, ожидающие в очередях отменяются
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+        for chat in self._chats.values():
+            for job in chat.jobs:
+                if not job[3].done():
+                    job[3].cancel()
+        self._chats.clear()
+        self._ready.clear()
+
+
+class ScheduledNotificationClient(NotificationClient):
+    """NotificationClient, отправляющий через общий DispatchScheduler"""
+
+    def __init__(self, client: NotificationClient, scheduler: "DispatchScheduler | None" = None):
+        self._client = client
+        self._scheduler = scheduler or get_scheduler()
+
+    async def send_message(self, chat_id: str, message: str, priority: int = 1) -> bool:
+        return await self._scheduler.submit(chat_id, priority, lambda: self._client.send_message(chat_id, message))
+
+    async def send_init_message(
+        self, chat_id: str, symbols: list[str], timeframe: str, thresholds: list[float]
+    ) -> bool:
+        return await self._scheduler.submit(
+            chat_id, INIT_PRIORITY, lambda: self._client.send_init_message(chat_id, symbols, timeframe, thresholds)
+        )
+
+    async def send_message_with_buttons(
+        self, chat_id: str, message: str, buttons: list[list[str]], priority: int = 1
+    ) -> bool:
+        return await self._scheduler.submit(
+            chat_id, priority, lambda: self._client.send_message_with_buttons(chat_id, message, buttons)
+        )
+
+
+@cache
+def get_scheduler() -> DispatchScheduler:
+    """Один планировщик на процесс: лимиты Bot API общие для всех отправителей"""
+    return DispatchScheduler()
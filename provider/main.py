@@ -1,44 +1,96 @@
 import logging
 import asyncio
-import sys
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
+from provider.core.logs import setup_logging
+from provider.core.loop_monitor import LoopMonitor
+from provider.core.settings import settings
+from provider.gateways.memory.base import get_broker
+from provider.gateways.memory.consumer import MemoryConsumer
+from provider.gateways.memory.producer import MemoryProducer
 from provider.gateways.rabbitmq.base import RabbitMqConnector
+from provider.gateways.rabbitmq.producer import RabbitMqProducer
 from provider.gateways.rabbitmq.consumer import RabbitMqConsumer
 from provider.gateways.telegram.client import TelegramClient
+from provider.gateways.telegram.dispatcher import ScheduledNotificationClient, get_scheduler
 from provider.core.price_processor import PriceConsumerProcessor
 from provider.api.utils import router as api_router
+from provider.api.metrics import debug_router, router as metrics_router
+from provider.core.metrics import registry
 from provider.services.notification import NotificationService
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.StreamHandler(sys.stderr)
-    ]
-)
+# один обработчик через очередь: вывод не блокирует цикл событий и не дублируется в stdout и stderr
+setup_logging()
 logger = logging.getLogger(__name__)
 
 connector = None
 processor = None
+notification_service = None
+telegram_client = None
+aggregator_service = None
+
+
+async def start_in_process_aggregator() -> None:
+    """Режим одного процесса: aggregator работает в этом же цикле событий на брокере в памяти"""
+    global aggregator_service
+
+    # импорт здесь, чтобы в режиме RabbitMQ provider не зависел от пакета aggregator
+    from aggregator.core.metrics import registry as aggregator_registry
+    from aggregator.main import create_in_process_service
+
+    registry.include(aggregator_registry)
+
+    broker = get_broker()
+    broker.load()
+    aggregator_service = create_in_process_service(broker)
+    asyncio.create_task(aggregator_service.start())
+    logger.info("✅ In-process aggregator started")
+
+
+async def stop_in_process_aggregator() -> None:
+    if aggregator_service is not None:
+        await aggregator_service.stop()
+    get_broker().save()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global connector, processor
+    global connector, processor, notification_service, telegram_client
 
-    try:
+    app.state.loop_monitor = None
+    if settings.LOOP_MONITOR_ENABLED:
+        app.state.loop_monitor = LoopMonitor()
+        app.state.loop_monitor.start()
+
+    # ресурсы на время жизни приложения, зависимости API берут их из app.state
+    telegram_client = TelegramClient()
+    app.state.telegram_client = ScheduledNotificationClient(telegram_client)
+    if settings.BROKER_MODE == "memory":
+        app.state.producer = MemoryProducer(broker=get_broker())
+    else:
         connector = RabbitMqConnector()
-        await connector.connect()
-        logger.info("✅ RabbitMQ connector initialized")
+        app.state.producer = RabbitMqProducer(connector=connector)
+
+    try:
+        notification_service = NotificationService(client=app.state.telegram_client)
 
-        notification_service = NotificationService(client=TelegramClient())
+        if settings.BROKER_MODE == "memory":
+            await start_in_process_aggregator()
+            app.state.aggregator_service = aggregator_service
+            processor = PriceConsumerProcessor(
+                connector=None,
+                notification_service=notification_service,
+                consumer_factory=lambda: MemoryConsumer(broker=get_broker()),
+            )
+        else:
+            await connector.connect()
+            logger.info("✅ RabbitMQ connector initialized")
 
-        processor = PriceConsumerProcessor(
-            connector=connector,
-            notification_service=notification_service
-        )
+            processor = PriceConsumerProcessor(
+                connector=connector,
+                notification_service=notification_service
+            )
 
         asyncio.create_task(processor.start())
         logger.info("✅ Price processor started in background")
@@ -54,12 +106,37 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error stopping processor: {e}")
 
+    try:
+        if settings.BROKER_MODE == "memory":
+            await stop_in_process_aggregator()
+    except Exception as e:
+        logger.error(f"Error stopping in-process aggregator: {e}")
+
+    try:
+        if notification_service:
+            await notification_service.stop()
+    except Exception as e:
+        logger.error(f"Error flushing notification digests: {e}")
+
+    try:
+        await get_scheduler().stop()
+    except Exception as e:
+        logger.error(f"Error stopping Telegram dispatcher: {e}")
+
+    try:
+        await telegram_client.close()
+    except Exception as e:
+        logger.error(f"Error closing Telegram client: {e}")
+
     try:
         if connector:
             await connector.disconnect()
     except Exception as e:
         logger.error(f"Error disconnecting RabbitMQ: {e}")
 
+    if app.state.loop_monitor is not None:
+        await app.state.loop_monitor.stop()
+
 
 app = FastAPI(
     title="Notification Provider API",
@@ -69,3 +146,6 @@ app = FastAPI(
 )
 
 app.include_router(api_router)
+app.include_router(metrics_router)
+if settings.LOOP_PROFILE_ENABLED:
+    app.include_router(debug_router)
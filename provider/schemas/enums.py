@@ -15,3 +15,11 @@ class TimeFrame(str, Enum):
     H1 = "1h"
     H4 = "4h"
     D1 = "1d"
+
+
+class AlertMode(str, Enum):
+    EVERY_TICK = "every_tick"
+    CLOSE_ONLY = "close_only"
+    RISING = "rising"
+    HYSTERESIS = "hysteresis"
+    COOLDOWN = "cooldown"
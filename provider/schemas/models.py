@@ -1,14 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
-from provider.schemas.enums import TimeFrame
+from provider.schemas.enums import AlertMode, TimeFrame
+
+
+# стандартные таймфреймы Binance или произвольное окно в минутах/часах/днях (7m),
+# которое aggregator собирает из минутных свечей при BINANCE_DERIVE_TIMEFRAMES, иначе отклоняет
+TIMEFRAME_PATTERN = r"^[1-9]\d*[mhd]$"
 
 
 class SubscribeRequest(BaseModel):
     user_id: str
     symbols: List[str]
     thresholds: List[float]  # [0.5, 1.0, 2.0] - три уровня
-    timeframe: TimeFrame
+    timeframe: str = Field(pattern=TIMEFRAME_PATTERN, examples=[tf.value for tf in TimeFrame])
+    alert_mode: AlertMode = AlertMode.EVERY_TICK
+    hysteresis: float = Field(default=0.0, ge=0)  # откат в процентах для повторного срабатывания
+    cooldown: float = Field(default=0.0, ge=0)  # секунды между срабатываниями одного уровня
 
 
 class UnsubscribeRequest(BaseModel):
@@ -28,4 +36,9 @@ class PriceChangeMessage(BaseModel):
     price_change_percent: float
     open_price: float
     close_price: float
-    change_level: int
\ No newline at end of file
+    change_level: int
+    # метки времени в мс эпохи: событие и конец свечи по часам Binance, оценка и публикация по часам aggregator
+    event_time: Optional[int] = None
+    close_time: Optional[int] = None
+    evaluated_at: Optional[int] = None
+    published_at: Optional[int] = None
\ No newline at end of file
@@ -1,31 +1,189 @@
+import asyncio
 import logging
+import time
 
+from provider.core.logs import RateLimitedLog
+from provider.core.metrics import (
+    ALERT_AGE_SECONDS,
+    ALERT_DELIVERY_SECONDS,
+    ALERT_STAGE_SECONDS,
+    DIGEST_BUFFERED,
+    FORMAT_SECONDS,
+    NOTIFICATIONS,
+    STALE_ALERTS,
+)
 from provider.gateways.telegram.client import NotificationClient
 from provider.schemas.models import PriceChangeMessage
 from provider.core.settings import settings
 
 logger = logging.getLogger(__name__)
 
+_log_send_error = RateLimitedLog(logger, logging.ERROR, "notification.send")
+
+LEVEL_EMOJI = {1: "🔔", 2: "⚠️", 3: "🚨"}
+
+
+class UserDigest:
+    """Уведомления пользователя, накопленные за окно: по (уровень, символ) последнее и их число"""
+
+    __slots__ = ("alerts", "counts", "handle")
+
+    def __init__(self):
+        self.alerts: dict[tuple[int, str], PriceChangeMessage] = {}
+        self.counts: dict[tuple[int, str], int] = {}
+        self.handle: asyncio.TimerHandle | None = None
+
+    def add(self, price_change: PriceChangeMessage) -> None:
+        key = (price_change.change_level, price_change.symbol)
+        self.alerts[key] = price_change
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
 
 class NotificationService:
-    def __init__(self, client: NotificationClient):
+    def __init__(
+        self,
+        client: NotificationClient,
+        digest_window: float = settings.NOTIFICATION_DIGEST_WINDOW,
+        digest_bypass_level: int = settings.NOTIFICATION_DIGEST_BYPASS_LEVEL,
+        staleness_budget: float = settings.NOTIFICATION_STALENESS_BUDGET,
+        stale_action: str = settings.NOTIFICATION_STALE_ACTION,
+    ):
         self._client = client
         self.is_running = False
+        # окно склейки уведомлений пользователя в секундах, 0 - отправлять каждое сразу
+        self.digest_window = digest_window
+        self.digest_bypass_level = digest_bypass_level
+        self.staleness_budget = staleness_budget
+        self.stale_action = stale_action
+        self._digests: dict[str, UserDigest] = {}
+        self._flush_tasks: set[asyncio.Task] = set()
 
     async def process_price_change(self, message_data: dict, *args, **kwargs) -> None:
-        price_change = PriceChangeMessage(**message_data)
+        price_change = self._apply_staleness(PriceChangeMessage(**message_data))
+        if price_change is None:
+            return
+
+        if self.digest_window <= 0 or (
+            self.digest_bypass_level and price_change.change_level >= self.digest_bypass_level
+        ):
+            await self._send_single(price_change)
+            return
+
+        digest = self._digests.get(price_change.user_id)
+        if digest is None:
+            # первое уведомление открывает окно, остальные за окно попадут в одну сводку
+            digest = self._digests[price_change.user_id] = UserDigest()
+            digest.handle = asyncio.get_running_loop().call_later(
+                self.digest_window, self._schedule_flush, price_change.user_id
+            )
+        digest.add(price_change)
+        DIGEST_BUFFERED.inc()
+
+    def _apply_staleness(self, price_change: PriceChangeMessage) -> PriceChangeMessage | None:
+        """Учет задержек по меткам времени сообщения, устаревшее понижается или отбрасывается"""
+        if price_change.event_time is None:
+            return price_change
+
+        now = time.time() * 1000
+        age = (now - price_change.event_time) / 1000
+        ALERT_AGE_SECONDS.observe(age, price_change.change_level)
+        if price_change.evaluated_at is not None:
+            ALERT_STAGE_SECONDS.observe((price_change.evaluated_at - price_change.event_time) / 1000, "evaluate")
+        if price_change.published_at is not None:
+            if price_change.evaluated_at is not None:
+                ALERT_STAGE_SECONDS.observe((price_change.published_at - price_change.evaluated_at) / 1000, "publish")
+            ALERT_STAGE_SECONDS.observe((now - price_change.published_at) / 1000, "consume")
+
+        if not self.staleness_budget or age <= self.staleness_budget:
+            return price_change
+
+        if self.stale_action == "downgrade" and price_change.change_level > 1:
+            STALE_ALERTS.inc("downgrade")
+            return price_change.model_copy(update={"change_level": price_change.change_level - 1})
+
+        STALE_ALERTS.inc("drop")
+        logger.debug("Dropped stale alert %s for user %s: %.1fs old", price_change.symbol, price_change.user_id, age)
+        return None
+
+    @staticmethod
+    def _observe_delivery(price_change: PriceChangeMessage) -> None:
+        if price_change.event_time is not None:
+            ALERT_DELIVERY_SECONDS.observe(time.time() - price_change.event_time / 1000, price_change.change_level)
+
+    def _schedule_flush(self, user_id: str) -> None:
+        task = asyncio.create_task(self._flush_digest(user_id))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_digest(self, user_id: str) -> None:
+        digest = self._digests.pop(user_id, None)
+        if digest is None:
+            return
+
+        if len(digest) == 1:
+            await self._send_single(next(iter(digest.alerts.values())))
+            return
+
         try:
+            started_at = time.perf_counter()
+            message_text = self._format_digest_message(digest)
+            FORMAT_SECONDS.observe(time.perf_counter() - started_at, "digest")
+            NOTIFICATIONS.inc("digest")
+            await self._client.send_message(
+                user_id, message_text, priority=max(level for level, _ in digest.alerts)
+            )
+            for price_change in digest.alerts.values():
+                self._observe_delivery(price_change)
+        except Exception as e:
+            _log_send_error("Error sending digest to user %s: %s", user_id, e)
+
+    async def stop(self) -> None:
+        """Отправка накопленных сводок при остановке"""
+        for user_id, digest in list(self._digests.items()):
+            if digest.handle is not None:
+                digest.handle.cancel()
+            await self._flush_digest(user_id)
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+    async def _send_single(self, price_change: PriceChangeMessage) -> None:
+        try:
+            started_at = time.perf_counter()
             message_text, buttons = self._format_notification_message(price_change)
+            FORMAT_SECONDS.observe(time.perf_counter() - started_at, "single")
+            NOTIFICATIONS.inc("single")
             if buttons:
                 await self._client.send_message_with_buttons(
-                    price_change.user_id, message_text, buttons
+                    price_change.user_id, message_text, buttons, priority=price_change.change_level
                 )
             else:
                 await self._client.send_message(
-                    price_change.user_id, message_text
+                    price_change.user_id, message_text, priority=price_change.change_level
                 )
+            self._observe_delivery(price_change)
         except Exception as e:
-            logger.error(f"Error processing price change notification: {e}")
+            _log_send_error("Error processing price change notification: %s", e)
+
+    @staticmethod
+    def _format_digest_message(digest: UserDigest) -> str:
+        lines = [f"📬 <b>Сводка изменений цен</b> ({len(digest)} уведомлений)"]
+        for level in sorted({level for level, _ in digest.alerts}, reverse=True):
+            emoji = LEVEL_EMOJI.get(level, "🚨")
+            lines.append(f"\n{emoji} <b>Уровень {level}</b>")
+            for (alert_level, symbol), price_change in sorted(digest.alerts.items()):
+                if alert_level != level:
+                    continue
+                direction = "📈" if price_change.price_change_percent > 0 else "📉"
+                repeats = digest.counts[(alert_level, symbol)]
+                suffix = f" ×{repeats}" if repeats > 1 else ""
+                lines.append(
+                    f"{direction} <b>{symbol}</b> {price_change.price_change_percent:+.2f}% "
+                    f"({price_change.open_price:,.2f} → {price_change.close_price:,.2f}){suffix}"
+                )
+        return "\n".join(lines)
 
     @staticmethod
     def _format_notification_message(price_change: PriceChangeMessage):
@@ -25,7 +25,7 @@ class SubscriptionService:
             success = await self._client.send_init_message(
                 chat_id=request.user_id,
                 symbols=request.symbols,
-                timeframe=request.timeframe.value,
+                timeframe=request.timeframe,
                 thresholds=request.thresholds
             )
 
@@ -73,7 +73,10 @@ class SubscriptionService:
                 "user_id": user_id,
                 "symbols": request.symbols,
                 "thresholds": request.thresholds,
-                "timeframe": request.timeframe.value
+                "timeframe": request.timeframe,
+                "alert_mode": request.alert_mode.value,
+                "hysteresis": request.hysteresis,
+                "cooldown": request.cooldown,
             }
         else:
             return {
@@ -31,6 +31,13 @@ export RABBITMQ_PASSWORD=$PASS
 echo "Creating exchange 'price_changes'..."
 rabbitmqadmin declare exchange name=price_changes type=direct durable=true
 
+# Dead-letter exchange for messages rejected by consumers (decode errors, handlers failing on redelivery)
+echo "Creating dead-letter exchange 'dead_letters'..."
+rabbitmqadmin declare exchange name=dead_letters type=fanout durable=true
+rabbitmqadmin declare queue name=dead_letters durable=true
+rabbitmqadmin declare binding source=dead_letters destination_type=queue destination=dead_letters
+rabbitmqctl set_policy dead-letters "^(commands|price_change_level_[0-9]+)$" '{"dead-letter-exchange":"dead_letters"}' --apply-to queues
+
 # Create queues
 echo "Creating queues..."
 rabbitmqadmin declare queue name=commands durable=true
@@ -0,0 +1,218 @@
+import asyncio
+
+from aggregator.core.cluster import ClusterCoordinator
+from aggregator.schemas.models import InputCommand
+
+HEARTBEAT = 0.01
+TIMEOUT = 0.06
+USERS = [str(user_id) for user_id in range(40)]
+
+
+class FakeMessage:
+    def __init__(self, body: bytes):
+        self.body = body
+
+
+class FakeQueue:
+    """Очередь узла: сообщения обрабатываются по одному в порядке публикации, как в aio_pika"""
+
+    def __init__(self):
+        self._messages: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    async def bind(self, exchange: "FakeExchange") -> None:
+        exchange.queues.append(self)
+
+    async def consume(self, callback, no_ack: bool = False) -> None:
+        self._task = asyncio.create_task(self._run(callback))
+
+    async def _run(self, callback) -> None:
+        while True:
+            await callback(await self._messages.get())
+
+    def close(self) -> None:
+        self._task.cancel()
+
+
+class FakeExchange:
+    def __init__(self):
+        self.queues: list[FakeQueue] = []
+
+    async def publish(self, message, routing_key: str) -> None:
+        for queue in self.queues:
+            queue._messages.put_nowait(FakeMessage(message.body))
+
+
+class FakeChannel:
+    def __init__(self, exchange: FakeExchange):
+        self._exchange = exchange
+        self.queue = FakeQueue()
+
+    async def declare_exchange(self, name: str, kind) -> FakeExchange:
+        return self._exchange
+
+    async def declare_queue(self, **kwargs) -> FakeQueue:
+        return self.queue
+
+
+class FakeConnector:
+    def __init__(self, exchange: FakeExchange):
+        self.channel = FakeChannel(exchange)
+
+
+class Cluster:
+    """Узлы на общем fanout-обменнике и учет, кто какого пользователя обслуживает"""
+
+    def __init__(self):
+        self.exchange = FakeExchange()
+        self.nodes: dict[str, ClusterCoordinator] = {}
+        self.served: dict[str, dict[str, InputCommand]] = {}
+        self.forgotten: dict[str, list[str]] = {}
+        # пользователи, оставшиеся без узла хотя бы на мгновение
+        self.gaps: list[str] = []
+
+    def node(self, node_id: str) -> ClusterCoordinator:
+        coordinator = ClusterCoordinator(
+            FakeConnector(self.exchange), node_id=node_id, heartbeat_interval=HEARTBEAT, node_timeout=TIMEOUT
+        )
+        served = self.served[node_id] = {}
+        forgotten = self.forgotten[node_id] = []
+
+        async def subscribe(command: InputCommand) -> None:
+            served[command.user_id] = command
+
+        async def unsubscribe(user_id: str) -> None:
+            served.pop(user_id, None)
+            if not self.owners(user_id):
+                self.gaps.append(user_id)
+
+        coordinator.bind(subscribe=subscribe, unsubscribe=unsubscribe, forget=forgotten.append)
+        self.nodes[node_id] = coordinator
+        return coordinator
+
+    def owners(self, user_id: str) -> list[str]:
+        return [node_id for node_id, served in self.served.items() if user_id in served]
+
+    async def settle(self) -> None:
+        await asyncio.sleep(TIMEOUT)
+
+    async def stop(self) -> None:
+        # очереди закрываются первыми, чтобы leave не перераспределил пользователей перед проверками
+        for coordinator in self.nodes.values():
+            coordinator._connector.channel.queue.close()
+        for coordinator in self.nodes.values():
+            await coordinator.stop()
+
+
+def subscribe(user_id: str, *symbols: str) -> dict:
+    return InputCommand(action="subscribe", user_id=user_id, symbols=list(symbols), timeframe="1m").model_dump(
+        mode="json"
+    )
+
+
+def unsubscribe(user_id: str) -> dict:
+    return InputCommand(action="unsubscribe", user_id=user_id).model_dump(mode="json")
+
+
+def test_single_node_serves_seeded_users():
+    async def run() -> Cluster:
+        cluster = Cluster()
+        node = cluster.node("a")
+        node.seed([subscribe(user_id, "BTCUSDT") for user_id in USERS])
+        await node.start()
+        await cluster.stop()
+        return cluster
+
+    cluster = asyncio.run(run())
+
+    assert set(cluster.served["a"]) == set(USERS)
+    assert cluster.forgotten["a"] == []
+
+
+def test_command_is_served_by_owner_only():
+    async def run() -> Cluster:
+        cluster = Cluster()
+        await asyncio.gather(cluster.node("a").start(), cluster.node("b").start())
+        for user_id in USERS:
+            await cluster.nodes["a"].broadcast_command(subscribe(user_id, "BTCUSDT"))
+        await cluster.settle()
+
+        await cluster.nodes["b"].broadcast_command(unsubscribe(USERS[0]))
+        await cluster.settle()
+        await cluster.stop()
+        return cluster
+
+    cluster = asyncio.run(run())
+
+    assert cluster.owners(USERS[0]) == []
+    assert all(len(cluster.owners(user_id)) == 1 for user_id in USERS[1:])
+    assert cluster.served["a"] and cluster.served["b"]
+
+
+def test_join_hands_users_over_without_gap():
+    async def run() -> tuple[Cluster, set]:
+        cluster = Cluster()
+        node = cluster.node("a")
+        node.seed([subscribe(user_id, "BTCUSDT") for user_id in USERS])
+        await node.start()
+
+        await cluster.node("b").start()
+        await cluster.settle()
+        moved = set(cluster.served["b"])
+        await cluster.stop()
+        return cluster, moved
+
+    cluster, moved = asyncio.run(run())
+
+    assert moved
+    assert set(cluster.served["a"]) | moved == set(USERS)
+    assert not set(cluster.served["a"]) & moved
+    assert cluster.gaps == []
+
+
+def test_leave_returns_users_to_remaining_node():
+    async def run() -> Cluster:
+        cluster = Cluster()
+        node = cluster.node("a")
+        node.seed([subscribe(user_id, "BTCUSDT") for user_id in USERS])
+        await node.start()
+        await cluster.node("b").start()
+
+        await cluster.nodes["b"].stop()
+        cluster.served["b"].clear()
+        await cluster.settle()
+        await cluster.stop()
+        return cluster
+
+    cluster = asyncio.run(run())
+
+    assert set(cluster.served["a"]) == set(USERS)
+
+
+def test_peer_state_overrides_local_snapshot():
+    async def run() -> Cluster:
+        cluster = Cluster()
+        node = cluster.node("a")
+        node.seed([subscribe(user_id, "BTCUSDT") for user_id in USERS])
+        await node.start()
+
+        # пока узел b был остановлен, все пользователи сменили символы, а первый отписался
+        for user_id in USERS:
+            await node.broadcast_command(subscribe(user_id, "ETHUSDT"))
+        await node.broadcast_command(unsubscribe(USERS[0]))
+        await cluster.settle()
+
+        joining = cluster.node("b")
+        joining.seed([subscribe(user_id, "BTCUSDT") for user_id in USERS])
+        await joining.start()
+        await cluster.settle()
+        await cluster.stop()
+        return cluster
+
+    cluster = asyncio.run(run())
+
+    assert cluster.served["b"]
+    assert all(command.symbols == ["ETHUSDT"] for served in cluster.served.values() for command in served.values())
+    assert cluster.owners(USERS[0]) == []
+    assert USERS[0] in cluster.forgotten["b"]
+    assert all(len(cluster.owners(user_id)) == 1 for user_id in USERS[1:])
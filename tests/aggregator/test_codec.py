@@ -0,0 +1,44 @@
+import pytest
+
+from aggregator.gateways.rabbit.codec import JsonCodec, MsgPackCodec, get_codec
+from provider.gateways.rabbitmq.codec import get_codec as get_provider_codec
+
+MESSAGE = {
+    "symbol": "BTCUSDT",
+    "timeframe": "1m",
+    "price_change_percent": -1.2345,
+    "open_price": 64000.5,
+    "close_price": 63210.25,
+    "user_id": "42",
+    "change_level": 2,
+    "event_time": 1729080000038,
+    "evaluated_at": None,
+}
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/msgpack"])
+def test_round_trip(content_type):
+    codec = get_codec(content_type)
+
+    assert codec.decode(codec.encode(MESSAGE)) == MESSAGE
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/msgpack"])
+def test_aggregator_encoding_is_readable_by_provider(content_type):
+    body = get_codec(content_type).encode(MESSAGE)
+
+    assert get_provider_codec(content_type).decode(body) == MESSAGE
+
+
+def test_missing_content_type_falls_back_to_json():
+    assert isinstance(get_codec(None), JsonCodec)
+    assert isinstance(get_codec(""), JsonCodec)
+
+
+def test_unknown_content_type_is_rejected():
+    with pytest.raises(ValueError):
+        get_codec("application/xml")
+
+
+def test_msgpack_is_smaller_than_json():
+    assert len(MsgPackCodec().encode(MESSAGE)) < len(JsonCodec().encode(MESSAGE))
@@ -0,0 +1,140 @@
+import asyncio
+
+import numpy as np
+
+from aggregator.core.evaluator import LocalEvaluator
+from aggregator.core.index import StreamSubscribers, SubscriptionIndex
+from aggregator.core.policies import prefix_levels
+from aggregator.gateways.rabbit.producer import Producer
+from aggregator.schemas.models import ActionEnum, AlertMode, InputCommand, Tick
+
+
+class RecordingProducer(Producer):
+    def __init__(self):
+        self.sent: list[str] = []
+
+    async def produce(self, routing_key: str, message: dict) -> None:
+        self.sent.append(routing_key)
+
+
+def fired(subscribers: StreamSubscribers, change: float, is_closed: bool = False, now: float = 0.0) -> dict[str, int]:
+    rows, levels = subscribers.evaluate(change, is_closed, now)
+    return {subscribers.user_ids[row]: int(level) for row, level in zip(rows, levels)}
+
+
+def single(alert_mode: AlertMode, thresholds=(1.0, 2.0), **params) -> StreamSubscribers:
+    subscribers = StreamSubscribers(width=len(thresholds))
+    subscribers.add("user", list(thresholds), alert_mode=alert_mode, **params)
+    return subscribers
+
+
+def test_prefix_levels_stop_at_first_missed_threshold():
+    thresholds = np.array([[1.0, 2.0, 3.0], [1.0, np.inf, np.inf], [5.0, 1.0, 1.0]])
+
+    assert prefix_levels(thresholds, 2.5).tolist() == [2, 1, 0]
+
+
+def test_every_tick_fires_on_each_tick_over_threshold():
+    subscribers = single(AlertMode.EVERY_TICK)
+
+    assert fired(subscribers, 1.5) == {"user": 1}
+    assert fired(subscribers, 1.5) == {"user": 1}
+    assert fired(subscribers, 2.5) == {"user": 2}
+    assert fired(subscribers, 0.5) == {}
+
+
+def test_close_only_fires_on_closed_candles():
+    subscribers = single(AlertMode.CLOSE_ONLY)
+
+    assert fired(subscribers, 2.5) == {}
+    assert fired(subscribers, 2.5, is_closed=True) == {"user": 2}
+
+
+def test_rising_fires_once_per_level_and_resets_on_close():
+    subscribers = single(AlertMode.RISING)
+
+    assert fired(subscribers, 1.2) == {"user": 1}
+    assert fired(subscribers, 1.5) == {}
+    assert fired(subscribers, 2.1) == {"user": 2}
+    assert fired(subscribers, 2.1, is_closed=True) == {}
+    assert fired(subscribers, 1.2) == {"user": 1}
+
+
+def test_hysteresis_rearms_after_pullback():
+    subscribers = single(AlertMode.HYSTERESIS, hysteresis=0.5)
+
+    assert fired(subscribers, 1.2) == {"user": 1}
+    assert fired(subscribers, 1.3) == {}
+    # откат ниже порога, но в пределах гистерезиса - уровень еще взведен
+    assert fired(subscribers, 0.6) == {}
+    assert fired(subscribers, 1.1) == {}
+    assert fired(subscribers, 0.4) == {}
+    assert fired(subscribers, 1.1) == {"user": 1}
+
+
+def test_cooldown_is_tracked_per_level():
+    subscribers = single(AlertMode.COOLDOWN, cooldown=10.0)
+
+    assert fired(subscribers, 1.5, now=0.0) == {"user": 1}
+    assert fired(subscribers, 1.5, now=5.0) == {}
+    assert fired(subscribers, 2.5, now=6.0) == {"user": 2}
+    assert fired(subscribers, 1.5, now=10.0) == {"user": 1}
+
+
+def test_modes_are_evaluated_independently_in_one_stream():
+    subscribers = StreamSubscribers(width=2)
+    subscribers.add("every", [1.0, 2.0])
+    subscribers.add("rising", [1.0, 2.0], alert_mode=AlertMode.RISING)
+    subscribers.add("closed", [1.0], alert_mode=AlertMode.CLOSE_ONLY)
+
+    assert fired(subscribers, 1.5) == {"every": 1, "rising": 1}
+    assert fired(subscribers, 1.5) == {"every": 1}
+
+
+def test_remove_keeps_state_of_moved_row():
+    subscribers = StreamSubscribers(width=1)
+    subscribers.add("first", [1.0], alert_mode=AlertMode.RISING)
+    subscribers.add("second", [1.0], alert_mode=AlertMode.RISING)
+    assert fired(subscribers, 1.5) == {"first": 1, "second": 1}
+
+    subscribers.remove("first")
+
+    # строка second переехала на место first вместе с уже сработавшим уровнем
+    assert subscribers.user_ids == ["second"]
+    assert fired(subscribers, 1.5) == {}
+
+
+def test_index_grows_width_and_capacity():
+    index = SubscriptionIndex()
+    for number in range(40):
+        index.add("btcusdt", "1m", f"user-{number}", [1.0])
+    index.add("BTCUSDT", "1m", "wide", [1.0, 2.0, 3.0])
+
+    user_ids, levels = index.evaluate("BTCUSDT", "1m", -3.5)
+
+    assert index.subscribers_count("BTCUSDT", "1m") == 41
+    assert dict(zip(user_ids, levels.tolist()))["wide"] == 3
+    assert sum(1 for level in levels.tolist() if level == 1) == 40
+
+
+def test_cooldown_follows_tick_time_not_wall_clock():
+    async def run() -> list[str]:
+        producer = RecordingProducer()
+        evaluator = LocalEvaluator(producer=producer)
+        await evaluator.add(
+            InputCommand(
+                action=ActionEnum.SUBSCRIBE,
+                user_id="user",
+                symbols=["BTCUSDT"],
+                timeframe="1m",
+                thresholds=[1.0],
+                alert_mode=AlertMode.COOLDOWN,
+                cooldown=60.0,
+            )
+        )
+        # прогон записи без пауз: между тиками 30 секунд по event_time и ~0 по часам
+        for second in range(0, 300, 30):
+            await evaluator.evaluate(Tick("BTCUSDT", "1m", 1.5, 100.0, 101.5, event_time=1729080000000 + second * 1000))
+        return producer.sent
+
+    assert len(asyncio.run(run())) == 5
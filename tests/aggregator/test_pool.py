@@ -0,0 +1,181 @@
+import asyncio
+import json
+
+import pytest
+
+from aggregator.gateways.binance import pool as pool_module
+from aggregator.gateways.binance.pool import BinanceStreamPool, ControlRejected, Shard
+
+DELAY = 0.01
+
+
+class FakeWebSocket:
+    def __init__(self, server: "FakeBinance"):
+        self._server = server
+        self._inbox: asyncio.Queue = asyncio.Queue()
+
+    async def __aenter__(self) -> "FakeWebSocket":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+    async def send(self, text: str) -> None:
+        request = json.loads(text)
+        self._server.requests.append(request)
+        response = self._server.respond(request)
+        if response is not None:
+            self._inbox.put_nowait(json.dumps(response).encode())
+
+    async def recv(self, decode: bool = True) -> bytes:
+        return await self._inbox.get()
+
+    def push(self, frame: dict) -> None:
+        self._inbox.put_nowait(json.dumps(frame).encode())
+
+
+class FakeBinance:
+    """Сервер combined stream: отклоняет запросы с потоками из invalid, молчит при silent"""
+
+    def __init__(self, invalid: tuple[str, ...] = (), silent: bool = False):
+        self.invalid = set(invalid)
+        self.silent = silent
+        self.urls: list[str] = []
+        self.requests: list[dict] = []
+        self.websocket: FakeWebSocket | None = None
+
+    def connect(self, url: str) -> FakeWebSocket:
+        self.urls.append(url)
+        self.websocket = FakeWebSocket(self)
+        return self.websocket
+
+    def respond(self, request: dict) -> dict | None:
+        if self.silent:
+            return None
+        if self.invalid & set(request["params"]):
+            return {"error": {"code": 2, "msg": "Invalid request"}, "id": request["id"]}
+        return {"result": None, "id": request["id"]}
+
+    def subscribes(self) -> list[list[str]]:
+        return [request["params"] for request in self.requests if request["method"] == "SUBSCRIBE"]
+
+
+@pytest.fixture
+def binance(monkeypatch):
+    def install(**params) -> FakeBinance:
+        server = FakeBinance(**params)
+        monkeypatch.setattr(pool_module.websockets, "connect", server.connect)
+        return server
+
+    return install
+
+
+def stream_pool(**params) -> BinanceStreamPool:
+    return BinanceStreamPool(reconnect_delay=DELAY, control_delay=DELAY, **params)
+
+
+def test_added_streams_are_subscribed_in_one_request(binance):
+    server = binance()
+
+    async def run() -> list[dict]:
+        pool = stream_pool()
+        await pool.add(("BTCUSDT", "1m"))
+        await asyncio.sleep(DELAY)
+        await pool.add(("ETHUSDT", "1m"))
+        await pool.add(("SOLUSDT", "1m"))
+        await asyncio.sleep(DELAY * 5)
+        stats = pool.stats()
+        await pool.stop()
+        return stats
+
+    stats = asyncio.run(run())
+
+    assert server.urls[0].endswith("stream?streams=btcusdt@kline_1m")
+    assert server.subscribes() == [["ethusdt@kline_1m", "solusdt@kline_1m"]]
+    assert stats[0]["subscribed"] == 3
+
+
+def test_rejected_stream_is_dropped_and_others_subscribed(binance):
+    server = binance(invalid=("badusdt@kline_1m",))
+
+    async def run() -> list[dict]:
+        pool = stream_pool()
+        await pool.add(("BTCUSDT", "1m"))
+        await asyncio.sleep(DELAY)
+        await pool.add(("BADUSDT", "1m"))
+        await pool.add(("ETHUSDT", "1m"))
+        await asyncio.sleep(DELAY * 20)
+        stats = pool.stats()
+        await pool.stop()
+        return stats
+
+    stats = asyncio.run(run())
+
+    # пачка отклонена, затем по одному потоку, и отклоненный поток больше не запрашивается
+    assert server.subscribes() == [
+        ["badusdt@kline_1m", "ethusdt@kline_1m"],
+        ["badusdt@kline_1m"],
+        ["ethusdt@kline_1m"],
+    ]
+    assert (stats[0]["subscribed"], stats[0]["rejected"]) == (2, 1)
+
+
+def test_unacknowledged_sync_backs_off(binance):
+    server = binance(silent=True)
+
+    async def run() -> int:
+        pool = stream_pool(ack_timeout=DELAY, max_control_backoff=DELAY * 64)
+        await pool.add(("BTCUSDT", "1m"))
+        await asyncio.sleep(DELAY)
+        await pool.add(("ETHUSDT", "1m"))
+        await asyncio.sleep(DELAY * 40)
+        await pool.stop()
+        return len(server.requests)
+
+    # без паузы было бы ~20 повторов, с удвоением паузы - не больше 5
+    assert asyncio.run(run()) <= 5
+
+
+def test_frames_are_emitted_as_ticks(binance):
+    server = binance()
+
+    async def run() -> list:
+        pool = stream_pool()
+        received = []
+        pool.bind(lambda key, message: received.append((key, message)))
+        await pool.add(("BTCUSDT", "1m"))
+        await asyncio.sleep(DELAY)
+        server.websocket.push({
+            "stream": "btcusdt@kline_1m",
+            "data": {
+                "E": 1729080000500,
+                "k": {"t": 1729080000000, "T": 1729080059999, "o": "100", "c": "101", "x": False},
+            },
+        })
+        await asyncio.sleep(DELAY)
+        await pool.stop()
+        return received
+
+    [(key, tick)] = asyncio.run(run())
+
+    assert key == ("BTCUSDT", "1m")
+    assert (tick.symbol, tick.timeframe, tick.open_price, tick.close_price) == ("BTCUSDT", "1m", 100.0, 101.0)
+    assert tick.price_change_percent == pytest.approx(1.0)
+
+
+def test_control_response_resolves_pending_request():
+    async def run() -> tuple:
+        shard = Shard(0)
+        accepted = shard.pending[1] = asyncio.get_running_loop().create_future()
+        rejected = shard.pending[2] = asyncio.get_running_loop().create_future()
+
+        BinanceStreamPool._handle_control(shard, b'{"result": null, "id": 1}')
+        BinanceStreamPool._handle_control(shard, b'{"error": {"code": 2, "msg": "Invalid request"}, "id": 2}')
+        # ответ без ожидающего запроса только логируется
+        BinanceStreamPool._handle_control(shard, b'{"result": null, "id": 3}')
+        return accepted.result(), rejected.exception()
+
+    result, error = asyncio.run(run())
+
+    assert result is None
+    assert isinstance(error, ControlRejected)
@@ -0,0 +1,84 @@
+import asyncio
+
+from aggregator.core.metrics import PUBLISH_DROPPED
+from aggregator.gateways.rabbit.producer import PipelinedRabbitMqProducer
+
+
+class FakeExchange:
+    """Обменник с подтверждением через confirm_delay, первые failures публикаций падают"""
+
+    def __init__(self, confirm_delay: float = 0.0, failures: int = 0):
+        self.confirm_delay = confirm_delay
+        self.failures = failures
+        self.started: list[str] = []
+        self.confirmed: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def publish(self, message, routing_key: str) -> None:
+        self.started.append(routing_key)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.confirm_delay)
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("channel closed")
+            self.confirmed.append(routing_key)
+        finally:
+            self.in_flight -= 1
+
+
+class FakeConnector:
+    def __init__(self, exchange: FakeExchange):
+        self.exchanger = exchange
+        self.reconnects = 0
+
+    async def connect(self) -> None:
+        self.reconnects += 1
+
+
+def producer(exchange: FakeExchange, **params) -> PipelinedRabbitMqProducer:
+    return PipelinedRabbitMqProducer(FakeConnector(exchange), retry_delay=0.001, **params)
+
+
+def test_publish_starts_without_waiting_for_timer():
+    async def run() -> list[str]:
+        exchange = FakeExchange(confirm_delay=1.0)
+        publisher = producer(exchange)
+        await publisher.produce("level_1", {"user_id": "1"})
+        await asyncio.sleep(0)
+        # подтверждение еще не пришло, а публикация уже отправлена
+        return exchange.started
+
+    assert asyncio.run(run()) == ["level_1"]
+
+
+def test_in_flight_publishes_are_bounded():
+    async def run() -> tuple:
+        exchange = FakeExchange(confirm_delay=0.01)
+        publisher = producer(exchange, max_in_flight=3)
+        for user_id in range(10):
+            await publisher.produce("level_1", {"user_id": str(user_id)})
+        await publisher.drain()
+        return exchange.max_in_flight, len(exchange.confirmed), publisher.published
+
+    assert asyncio.run(run()) == (3, 10, 10)
+
+
+def test_failed_publish_is_retried_then_dropped():
+    async def run() -> tuple:
+        exchange = FakeExchange(failures=5)
+        publisher = producer(exchange, retries=2)
+        await publisher.produce("level_2", {"user_id": "1"})
+        await publisher.produce("level_2", {"user_id": "2"})
+        await publisher.drain()
+        return publisher, exchange, publisher._connector.reconnects
+
+    dropped_before = PUBLISH_DROPPED.snapshot().get(("level_2",), 0)
+    publisher, exchange, reconnects = asyncio.run(run())
+
+    # первое сообщение упало трижды и отброшено, второе прошло с третьей попытки
+    assert (publisher.published, publisher.failed, publisher.dropped) == (1, 5, 1)
+    assert PUBLISH_DROPPED.snapshot()[("level_2",)] - dropped_before == 1
+    assert reconnects == 4
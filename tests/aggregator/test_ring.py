@@ -0,0 +1,65 @@
+from aggregator.core.ring import HashRing
+
+USERS = [str(user_id) for user_id in range(10_000)]
+
+
+def owners(ring: HashRing) -> dict[str, str]:
+    return {user_id: ring.owner(user_id) for user_id in USERS}
+
+
+def test_empty_ring_has_no_owner():
+    ring = HashRing()
+
+    assert ring.owner("42") is None
+
+    ring.add("a")
+    ring.remove("a")
+    assert ring.owner("42") is None
+
+
+def test_owner_is_stable_across_instances():
+    assert owners(HashRing(("a", "b", "c"))) == owners(HashRing(("c", "b", "a")))
+
+
+def test_keys_spread_over_all_nodes():
+    counts: dict[str, int] = {}
+    for node in owners(HashRing(("a", "b", "c", "d"))).values():
+        counts[node] = counts.get(node, 0) + 1
+
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert min(counts.values()) > len(USERS) / 4 * 0.5
+
+
+def test_adding_node_moves_only_its_share():
+    ring = HashRing(("a", "b", "c"))
+    before = owners(ring)
+
+    ring.add("d")
+    after = owners(ring)
+
+    moved = [user_id for user_id in USERS if before[user_id] != after[user_id]]
+    # переезжают только ключи нового узла, примерно 1/N
+    assert all(after[user_id] == "d" for user_id in moved)
+    assert len(USERS) / 4 * 0.5 < len(moved) < len(USERS) / 4 * 1.5
+
+
+def test_removing_node_restores_previous_owners():
+    ring = HashRing(("a", "b", "c"))
+    before = owners(ring)
+
+    ring.add("d")
+    ring.remove("d")
+
+    assert owners(ring) == before
+    assert "d" not in ring
+    assert ring.nodes == {"a", "b", "c"}
+
+
+def test_add_and_remove_are_idempotent():
+    ring = HashRing(("a", "b"))
+    before = owners(ring)
+
+    ring.add("a")
+    ring.remove("c")
+
+    assert owners(ring) == before
@@ -0,0 +1,117 @@
+import pytest
+
+from aggregator.gateways.binance.hub import StreamHub
+from aggregator.gateways.binance.pool import StreamPool
+from aggregator.gateways.binance.rollup import SymbolRollup, parse_timeframe
+from aggregator.schemas.models import Tick
+
+MINUTE = 60_000
+# 2024-10-16 12:00 UTC, начало пятиминутного и часового окна
+START = 1729080000000
+
+
+def candle(minute: int, open_price: float, close_price: float, is_closed: bool = False) -> Tick:
+    open_time = START + minute * MINUTE
+    return Tick("BTCUSDT", "1m", 0.0, open_price, close_price, open_time, is_closed, open_time + 1, open_time + MINUTE - 1)
+
+
+def rollup_of(*timeframes: str) -> SymbolRollup:
+    rollup = SymbolRollup("BTCUSDT")
+    for timeframe in timeframes:
+        rollup.add(timeframe)
+    return rollup
+
+
+@pytest.mark.parametrize("timeframe, length", [("1m", MINUTE), ("5m", 5 * MINUTE), ("2h", 7_200_000), ("1d", 86_400_000)])
+def test_parse_timeframe(timeframe, length):
+    assert parse_timeframe(timeframe) == length
+
+
+@pytest.mark.parametrize("timeframe", ["0m", "abc", "5w", "", None])
+def test_parse_timeframe_rejects_unknown(timeframe):
+    assert parse_timeframe(timeframe) is None
+
+
+def test_add_rejects_underivable_timeframe():
+    with pytest.raises(ValueError):
+        rollup_of("1w")
+
+
+def test_window_keeps_first_open_and_resets_on_boundary():
+    rollup = rollup_of("5m")
+
+    first = rollup.update(candle(0, 100.0, 101.0, is_closed=True))
+    last = rollup.update(candle(4, 104.0, 110.0))
+    next_window = rollup.update(candle(5, 110.0, 111.0))
+
+    assert [tick.open_price for tick in first + last] == [100.0, 100.0]
+    assert last[0].close_price == 110.0
+    assert last[0].price_change_percent == pytest.approx(10.0)
+    assert (last[0].open_time, last[0].close_time) == (START, START + 5 * MINUTE - 1)
+    assert next_window[0].open_price == 110.0
+    assert next_window[0].open_time == START + 5 * MINUTE
+
+
+def test_window_closes_only_with_last_minute():
+    rollup = rollup_of("5m")
+
+    assert not rollup.update(candle(0, 100.0, 101.0, is_closed=True))[0].is_closed
+    assert not rollup.update(candle(4, 104.0, 105.0))[0].is_closed
+    assert rollup.update(candle(4, 104.0, 106.0, is_closed=True))[0].is_closed
+
+
+def test_subscription_mid_window_opens_from_first_seen_minute():
+    rollup = rollup_of("1h")
+
+    tick = rollup.update(candle(17, 120.0, 126.0))[0]
+
+    assert tick.open_time == START
+    assert tick.open_price == 120.0
+    assert tick.price_change_percent == pytest.approx(5.0)
+
+
+def test_one_update_feeds_every_window():
+    rollup = rollup_of("5m", "1h")
+    rollup.add("5m")
+
+    ticks = rollup.update(candle(0, 100.0, 101.0))
+
+    assert len(rollup) == 2
+    assert sorted(tick.timeframe for tick in ticks) == ["1h", "5m"]
+
+    rollup.remove("1h")
+    assert [tick.timeframe for tick in rollup.update(candle(1, 101.0, 102.0))] == ["5m"]
+
+
+def test_candle_without_open_time_is_ignored():
+    rollup = rollup_of("5m")
+
+    assert rollup.update(Tick("BTCUSDT", "1m", 0.0, 100.0, 101.0)) == []
+
+
+class IdlePool(StreamPool):
+    async def add(self, key) -> None: ...
+
+    async def remove(self, key) -> None: ...
+
+    def stats(self) -> list[dict]:
+        return []
+
+    async def stop(self) -> None: ...
+
+
+@pytest.mark.parametrize("timeframe", ["1m", "15m", "4h", "1d"])
+def test_hub_supports_binance_timeframes(timeframe):
+    assert StreamHub(IdlePool(), derive_timeframes=False).supports(timeframe)
+
+
+@pytest.mark.parametrize("timeframe", ["7m", "10h", None])
+def test_hub_rejects_custom_timeframes_without_derivation(timeframe):
+    assert not StreamHub(IdlePool(), derive_timeframes=False).supports(timeframe)
+
+
+def test_hub_supports_custom_timeframes_with_derivation():
+    hub = StreamHub(IdlePool(), derive_timeframes=True)
+
+    assert hub.supports("7m")
+    assert not hub.supports("7w")
@@ -0,0 +1,75 @@
+import asyncio
+
+from aggregator.gateways.binance.pool import StreamPool
+from aggregator.main import MainService
+from aggregator.schemas.models import ActionEnum, InputCommand, Tick
+
+
+class RecordingPool(StreamPool):
+    def __init__(self):
+        self.calls: list[tuple] = []
+
+    async def add(self, key) -> None:
+        self.calls.append(("add", key))
+
+    async def remove(self, key) -> None:
+        self.calls.append(("remove", key))
+
+    def stats(self) -> list[dict]:
+        return []
+
+    async def stop(self) -> None: ...
+
+
+class RecordingEvaluator:
+    def __init__(self):
+        self.ticks: list[Tick] = []
+
+    async def add(self, command: InputCommand) -> None: ...
+
+    async def remove(self, command: InputCommand) -> None: ...
+
+    async def evaluate(self, message: Tick) -> None:
+        self.ticks.append(message)
+
+    async def stop(self) -> None: ...
+
+
+def command(user_id: str, *symbols: str) -> InputCommand:
+    return InputCommand(action=ActionEnum.SUBSCRIBE, user_id=user_id, symbols=list(symbols), timeframe="1m")
+
+
+def service() -> tuple[MainService, RecordingPool, RecordingEvaluator]:
+    pool, evaluator = RecordingPool(), RecordingEvaluator()
+    return MainService(consumer=None, producer=None, pool=pool, evaluator=evaluator), pool, evaluator
+
+
+def test_stream_stays_open_until_last_user_leaves():
+    async def run() -> list[tuple]:
+        main, pool, _ = service()
+        await main._subscribe_user(command("1", "BTCUSDT"))
+        await main._subscribe_user(command("2", "BTCUSDT", "ETHUSDT"))
+        await main._unsubscribe_user("1")
+        opened = list(pool.calls)
+        await main._unsubscribe_user("2")
+        return opened, pool.calls[len(opened):]
+
+    opened, closed = asyncio.run(run())
+
+    assert opened == [("add", ("BTCUSDT", "1m")), ("add", ("ETHUSDT", "1m"))]
+    assert sorted(closed) == [("remove", ("BTCUSDT", "1m")), ("remove", ("ETHUSDT", "1m"))]
+
+
+def test_tick_reaches_evaluator_once_for_shared_stream():
+    async def run() -> list[Tick]:
+        main, _, evaluator = service()
+        await main.restore([command(str(user_id), "BTCUSDT") for user_id in range(3)])
+        await main.hub.deliver(("BTCUSDT", "1m"), Tick("BTCUSDT", "1m", 1.0, 100.0, 101.0))
+        await main._unsubscribe_user("0")
+        await main._unsubscribe_user("1")
+        await main._unsubscribe_user("2")
+        # поток закрыт, поздний тик оценщику не передается
+        await main.hub.deliver(("BTCUSDT", "1m"), Tick("BTCUSDT", "1m", 2.0, 100.0, 102.0))
+        return evaluator.ticks
+
+    assert [tick.close_price for tick in asyncio.run(run())] == [101.0]
@@ -0,0 +1,86 @@
+import json
+import os
+
+from aggregator.core.store import SubscriptionStore
+
+
+def command(user_id: str, *symbols: str) -> dict:
+    return {"action": "subscribe", "user_id": user_id, "symbols": list(symbols), "timeframe": "1m"}
+
+
+def open_store(path, compact_every: int = 100) -> SubscriptionStore:
+    store = SubscriptionStore(path=str(path), compact_every=compact_every, fsync=False)
+    store.load()
+    return store
+
+
+def test_empty_directory_loads_empty_table(tmp_path):
+    path = tmp_path / "store"
+
+    assert SubscriptionStore(path=str(path), fsync=False).load() == {}
+    assert path.is_dir()
+
+
+def test_journal_is_replayed_without_close(tmp_path):
+    store = open_store(tmp_path)
+    store.save(command("1", "BTCUSDT"))
+    store.save(command("2", "ETHUSDT"))
+    store.save(command("1", "SOLUSDT"))
+    store.delete("2")
+
+    # close не вызывается: имитация аварийной остановки
+    assert open_store(tmp_path).load() == {"1": command("1", "SOLUSDT")}
+
+
+def test_delete_of_unknown_user_is_not_journaled(tmp_path):
+    store = open_store(tmp_path)
+    store.delete("42")
+
+    assert os.path.getsize(store.journal_path) == 0
+
+
+def test_compaction_moves_table_into_snapshot(tmp_path):
+    store = open_store(tmp_path, compact_every=3)
+    for user_id in ("1", "2", "3"):
+        store.save(command(user_id, "BTCUSDT"))
+
+    assert os.path.getsize(store.journal_path) == 0
+    with open(store.snapshot_path) as file:
+        assert {item["user_id"] for item in json.load(file)} == {"1", "2", "3"}
+
+    store.delete("3")
+    assert set(open_store(tmp_path).load()) == {"1", "2"}
+
+
+def test_broken_journal_line_is_skipped(tmp_path):
+    store = open_store(tmp_path)
+    store.save(command("1", "BTCUSDT"))
+    store.save(command("2", "ETHUSDT"))
+    with open(store.journal_path, "ab") as file:
+        file.write(b'{"op": "set", "comm')
+
+    assert set(open_store(tmp_path).load()) == {"1", "2"}
+
+
+def test_records_after_torn_write_survive_restart(tmp_path):
+    store = open_store(tmp_path)
+    store.save(command("1", "BTCUSDT"))
+    store.save(command("2", "ETHUSDT"))
+    with open(store.journal_path, "ab") as file:
+        file.write(b'{"op": "del", "user_')
+
+    # перезапуск после аварии: новые записи не должны приклеиться к обрывку
+    store = open_store(tmp_path)
+    store.save(command("3", "SOLUSDT"))
+    store.delete("1")
+
+    assert open_store(tmp_path).load() == {"2": command("2", "ETHUSDT"), "3": command("3", "SOLUSDT")}
+
+
+def test_close_writes_snapshot_and_resets_journal(tmp_path):
+    store = open_store(tmp_path)
+    store.save(command("1", "BTCUSDT"))
+    store.close()
+
+    assert os.path.getsize(store.journal_path) == 0
+    assert open_store(tmp_path).load() == {"1": command("1", "BTCUSDT")}
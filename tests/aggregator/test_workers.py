@@ -0,0 +1,132 @@
+import asyncio
+import queue
+import threading
+
+from aggregator.core.metrics import WORKER_DROPPED
+from aggregator.core.workers import ADD, STOP, TICKS, ProcessPoolEvaluator, shard_for
+from aggregator.schemas.models import ActionEnum, InputCommand, Tick
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "BNBUSDT", "ADAUSDT"]
+
+
+class FakeQueue(queue.Queue):
+    def cancel_join_thread(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeProcess:
+    """Процесс без запуска: тест сам решает, когда он завершится"""
+
+    def __init__(self, target, args, name: str, daemon: bool):
+        self.args = args
+        self.name = name
+        self.alive = False
+        self.exitcode = None
+
+    def start(self) -> None:
+        self.alive = True
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def kill(self) -> None:
+        self.alive = False
+        self.exitcode = -9
+
+    def join(self, timeout: float | None = None) -> None:
+        self.alive = False
+
+    def terminate(self) -> None:
+        self.alive = False
+
+
+class FakeContext:
+    def __init__(self):
+        self.processes: list[FakeProcess] = []
+
+    def Queue(self) -> FakeQueue:
+        return FakeQueue()
+
+    def BoundedSemaphore(self, value: int) -> threading.BoundedSemaphore:
+        return threading.BoundedSemaphore(value)
+
+    def Process(self, **kwargs) -> FakeProcess:
+        process = FakeProcess(**kwargs)
+        self.processes.append(process)
+        return process
+
+
+def pool(**params) -> tuple[ProcessPoolEvaluator, FakeContext]:
+    evaluator = ProcessPoolEvaluator(workers=2, check_interval=0.01, **params)
+    context = evaluator._context = FakeContext()
+    return evaluator, context
+
+
+def drain(inbox: FakeQueue) -> list[tuple]:
+    messages = []
+    while not inbox.empty():
+        messages.append(inbox.get_nowait())
+    return messages
+
+
+def command(user_id: str, symbols: list[str]) -> InputCommand:
+    return InputCommand(action=ActionEnum.SUBSCRIBE, user_id=user_id, symbols=symbols, timeframe="1m")
+
+
+def test_dead_worker_is_restarted_with_its_subscriptions():
+    async def run() -> tuple:
+        evaluator, context = pool()
+        await evaluator.start()
+        await evaluator.add(command("1", SYMBOLS))
+        await evaluator.add(command("2", SYMBOLS[:1]))
+        await evaluator.remove(command("2", SYMBOLS[:1]))
+        drain(context.processes[1].args[1])
+
+        context.processes[0].kill()
+        await asyncio.sleep(0.05)
+        restarted = context.processes[2:]
+        resent = drain(restarted[0].args[1]) if restarted else []
+        survivor = drain(context.processes[1].args[1])
+
+        await evaluator.stop()
+        return restarted, resent, survivor
+
+    restarted, resent, survivor = asyncio.run(run())
+
+    assert [process.args[0] for process in restarted] == [0]
+    assert [kind for kind, _ in resent] == [ADD]
+    assert resent[0][1]["user_id"] == "1"
+    assert sorted(resent[0][1]["symbols"]) == sorted(symbol for symbol in SYMBOLS if shard_for(symbol, 2) == 0)
+    # живому процессу подписки повторно не отправляются
+    assert survivor == []
+
+
+def test_ticks_are_dropped_when_worker_queue_is_full():
+    async def run() -> list:
+        evaluator, context = pool(batch_size=1, max_pending=2)
+        await evaluator.start()
+        for _ in range(5):
+            await evaluator.evaluate(Tick("BTCUSDT", "1m", 1.0, 100.0, 101.0))
+        messages = drain(context.processes[shard_for("BTCUSDT", 2)].args[1])
+        await evaluator.stop()
+        return messages
+
+    dropped_before = sum(WORKER_DROPPED.snapshot().values())
+    messages = asyncio.run(run())
+
+    assert [kind for kind, _ in messages] == [TICKS, TICKS]
+    assert sum(WORKER_DROPPED.snapshot().values()) - dropped_before == 3
+
+
+def test_stop_sends_stop_to_every_worker():
+    async def run() -> list:
+        evaluator, context = pool()
+        await evaluator.start()
+        inboxes = [process.args[1] for process in context.processes]
+        await evaluator.stop()
+        return [drain(inbox) for inbox in inboxes]
+
+    assert asyncio.run(run()) == [[(STOP, None)], [(STOP, None)]]
@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+from common.consumer import AckBatcher, KeyedWorkers
+
+
+class FakeMessage:
+    """Доставка aio_pika: номер, признак повторной доставки и записанные ack/nack/reject"""
+
+    def __init__(self, delivery_tag: int, body: dict | bytes, redelivered: bool = False):
+        self.delivery_tag = delivery_tag
+        self.redelivered = redelivered
+        self.content_type = "application/json"
+        self.body = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.calls: list[tuple] = []
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.calls.append(("ack", multiple))
+
+    async def nack(self, requeue: bool = True) -> None:
+        self.calls.append(("nack", requeue))
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.calls.append(("reject", requeue))
+
+
+async def decode(message: FakeMessage) -> dict:
+    return json.loads(message.body)
+
+
+def messages(count: int) -> list[FakeMessage]:
+    return [FakeMessage(tag, {"user_id": str(tag)}) for tag in range(1, count + 1)]
+
+
+def test_ack_waits_for_contiguous_completions():
+    async def run() -> list[FakeMessage]:
+        acks = AckBatcher(batch_size=100, interval=10.0)
+        delivered = messages(4)
+        for message in delivered:
+            acks.track(message)
+
+        # 3 и 4 закончились раньше 1 и 2: подтверждать нечего
+        await acks.finish(delivered[2])
+        await acks.finish(delivered[3])
+        await acks.flush()
+        assert [message.calls for message in delivered] == [[], [], [], []]
+
+        await acks.finish(delivered[0])
+        await acks.flush()
+        assert delivered[0].calls == [("ack", True)]
+
+        await acks.finish(delivered[1])
+        await acks.close()
+        return delivered
+
+    delivered = asyncio.run(run())
+
+    # один multiple-ack покрывает 2, 3 и 4
+    assert [message.calls for message in delivered] == [[("ack", True)], [], [], [("ack", True)]]
+
+
+def test_nacked_delivery_is_skipped_by_watermark():
+    async def run() -> list[FakeMessage]:
+        acks = AckBatcher(batch_size=100, interval=10.0)
+        delivered = messages(4)
+        for message in delivered:
+            acks.track(message)
+
+        await acks.finish(delivered[0])
+        await acks.finish(delivered[1], success=False)
+        await acks.finish(delivered[2])
+        await acks.finish(delivered[3], success=False)
+        await acks.close()
+        return delivered
+
+    delivered = asyncio.run(run())
+
+    # ack до последней успешной доставки, отклоненная в конце не подтверждается
+    assert [message.calls for message in delivered] == [[], [], [("ack", True)], []]
+
+
+def test_batch_size_and_interval_trigger_flush():
+    async def run() -> tuple:
+        acks = AckBatcher(batch_size=2, interval=0.01)
+        delivered = messages(3)
+        for message in delivered:
+            acks.track(message)
+
+        await acks.finish(delivered[0])
+        await acks.finish(delivered[1])
+        by_size = [list(message.calls) for message in delivered]
+
+        await acks.finish(delivered[2])
+        await asyncio.sleep(0.05)
+        return by_size, delivered[2].calls
+
+    by_size, by_timer = asyncio.run(run())
+
+    assert by_size == [[], [("ack", True)], []]
+    assert by_timer == [("ack", True)]
+
+
+def test_failed_message_is_requeued_once_then_dead_lettered():
+    async def run() -> tuple:
+        async def command(message: dict) -> None:
+            raise RuntimeError("handler failed")
+
+        workers = KeyedWorkers(workers=2, ack_batch_size=1, ack_interval=10.0, decode=decode)
+        workers.start(command, "commands")
+        first = FakeMessage(1, {"user_id": "1"})
+        second = FakeMessage(2, {"user_id": "1"}, redelivered=True)
+        await workers.handle(first)
+        await workers.handle(second)
+        await asyncio.sleep(0.01)
+        await workers.stop()
+        return first.calls, second.calls
+
+    first, second = asyncio.run(run())
+
+    assert first == [("nack", True)]
+    assert second == [("nack", False)]
+
+
+def test_undecodable_message_is_rejected_without_requeue():
+    async def run() -> tuple:
+        handled = []
+
+        async def command(message: dict) -> None:
+            handled.append(message)
+
+        workers = KeyedWorkers(workers=1, ack_batch_size=1, ack_interval=10.0, decode=decode)
+        workers.start(command)
+        broken = FakeMessage(1, b"{not json")
+        valid = FakeMessage(2, {"user_id": "1"})
+        await workers.handle(broken)
+        await workers.handle(valid)
+        await asyncio.sleep(0.01)
+        await workers.stop()
+        return broken.calls, valid.calls, handled
+
+    broken, valid, handled = asyncio.run(run())
+
+    assert broken == [("reject", False)]
+    assert valid == [("ack", True)]
+    assert handled == [{"user_id": "1"}]
+
+
+def test_messages_of_one_key_are_handled_in_order():
+    async def run() -> dict[str, list[int]]:
+        handled: dict[str, list[int]] = {}
+
+        async def command(message: dict) -> None:
+            # первые сообщения обрабатываются дольше последующих
+            await asyncio.sleep(0.01 / message["seq"])
+            handled.setdefault(message["user_id"], []).append(message["seq"])
+
+        workers = KeyedWorkers(workers=4, ack_batch_size=100, ack_interval=10.0, decode=decode)
+        workers.start(command)
+        tag = 0
+        for seq in range(1, 6):
+            for user_id in ("a", "b", "c"):
+                tag += 1
+                await workers.handle(FakeMessage(tag, {"user_id": user_id, "seq": seq}))
+        await asyncio.sleep(0.2)
+        await workers.stop()
+        return handled
+
+    handled = asyncio.run(run())
+
+    assert handled == {user_id: [1, 2, 3, 4, 5] for user_id in ("a", "b", "c")}
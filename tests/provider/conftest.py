@@ -0,0 +1,4 @@
+import os
+
+# настройки provider читаются при импорте, токен бота обязателен, но в тестах не используется
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test")
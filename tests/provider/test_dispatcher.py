@@ -0,0 +1,181 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+from telegram.error import RetryAfter
+
+from provider.gateways.telegram.dispatcher import DispatchScheduler, TokenBucket
+
+
+def recorder(log: list, name: str, result: bool = True):
+    async def send() -> bool:
+        log.append((name, time.monotonic()))
+        return result
+
+    return send
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2.0)
+    now = bucket.updated_at
+
+    assert bucket.wait_time(now) == 0
+    bucket.take(now)
+    assert bucket.wait_time(now) == pytest.approx(0.5)
+    assert bucket.wait_time(now + 0.25) == pytest.approx(0.25)
+    assert bucket.wait_time(now + 0.5) == 0
+
+
+def test_token_bucket_burst_is_capped_by_capacity():
+    bucket = TokenBucket(rate=10.0, capacity=2.0)
+    now = bucket.updated_at + 60
+
+    bucket.take(now)
+    bucket.take(now)
+
+    assert bucket.wait_time(now) > 0
+
+
+def test_higher_priority_chat_is_sent_first():
+    async def run() -> list:
+        scheduler = DispatchScheduler(global_rate=1000.0, chat_rate=1000.0, max_pending=10)
+        log = []
+        # все отправки в очереди до первого шага цикла, порядок задает только приоритет
+        await asyncio.gather(
+            scheduler.submit("a", 1, recorder(log, "a")),
+            scheduler.submit("b", 3, recorder(log, "b")),
+            scheduler.submit("c", 2, recorder(log, "c")),
+        )
+        await scheduler.stop()
+        return [name for name, _ in log]
+
+    assert asyncio.run(run()) == ["b", "c", "a"]
+
+
+def test_higher_priority_is_sent_first_within_chat():
+    async def run() -> list:
+        scheduler = DispatchScheduler(global_rate=1000.0, chat_rate=20.0, max_pending=10)
+        log = []
+        first = asyncio.create_task(scheduler.submit("chat", 1, recorder(log, "first")))
+        await asyncio.sleep(0.01)
+        # токен чата потрачен, обе отправки ждут его в очереди чата
+        await asyncio.gather(
+            first,
+            scheduler.submit("chat", 1, recorder(log, "low")),
+            scheduler.submit("chat", 3, recorder(log, "high")),
+        )
+        await scheduler.stop()
+        return [name for name, _ in log]
+
+    assert asyncio.run(run()) == ["first", "high", "low"]
+
+
+def test_chat_rate_spaces_sends_to_one_chat():
+    async def run() -> list:
+        scheduler = DispatchScheduler(global_rate=1000.0, chat_rate=20.0, max_pending=10)
+        log = []
+        await asyncio.gather(*(scheduler.submit("chat", 1, recorder(log, str(i))) for i in range(3)))
+        await scheduler.stop()
+        return [at for _, at in log]
+
+    sent_at = asyncio.run(run())
+
+    assert len(sent_at) == 3
+    assert all(later - earlier >= 0.045 for earlier, later in zip(sent_at, sent_at[1:]))
+
+
+def test_retry_after_requeues_and_pauses():
+    async def run() -> tuple:
+        scheduler = DispatchScheduler(global_rate=1000.0, chat_rate=1000.0, max_pending=10)
+        attempts = []
+
+        async def send() -> bool:
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RetryAfter(timedelta(milliseconds=50))
+            return True
+
+        result = await scheduler.submit("chat", 1, send)
+        stats = scheduler.stats()
+        await scheduler.stop()
+        return result, attempts, stats
+
+    result, attempts, stats = asyncio.run(run())
+
+    assert result is True
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.045
+    assert (stats["sent"], stats["failed"], stats["rate_limited"]) == (1, 0, 1)
+
+
+def test_failed_send_resolves_false():
+    async def run() -> tuple:
+        scheduler = DispatchScheduler(global_rate=1000.0, chat_rate=1000.0, max_pending=10)
+
+        async def send() -> bool:
+            raise RuntimeError("boom")
+
+        result = await scheduler.submit("chat", 1, send)
+        stats = scheduler.stats()
+        await scheduler.stop()
+        return result, stats
+
+    result, stats = asyncio.run(run())
+
+    assert result is False
+    assert stats["failed"] == 1
+
+
+def test_idle_chats_are_evicted():
+    async def run() -> tuple:
+        scheduler = DispatchScheduler(global_rate=1000.0, chat_rate=1.0, max_pending=10)
+        seen_in_flight = []
+
+        async def send() -> bool:
+            # пока отправка в полете, чат нельзя удалить: на 429 она вернется в его очередь
+            scheduler._evict_idle(time.monotonic() + 60)
+            seen_in_flight.append(scheduler.stats()["chats"])
+            return True
+
+        await scheduler.submit("chat", 1, send)
+        refilling = scheduler.stats()["chats"]
+        scheduler._evict_idle(time.monotonic())
+        after_send = scheduler.stats()["chats"]
+        scheduler._evict_idle(time.monotonic() + 1.0)
+        after_refill = scheduler.stats()["chats"]
+        await scheduler.stop()
+        return seen_in_flight, refilling, after_send, after_refill
+
+    seen_in_flight, refilling, after_send, after_refill = asyncio.run(run())
+
+    assert seen_in_flight == [1]
+    # без восстановленного токена удаление сбросило бы лимит на чат
+    assert (refilling, after_send, after_refill) == (1, 1, 0)
+
+
+def test_stop_awaits_in_flight_and_cancels_queued():
+    async def run() -> tuple:
+        scheduler = DispatchScheduler(global_rate=1000.0, chat_rate=1.0, max_pending=10)
+        started = asyncio.Event()
+        finished = []
+
+        async def slow_send() -> bool:
+            started.set()
+            await asyncio.sleep(0.05)
+            finished.append(True)
+            return True
+
+        in_flight = asyncio.create_task(scheduler.submit("chat", 1, slow_send))
+        queued = asyncio.create_task(scheduler.submit("chat", 1, recorder([], "queued")))
+        await started.wait()
+
+        await scheduler.stop()
+        await asyncio.sleep(0)
+        return finished, await in_flight, queued.cancelled()
+
+    finished, in_flight_result, queued_cancelled = asyncio.run(run())
+
+    assert finished == [True]
+    assert in_flight_result is True
+    assert queued_cancelled